@@ -0,0 +1,10 @@
+"""
+Benchmarks of the EEPROM programmer run against the simulator.
+
+Reads, writes and the update and verify commands are timed in each transfer mode on
+the simulator's clock, which is split into time spent on the serial link and in the
+firmware. The host time spent outside the simulator is measured separately, along
+with micro-benchmarks of encoding and decoding commands. Run with:
+
+    python -m benchmarks --output results.json
+"""
@@ -0,0 +1,39 @@
+"""Run the benchmarks and write their results as JSON."""
+
+import json
+
+import click
+
+from .suite import BENCHMARKS, run
+
+
+@click.command()
+@click.option(
+    "--output", "-o", type=click.File("w"), default="-", help="The file to write to."
+)
+@click.option(
+    "--filter",
+    "-k",
+    "name_filter",
+    default="",
+    help="Only run benchmarks with names containing this.",
+)
+@click.option(
+    "--repeat",
+    type=click.IntRange(min=1),
+    default=1,
+    show_default=True,
+    help="The number of times to run each benchmark.",
+)
+@click.option("--list", "list_names", is_flag=True, help="List the benchmarks.")
+def main(output, name_filter, repeat, list_names):
+    """Run benchmarks of the programmer against the simulator."""
+    names = [name for name in BENCHMARKS if name_filter in name]
+    if list_names:
+        click.echo("\n".join(names))
+        return
+    json.dump(run(names, repeat=repeat), output, indent=2)
+    output.write("\n")
+
+
+main()
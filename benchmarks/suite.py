@@ -0,0 +1,265 @@
+"""The benchmarks and the functions which run them."""
+
+import functools
+import platform
+import random
+import tempfile
+import time
+import timeit
+import uuid
+from contextlib import contextmanager
+from pathlib import Path
+from unittest.mock import patch
+
+from click.testing import CliRunner
+
+from eeprom import Programmer, __version__, cli
+from eeprom import programmer_commands as commands
+from eeprom import simulator
+
+EEPROM_SIZE = 0x8000
+PARTIAL_SIZE = 0x1000
+MODES = {
+    "ascii": {},
+    "ascii-window": {"window": 8},
+    "binary": {"binary": True},
+    "binary-window": {"binary": True, "window": 8},
+    "binary-window-ranges": {"binary": True, "window": 8},
+    "binary-window-compress": {"binary": True, "window": 8, "compress": True},
+    "binary-window-checksums": {"binary": True, "window": 8, "checksums": True},
+}
+# Simulator options of modes which need different firmware. Without page writes the
+# binary modes write ranges, a write cycle per byte.
+FIRMWARE = {"binary-window-ranges": {"max_page": 0}}
+DIFF_DENSITIES = (0, 0.001, 0.01, 0.1, 0.5, 1)
+
+BENCHMARKS = {}
+
+
+def benchmark(name):
+    """Register a benchmark function under a name."""
+
+    def register(function):
+        BENCHMARKS[name] = function
+        return function
+
+    return register
+
+
+@functools.lru_cache()
+def image(size, seed=0):
+    """Return random data of a size."""
+    rng = random.Random(seed)
+    return bytes(rng.randrange(256) for _ in range(size))
+
+
+@functools.lru_cache()
+def sparse_image(size, seed=0):
+    """Return an image of random data padded with 0xFF, as most ROM images are."""
+    data = bytearray(b"\xff") * size
+    data[: size // 8] = image(size // 8, seed)
+    return bytes(data)
+
+
+@functools.lru_cache()
+def altered(size, density, seed=1):
+    """Return an image with a proportion of its bytes changed."""
+    data = bytearray(image(size))
+    rng = random.Random(seed)
+    for address in rng.sample(range(len(data)), int(len(data) * density)):
+        data[address] ^= 0xFF
+    return bytes(data)
+
+
+@contextmanager
+def measure(sim, result):
+    """
+    Measure the time taken by an operation on a simulator.
+
+    The result dict is filled with the simulated time and how it splits between the
+    serial link and the firmware, and the time the host spent outside the simulator.
+    """
+    in_simulator = [0.0]
+
+    def timed(method):
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return method(*args, **kwargs)
+            finally:
+                in_simulator[0] += time.perf_counter() - start
+
+        return wrapper
+
+    start_clock = sim.clock
+    start_busy = sim.busy_time
+    start_bytes = sim.bytes_sent + sim.bytes_recieved
+    with patch.object(sim, "recieve", timed(sim.recieve)):
+        with patch.object(sim, "read", timed(sim.read)):
+            start = time.perf_counter()
+            yield
+            wall = time.perf_counter() - start
+    transferred = sim.bytes_sent + sim.bytes_recieved - start_bytes
+    result.update(
+        simulated_seconds=sim.clock - start_clock,
+        transfer_seconds=transferred * sim.byte_time,
+        firmware_seconds=sim.busy_time - start_busy,
+        host_seconds=wall - in_simulator[0],
+        serial_bytes=transferred,
+    )
+
+
+def new_simulator(data=b"", mode=None):
+    """Return a simulator running the firmware of a mode and the port to open it."""
+    name = uuid.uuid4().hex
+    simulator.simulators[name] = simulator.Simulator(
+        image=data, **FIRMWARE.get(mode, {})
+    )
+    return simulator.simulators[name], f"sim://{name}"
+
+
+def operation_result(data_bytes, measure_function):
+    """Run a measured operation and return its result with its throughput."""
+    result = {"data_bytes": data_bytes}
+    measure_function(result)
+    result["bytes_per_second"] = data_bytes / result["simulated_seconds"]
+    return result
+
+
+def programmer_benchmark(size, mode, operation, data_function=image):
+    """
+    Return a benchmark of a Programmer operation on size bytes in a mode.
+
+    When data is run-length encoded the compression ratio is reported. Random data
+    does not compress, so its ratio is below 1.
+    """
+
+    def run():
+        data = data_function(size)
+        sim, port = new_simulator(data, mode)
+        programmer = Programmer(port=port, **MODES[mode])
+
+        def measured(result):
+            before = programmer.compression_stats
+            with measure(sim, result):
+                operation(programmer, data)
+            if programmer.compression:
+                stats = programmer.compression_stats.since(before)
+                result["compression_ratio"] = stats.ratio
+
+        try:
+            return operation_result(size, measured)
+        finally:
+            programmer.disconnect()
+            simulator.simulators.pop(port[6:])
+
+    return run
+
+
+def cli_benchmark(command, density, mode):
+    """
+    Return a benchmark of a CLI command which is given a binary file.
+
+    The file is an image of the full EEPROM with a proportion of its bytes changed.
+    """
+
+    def run():
+        sim, port = new_simulator(image(EEPROM_SIZE), mode)
+        data = altered(EEPROM_SIZE, density)
+        options = " ".join(
+            f"--{key}" if value is True else f"--{key} {value}"
+            for key, value in MODES[mode].items()
+        )
+        with tempfile.TemporaryDirectory() as directory:
+            path = Path(directory) / "image.bin"
+            path.write_bytes(data)
+
+            def measured(result):
+                with measure(sim, result):
+                    outcome = CliRunner().invoke(
+                        cli, f"--port {port} {options} {command} {path}"
+                    )
+                result["exit_code"] = outcome.exit_code
+
+            try:
+                return operation_result(len(data), measured)
+            finally:
+                simulator.simulators.pop(port[6:])
+
+    return run
+
+
+def read(programmer, data):
+    """Read as much of the EEPROM as the data covers."""
+    programmer.read(0, len(data) - 1)
+
+
+def write(programmer, data):
+    """Write data to the start of the EEPROM."""
+    programmer.write(data)
+
+
+for mode in MODES:
+    for scope, size in (("full", EEPROM_SIZE), ("partial", PARTIAL_SIZE)):
+        benchmark(f"read/{scope}/{mode}")(programmer_benchmark(size, mode, read))
+        benchmark(f"write/{scope}/{mode}")(programmer_benchmark(size, mode, write))
+    for name, operation in (("read", read), ("write", write)):
+        benchmark(f"{name}/sparse/{mode}")(
+            programmer_benchmark(EEPROM_SIZE, mode, operation, sparse_image)
+        )
+    benchmark(f"verify/full/{mode}")(cli_benchmark("verify", 0, mode))
+    for density in DIFF_DENSITIES:
+        benchmark(f"update/{density:g}/{mode}")(cli_benchmark("update", density, mode))
+
+
+def micro_benchmark(function, number=10000):
+    """Return a benchmark of the host time taken by a function."""
+
+    def run():
+        seconds = min(timeit.repeat(function, number=number, repeat=3)) / number
+        return {"host_seconds": seconds, "calls_per_second": 1 / seconds}
+
+    return run
+
+
+BLOCK = list(range(16))
+ASCII_BLOCK = " ".join(f"{byte:02X}" for byte in BLOCK) + " "
+RANGE = bytes(range(128))
+
+MICRO_BENCHMARKS = {
+    "encode/read_block": lambda: commands.ReadBlock.format_request(0x2A50),
+    "encode/write_block": lambda: commands.WriteBlock.format_request(0x2A50, BLOCK),
+    "encode/write_range": lambda: commands.WriteRange.format_request(0x2A00, RANGE),
+    "encode/write_page": lambda: commands.WritePage.format_request(0x2A00, RANGE[:64]),
+    "decode/read_byte": lambda: commands.ReadByte.process_response("EA"),
+    "decode/read_block": lambda: commands.ReadBlock.process_response(ASCII_BLOCK),
+    "decode/read_range": lambda: commands.ReadRange.process_response(RANGE),
+}
+for name, function in MICRO_BENCHMARKS.items():
+    benchmark(f"micro/{name}")(micro_benchmark(function))
+
+
+def run(names=None, repeat=1):
+    """
+    Run benchmarks and return their results.
+
+    Kwargs:
+        names (iterable): The names of the benchmarks to run. Default: all of them.
+        repeat (int): The number of times to run each benchmark. The run with the
+            least host time is reported. Default: 1.
+
+    Returns:
+        (dict): The environment and the results of each benchmark by name.
+
+    """
+    names = list(BENCHMARKS) if names is None else names
+    results = {}
+    for name in names:
+        runs = [BENCHMARKS[name]() for _ in range(repeat)]
+        results[name] = min(runs, key=lambda result: result["host_seconds"])
+    return {
+        "eeprom_version": __version__,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "results": results,
+    }
@@ -3,6 +3,7 @@ The eeprom package.
 
 Read and write EEPROMs through serial.
 """
+
 from .__version__ import __version__
 from .cli import cli
 from .programmer import Programmer
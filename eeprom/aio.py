@@ -0,0 +1,497 @@
+"""
+Communicate with the EEPROM programmer from an asyncio event loop.
+
+AsyncProgrammer mirrors Programmer, using the same commands, but waits for the
+programmer without blocking the event loop. Serial ports are watched for data with the
+event loop. Ports without a file descriptor, such as the simulator's "sim://" ports,
+are polled instead.
+"""
+
+import asyncio
+from collections import deque
+
+import serial
+
+from . import programmer_commands as commands
+from . import rle
+from .arduino import Arduino
+from .eeprom_type import get_EEPROM
+from .programmer import BaseProgrammer
+
+
+async def as_async_iterable(iterable):
+    """Yield the items of an iterable or an asynchronous iterable."""
+    if hasattr(iterable, "__aiter__"):
+        async for item in iterable:
+            yield item
+    else:
+        for item in iterable:
+            yield item
+
+
+class AsyncArduino:
+    """Handles communication with the Arduino over serial without blocking."""
+
+    READY_MESSAGE = Arduino.READY_MESSAGE
+    PING_MESSAGE = Arduino.PING_MESSAGE.encode("utf8") + b"\n"
+    PING_RESPONSE = Arduino.PING_RESPONSE
+    PING_TIMEOUT = Arduino.PING_TIMEOUT
+    POLL_INTERVAL = 0.001
+
+    def __init__(self, port="/dev/ttyUSB0", baud=115200):
+        """
+        Create a connection with an arduino.
+
+        Kwargs:
+            port (str): The serial port on which the arduino is located. URLs
+                supported by serial.serial_for_url are also accepted.
+                Default: "/dev/ttyUSB0"
+            baud (int): The baud rate of the serial connection. Default: 115200.
+
+        """
+        self.port = port
+        self.baud = baud
+        self.serial_connection = None
+        self.fileno = None
+        self.buffer = bytearray()
+
+    async def open(self, init_delay=2, reset=True, exclusive=False):
+        """
+        Initialise a connection to the arduino.
+
+        Kwargs:
+            init_delay (int): The maximum number of seconds to wait for the arduino
+                to initialise. Default: 2
+            reset (bool): If False the port is opened without toggling DTR and the
+                arduino is pinged until it responds. Default: True.
+            exclusive (bool): If True lock the port so that no other process can
+                open it while it is in use. Default: False.
+
+        Raises:
+            ValueError if reset is False and the arduino does not respond within
+                init_delay.
+
+        """
+        if "://" in self.port:
+            self.serial_connection = serial.serial_for_url(
+                self.port, do_not_open=True, timeout=0
+            )
+        else:
+            self.serial_connection = serial.Serial(timeout=0)
+        self.serial_connection.port = self.port
+        self.serial_connection.baudrate = self.baud
+        self.serial_connection.dtr = reset
+        if exclusive:
+            self.serial_connection.exclusive = True
+        self.serial_connection.open()
+        try:
+            self.fileno = self.serial_connection.fileno()
+        except OSError:
+            self.fileno = None
+        if reset:
+            try:
+                await asyncio.wait_for(self.read_until(self.READY_MESSAGE), init_delay)
+            except asyncio.TimeoutError:
+                pass
+        else:
+            await self.ping(init_delay)
+        self.reset_input_buffer()
+
+    async def ping(self, timeout):
+        """
+        Wait for the arduino to respond to a ping.
+
+        As Arduino.ping, the answers to pings sent again are read before returning.
+
+        Args:
+            timeout (int): The maximum number of seconds to wait.
+
+        Raises:
+            ValueError if the arduino does not respond within timeout.
+
+        """
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        self.reset_input_buffer()
+        pings = 0
+        while True:
+            self.serial_send_bytes(self.PING_MESSAGE)
+            pings += 1
+            if await self._read_ping_response():
+                break
+            if loop.time() > deadline:
+                raise ValueError(f"No response from arduino on {self.port}.")
+        if pings > 1:
+            while await self._read_ping_response():
+                pass
+
+    async def _read_ping_response(self):
+        try:
+            await asyncio.wait_for(
+                self.read_until(self.PING_RESPONSE), self.PING_TIMEOUT
+            )
+        except asyncio.TimeoutError:
+            return False
+        return True
+
+    def close(self):
+        """Close the connection to the arduino."""
+        self.serial_connection.close()
+
+    def reset_input_buffer(self):
+        """Discard data recieved from the arduino which has not been read."""
+        self.buffer.clear()
+        self.serial_connection.reset_input_buffer()
+
+    async def read_until(self, terminator):
+        """Return the data recieved from the arduino up to and including terminator."""
+        while terminator not in self.buffer:
+            await self._recieve()
+        return self._take(self.buffer.index(terminator) + len(terminator))
+
+    async def serial_recieve(self):
+        """Return a serial message from the arduino."""
+        message = await self.read_until(b"\n")
+        return message.decode("utf8").strip()
+
+    async def serial_recieve_bytes(self, size):
+        """
+        Return a number of raw bytes from the arduino.
+
+        Args:
+            size (int): The number of bytes to read.
+
+        """
+        while len(self.buffer) < size:
+            await self._recieve()
+        return self._take(size)
+
+    def serial_send_bytes(self, data):
+        """
+        Send raw bytes to the arduino.
+
+        Args:
+            data (bytes): The bytes to send.
+
+        """
+        self.serial_connection.write(data)
+
+    def _take(self, size):
+        data = bytes(self.buffer[:size])
+        del self.buffer[:size]
+        return data
+
+    async def _recieve(self):
+        while True:
+            data = self.serial_connection.read(self.serial_connection.in_waiting)
+            if data:
+                self.buffer += data
+                return
+            await self._readable()
+
+    async def _readable(self):
+        if self.fileno is None:
+            await asyncio.sleep(self.POLL_INTERVAL)
+            return
+        loop = asyncio.get_running_loop()
+        ready = loop.create_future()
+        loop.add_reader(self.fileno, lambda: ready.done() or ready.set_result(None))
+        try:
+            await ready
+        finally:
+            loop.remove_reader(self.fileno)
+
+
+class AsyncProgrammer(BaseProgrammer):
+    """
+    Manages communication with the EEPROM programmer from an asyncio event loop.
+
+    The connection is made by open, or by using the programmer as an asynchronous
+    context manager:
+
+        async with AsyncProgrammer(port="/dev/ttyUSB0", binary=True) as programmer:
+            data = await programmer.read_bytes()
+    """
+
+    def __init__(
+        self,
+        port="/dev/ttyUSB0",
+        baud=115200,
+        eeprom_type="AT28C25",
+        init_delay=2,
+        reset=True,
+        exclusive=False,
+        binary=False,
+        window=1,
+        compress=False,
+        checksums=False,
+    ):
+        """
+        Create a programmer. It is not connected until open is awaited.
+
+        Kwargs:
+            The same as Programmer, without shadow_cache, baud_rates, baud_cache,
+            max_retries or journal.
+            checksums (bool): Frame checking is not supported, so this must be False.
+                Default: False.
+
+        Raises:
+            ValueError if checksums is True.
+
+        """
+        if checksums:
+            raise ValueError(
+                "AsyncProgrammer does not check frames, use Programmer for checksums."
+            )
+        self.eeprom_type = eeprom_type
+        self.eeprom = get_EEPROM(self.eeprom_type)
+        self.arduino = AsyncArduino(port=port, baud=baud)
+        self.init_delay = init_delay
+        self.reset = reset
+        self.exclusive = exclusive
+        self.binary = binary
+        self.window = window
+        self.compress = compress
+        self.compression_stats = rle.CompressionStats(0, 0)
+        self.frame_checking = False
+        self.write_cycle_time = self.DEFAULT_WRITE_CYCLE_TIME
+
+    async def open(self):
+        """Connect to the programmer and find the features it supports."""
+        await self.arduino.open(
+            init_delay=self.init_delay, reset=self.reset, exclusive=self.exclusive
+        )
+        if self.binary or self.window > 1:
+            self.protocol_version = await self.send(commands.ProtocolVersion)
+        else:
+            self.protocol_version = 0
+        supported = self.protocol_version >= self.PROTOCOL_VERSION
+        self.binary = (
+            self.binary and supported and await self.send(commands.EnableBinary)
+        )
+        self.credits = (
+            await self.send(commands.Credits) if self.window > 1 and supported else 0
+        )
+        self.max_range = await self.send(commands.MaxRange) if self.binary else 0
+        self.max_page = await self.send(commands.MaxPage) if self.binary else 0
+        self.block_hashing = (
+            self.binary and self.protocol_version >= self.BLOCK_HASHES_VERSION
+        )
+        self.crc_checking = (
+            self.binary and self.protocol_version >= self.RANGE_CRC_VERSION
+        )
+        self.compression = (
+            self.compress
+            and self.binary
+            and self.protocol_version >= self.COMPRESSION_VERSION
+        )
+
+    def disconnect(self):
+        """Close the connection to the arduino."""
+        self.arduino.close()
+
+    async def __aenter__(self):
+        """Connect to the programmer."""
+        await self.open()
+        return self
+
+    async def __aexit__(self, *exc_info):
+        """Close the connection to the arduino."""
+        self.disconnect()
+
+    async def send(self, command, *args):
+        """Send a command to the programmer and return its processed response."""
+        self.arduino.serial_send_bytes(command.prepare_request(self, *args))
+        return await self.response(command)
+
+    async def response(self, command):
+        """Recieve and handle the response to a command."""
+        if issubclass(command, commands.BinaryCommand):
+            status, length = await self.arduino.serial_recieve_bytes(2)
+            payload = await self.arduino.serial_recieve_bytes(length)
+            command.check_status(status)
+            return command.process_frame(self, payload)
+        return command.process_response(await self.arduino.serial_recieve())
+
+    async def write_cycle_stats(self):
+        """Return the write cycle times measured by the programmer, as Programmer."""
+        stats = await self.send(commands.WriteCycleTimes)
+        if stats and stats.count:
+            self.write_cycle_time = stats.total / stats.count
+        return stats
+
+    async def read_byte(self, address):
+        """Return the byte stored in a particular address of the EEPROM."""
+        self.eeprom.is_valid_address(address)
+        return await self.send(commands.ReadByte, address)
+
+    async def write_byte(self, address, byte):
+        """Write a byte to an address in the EEPROM."""
+        self.eeprom.is_valid_address(address)
+        self.eeprom.is_valid_data(byte)
+        await self.send(commands.WriteByte, address, byte)
+
+    async def read_block(self, address):
+        """Return a block of 16 consecutive bytes from the EEPROM as a list."""
+        self.eeprom.is_valid_address(address)
+        self.eeprom.is_valid_address(address + 15)
+        return list(await self.send(self.read_block_command, address))
+
+    async def write_block(self, address, data):
+        """Write a block of up to 16 consecutive bytes to the EEPROM."""
+        self.eeprom.is_valid_address(address)
+        self.eeprom.is_valid_address(address + 15)
+        for byte in data:
+            self.eeprom.is_valid_data(byte)
+        await self.send(self.write_block_command, address, data)
+
+    async def read(self, start_address=None, end_address=None):
+        """Return a block of data from the EEPROM as a list."""
+        return list(await self.read_bytes(start_address, end_address))
+
+    async def read_bytes(self, start_address=None, end_address=None):
+        """Return a block of data from the EEPROM as a bytearray."""
+        data = bytearray()
+        async for block in self.iter_read(start_address, end_address):
+            data += block
+        return data
+
+    def iter_read(self, start_address=None, end_address=None):
+        """
+        Return an asynchronous iterator of the blocks of data read from the EEPROM.
+
+        Each block is yielded as soon as it arrives from the programmer.
+
+        Kwargs:
+            start_address (int): The start address of the data. Defaults to the
+                lowest address on the EEPROM.
+            end_address (int): The end address of the data. Defaults to the highest
+                address on the EEPROM.
+
+        Raises:
+            ValueError if address is out of range for the EEPROM.
+
+        """
+        start = start_address or self.eeprom.min_address
+        end = end_address or self.eeprom.max_address
+        self.eeprom.is_valid_address(start)
+        self.eeprom.is_valid_address(end)
+        return self._read_blocks(start, end)
+
+    async def _read_blocks(self, start, end):
+        size, requests = self._read_requests(start, end)
+        address = start
+        responses = self.pipeline(requests)
+        try:
+            async for block in responses:
+                block = self._read_block_data(block, address, end, size)
+                yield block
+                address += len(block)
+        finally:
+            # Unlike generators, asynchronous generators are not closed as soon as
+            # they are no longer used, so the responses in flight are discarded here.
+            await responses.aclose()
+
+    async def write(self, data, start_address=None):
+        """
+        Write a block of data to the EEPROM.
+
+        Args:
+            data (bytes-like or list(int)): The bytes to write to the EEPROM.
+
+        Kwargs:
+            start_address (int): The first address to write to. Defaults to the lowest
+                address on the EEPROM.
+
+        Returns:
+            int: The number of bytes written.
+
+        Raises:
+            ValueError if address or data is out of range for the EEPROM.
+
+        """
+        address = start_address or self.eeprom.min_address
+        self.eeprom.is_valid_address(address + len(data) - 1)
+        for byte in data:
+            self.eeprom.is_valid_data(byte)
+        async for _ in self.pipeline(self._write_requests(address, data)):
+            pass
+        return len(data)
+
+    async def write_stream(self, chunks, start_address=None):
+        """
+        Write data to the EEPROM as it becomes available.
+
+        Args:
+            chunks (iterable or async iterable): Chunks of data of any size, each
+                bytes-like.
+
+        Kwargs:
+            start_address (int): The first address to write to. Defaults to the lowest
+                address on the EEPROM.
+
+        Returns:
+            int: The number of bytes written.
+
+        Raises:
+            ValueError if the data runs past the end of the EEPROM.
+
+        """
+        address = start_address or self.eeprom.min_address
+        written = bytearray()
+        async for _ in self.pipeline(self._stream_requests(address, chunks, written)):
+            pass
+        return len(written)
+
+    async def _stream_requests(self, address, chunks, written):
+        pending = bytearray()
+        async for chunk in as_async_iterable(chunks):
+            pending += chunk
+            for block_address, block in self._pending_blocks(
+                address + len(written), pending, written
+            ):
+                for request in self._write_requests(block_address, block):
+                    yield request
+        for block_address, block in self._pending_blocks(
+            address + len(written), pending, written, final=True
+        ):
+            for request in self._write_requests(block_address, block):
+                yield request
+
+    async def pipeline(self, requests):
+        """
+        Send commands to the programmer and yield their responses in order.
+
+        Commands are scheduled as Programmer.pipeline schedules them, except that
+        requests may also be an asynchronous iterable. Frames are not checked, so a
+        damaged response is not recovered.
+        """
+        in_flight = deque()
+        try:
+            async for command, address, args in as_async_iterable(requests):
+                request = command.prepare_request(self, *args)
+                while self._must_wait(in_flight, request):
+                    yield await self._pipeline_response(in_flight)
+                self.arduino.serial_send_bytes(request)
+                in_flight.append((command, address, request))
+            while in_flight:
+                yield await self._pipeline_response(in_flight)
+        except (GeneratorExit, ValueError):
+            await self._discard_responses(in_flight)
+            raise
+
+    async def _pipeline_response(self, in_flight):
+        command, address, _ = in_flight.popleft()
+        try:
+            return await self.response(command)
+        except ValueError as error:
+            await self._discard_responses(in_flight)
+            raise ValueError(f"Address {address:04X}: {error}") from error
+
+    async def _discard_responses(self, in_flight):
+        while in_flight:
+            command, _, _ = in_flight.popleft()
+            try:
+                await self.response(command)
+            except ValueError:
+                pass
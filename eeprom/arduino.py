@@ -1,19 +1,29 @@
 """The Arduino class provides methods to commuinate with an Arduino over seiral."""
+
 import time
 
 import serial
 
+# Ports such as "sim://" are opened by the handlers in eeprom.urlhandler.
+serial.protocol_handler_packages.append("eeprom.urlhandler")
+
 
 class Arduino:
     """Handles communication with the Arduino over serial."""
 
+    READY_MESSAGE = b"READY\r\n"
+    PING_MESSAGE = "P"
+    PING_RESPONSE = b"ACK\r\n"
+    PING_TIMEOUT = 0.1
+
     def __init__(self, port="/dev/ttyUSB0", baud=115200):
         """
         Create a connection with an arduino.
 
         Kwargs:
-            port (str): The serial port on which the arduino is located.
-                Default: "/dev/ttyUSB0"
+            port (str): The serial port on which the arduino is located. URLs
+                supported by serial.serial_for_url, such as "sim://" for the
+                simulator, are also accepted. Default: "/dev/ttyUSB0"
             baud (int): The baud rate of the serial connection. Default: 115200.
 
         """
@@ -21,20 +31,108 @@ class Arduino:
         self.baud = baud
         self.serial_connection = None
 
-    def open(self, init_delay=2):
+    def open(self, init_delay=2, reset=True, exclusive=False):
         """
         Initialise a connection to the arduino.
 
+        Opening the port normally resets the arduino. The connection is ready once
+        the arduino reports that it has started, or after init_delay if it does not.
+
         Kwargs:
-            init_delay (int): The number of seconds to wait for the arduino to
-                initialise. Default: 2
+            init_delay (int): The maximum number of seconds to wait for the arduino
+                to initialise. Default: 2
+            reset (bool): If False the port is opened without toggling DTR so that
+                an arduino which is already running is not reset. The arduino is
+                pinged until it responds instead. Some operating systems raise DTR
+                when a port is opened regardless. Default: True.
+            exclusive (bool): If True lock the port so that no other process can
+                open it while it is in use. Default: False.
+
+        Raises:
+            ValueError if reset is False and the arduino does not respond within
+                init_delay.
+
         """
-        self.serial_connection = serial.Serial(self.port, self.baud)
-        time.sleep(init_delay)  # Wait for arduino to initialize
+        if "://" in self.port:
+            self.serial_connection = serial.serial_for_url(
+                self.port, do_not_open=True, timeout=init_delay
+            )
+        else:
+            self.serial_connection = serial.Serial(timeout=init_delay)
+        self.serial_connection.port = self.port
+        self.serial_connection.baudrate = self.baud
+        self.serial_connection.dtr = reset
+        if exclusive:
+            self.serial_connection.exclusive = True
+        self.serial_connection.open()
+        if reset:
+            self.serial_connection.read_until(self.READY_MESSAGE)
+        else:
+            self.ping(init_delay)
+        self.serial_connection.timeout = None
         self.serial_connection.flush()
         self.serial_connection.reset_input_buffer()
         self.serial_connection.reset_output_buffer()
 
+    def ping(self, timeout):
+        """
+        Wait for the arduino to respond to a ping.
+
+        The ping is sent again every PING_TIMEOUT in case it was lost. The arduino
+        answers pings in order once it has handled everything sent before them, so
+        when more than one was sent the answers to the others follow the first
+        promptly and are read before returning, rather than being taken for the
+        response to a later command.
+
+        Args:
+            timeout (int): The maximum number of seconds to wait.
+
+        Raises:
+            ValueError if the arduino does not respond within timeout.
+
+        """
+        deadline = time.monotonic() + timeout
+        previous_timeout = self.serial_connection.timeout
+        self.serial_connection.timeout = self.PING_TIMEOUT
+        self.serial_connection.reset_input_buffer()
+        pings = 0
+        try:
+            while True:
+                self.serial_send(self.PING_MESSAGE)
+                pings += 1
+                response = self.serial_connection.read_until(self.PING_RESPONSE)
+                if response.endswith(self.PING_RESPONSE):
+                    break
+                if time.monotonic() > deadline:
+                    raise ValueError(f"No response from arduino on {self.port}.")
+            if pings > 1:
+                while self.serial_connection.read_until(self.PING_RESPONSE):
+                    pass
+        finally:
+            self.serial_connection.timeout = previous_timeout
+
+    def set_baud(self, baud):
+        """
+        Change the baud rate of the open connection.
+
+        Args:
+            baud (int): The new baud rate.
+
+        """
+        self.baud = baud
+        self.serial_connection.baudrate = baud
+
+    def set_timeout(self, timeout):
+        """
+        Set the time to wait for data from the arduino.
+
+        Args:
+            timeout (float): The maximum number of seconds to wait, or None to wait
+                until the data arrives.
+
+        """
+        self.serial_connection.timeout = timeout
+
     def close(self):
         """Close the connection to the arduino."""
         self.serial_connection.close()
@@ -54,3 +152,29 @@ class Arduino:
 
         """
         self.serial_connection.write(message.strip().encode("utf8") + b"\n")
+
+    def serial_recieve_bytes(self, size):
+        """
+        Return a number of raw bytes from the arduino.
+
+        Args:
+            size (int): The number of bytes to read.
+
+        Raises:
+            ValueError if fewer than size bytes were recieved.
+
+        """
+        data = self.serial_connection.read(size)
+        if len(data) != size:
+            raise ValueError(f"Expected {size} bytes from arduino, got {len(data)}.")
+        return data
+
+    def serial_send_bytes(self, data):
+        """
+        Send raw bytes to the arduino.
+
+        Args:
+            data (bytes): The bytes to send.
+
+        """
+        self.serial_connection.write(data)
@@ -0,0 +1,55 @@
+"""
+Remember the highest baud rate that has worked with each serial port.
+
+The rates are kept in a JSON file mapping the port to its rate, so that later
+connections start from a rate known to work rather than trying faster rates which
+have already failed. Removing the file makes the faster rates be tried again.
+"""
+
+import json
+import os
+from pathlib import Path
+
+
+class BaudCache:
+    """Stores the highest stable baud rate of each port in a JSON file."""
+
+    def __init__(self, path):
+        """
+        Create a cache.
+
+        Args:
+            path (str): The path of the JSON file. It is created, along with its
+                directory, when the first rate is saved.
+
+        """
+        self.path = Path(path)
+
+    def load(self):
+        """Return the rates of all ports, or an empty dict if none can be read."""
+        try:
+            rates = json.loads(self.path.read_text())
+        except (OSError, ValueError):
+            return {}
+        return rates if isinstance(rates, dict) else {}
+
+    def get(self, port):
+        """Return the highest stable baud rate of a port, or None if it is unknown."""
+        rate = self.load().get(port)
+        return rate if isinstance(rate, int) else None
+
+    def set(self, port, baud):
+        """
+        Store the highest stable baud rate of a port.
+
+        Args:
+            port (str): The serial port.
+            baud (int): The baud rate.
+
+        """
+        rates = self.load()
+        rates[port] = baud
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        temporary_path = self.path.with_suffix(".tmp")
+        temporary_path.write_text(json.dumps(rates, indent=2, sort_keys=True))
+        os.replace(temporary_path, self.path)
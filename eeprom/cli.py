@@ -4,8 +4,16 @@ The eeprom package.
 Tool for reading and writing EEPROMs over USB serial to an arduino based EEPROM programmer.
 """
 
+import mmap
+import os
+import stat
+import time
+
 import click
 
+from . import daemon, gang, image, planner
+from . import programmer_commands as commands
+from . import simulator
 from .__version__ import __version__
 from .programmer import Programmer
 
@@ -21,10 +29,156 @@ class HexInt(click.ParamType):
             self.fail(f"{value} is not a valid hexidecimal integer.")
 
 
+class BaudRates(click.ParamType):
+    """Parameter type for comma separated lists of baud rates."""
+
+    name = "rates"
+
+    def convert(self, value, param, ctx):
+        """Return the input as a list of integers or fail."""
+        rates = value.split(",")
+        if not all(rate.isdigit() and int(rate) > 0 for rate in rates):
+            self.fail(f"{value} is not a valid list of baud rates.")
+        return [int(rate) for rate in rates]
+
+
 @click.group()
-def cli():
+@click.option(
+    "--port",
+    envvar="EEPROM_PORT",
+    default="/dev/ttyUSB0",
+    show_default=True,
+    help='The serial port of the programmer, or a URL such as "sim://" for the simulator.',
+)
+@click.option(
+    "--baud",
+    type=click.IntRange(min=1),
+    default=115200,
+    show_default=True,
+    help="The baud rate to connect at, which the programmer starts at after a reset.",
+)
+@click.option(
+    "--baud-rates",
+    type=BaudRates(),
+    help=(
+        "Comma separated faster baud rates to switch to after connecting, E.g. "
+        "1000000,500000. The highest rate at which the link works is used."
+    ),
+)
+@click.option(
+    "--baud-cache",
+    envvar="EEPROM_BAUD_CACHE",
+    type=click.Path(dir_okay=False),
+    help="Remember the highest baud rate that worked with each port in this file.",
+)
+@click.option(
+    "--binary/--ascii",
+    default=False,
+    help="Transfer blocks as binary frames when the programmer supports them.",
+)
+@click.option(
+    "--compress/--no-compress",
+    default=False,
+    help=(
+        "Run-length encode the data of range and page transfers when the programmer "
+        "supports it, and print the compression ratio to STDERR."
+    ),
+)
+@click.option(
+    "--checksums/--no-checksums",
+    default=False,
+    help=(
+        "Check binary frames with a CRC16 when the programmer supports it, sending "
+        "damaged frames again, and print the number sent again to STDERR."
+    ),
+)
+@click.option(
+    "--max-retries",
+    type=click.IntRange(min=0),
+    default=3,
+    show_default=True,
+    help="The number of times a damaged frame is sent again before giving up.",
+)
+@click.option(
+    "--window",
+    type=click.IntRange(min=1),
+    default=1,
+    help="The maximum number of block commands to send before waiting for responses.",
+)
+@click.option(
+    "--reset/--no-reset",
+    default=True,
+    help="Reset the programmer when connecting, or connect to it while running.",
+)
+@click.option(
+    "--shadow-cache",
+    envvar="EEPROM_SHADOW_CACHE",
+    type=click.Path(file_okay=False),
+    help="Keep the last known contents of EEPROMs in this directory to avoid reading them.",
+)
+@click.option(
+    "--journal",
+    envvar="EEPROM_JOURNAL",
+    type=click.Path(dir_okay=False),
+    help="Record the progress of writes in this file so they can be resumed.",
+)
+@click.option(
+    "--daemon",
+    "daemon_socket",
+    envvar="EEPROM_DAEMON",
+    type=click.Path(),
+    help="Carry out commands through the daemon listening on this socket.",
+)
+@click.pass_context
+def cli(
+    ctx,
+    port,
+    baud,
+    baud_rates,
+    baud_cache,
+    binary,
+    compress,
+    checksums,
+    max_retries,
+    window,
+    reset,
+    shadow_cache,
+    journal,
+    daemon_socket,
+):
     """Handle commands."""
-    pass
+    ctx.obj = {
+        "port": port,
+        "baud": baud,
+        "baud_rates": baud_rates,
+        "baud_cache": baud_cache,
+        "binary": binary,
+        "compress": compress,
+        "checksums": checksums,
+        "max_retries": max_retries,
+        "window": window,
+        "reset": reset,
+        "shadow_cache": shadow_cache,
+        "journal": journal,
+        "daemon_socket": daemon_socket,
+    }
+
+
+def connect(options, **kwargs):
+    """
+    Return a programmer, or a connection to the daemon if one is in use.
+
+    It is disconnected when the command finishes, which returns the programmer to
+    the baud rate it was connected at.
+    """
+    options = dict(options, **kwargs)
+    daemon_socket = options.pop("daemon_socket")
+    if daemon_socket:
+        programmer = daemon.RemoteProgrammer(daemon_socket)
+    else:
+        programmer = Programmer(**options)
+    click.get_current_context().call_on_close(programmer.disconnect)
+    return programmer
 
 
 @click.command()
@@ -37,9 +191,10 @@ def version():
 @click.option(
     "--address", "-a", type=HexInt(), help="The address to read in hex. E.g 2F0A"
 )
-def read_byte(address):
+@click.pass_obj
+def read_byte(options, address):
     """Read a byte from the EEPROM."""
-    programmer = Programmer()
+    programmer = connect(options)
     byte = programmer.read_byte(address)
     click.echo(f"{byte:02X}")
 
@@ -49,70 +204,594 @@ def read_byte(address):
     "--address", "-a", type=HexInt(), help="The address to write to in hex. E.g 2F0A"
 )
 @click.option("--byte", "-b", type=HexInt(), help="The byte to write in hex. E.g E2")
-def write_byte(address, byte):
+@click.pass_obj
+def write_byte(options, address, byte):
     """Write a byte to the EEPROM."""
-    programmer = Programmer()
+    programmer = connect(options)
     byte = programmer.write_byte(address, byte)
 
 
+def timings_option(command):
+    """Add an option to print the write cycle times measured by the programmer."""
+    return click.option(
+        "--timings",
+        is_flag=True,
+        help="Print the write cycle times measured by the programmer to STDERR.",
+    )(command)
+
+
+def resume_option(command):
+    """Add an option to continue an interrupted write recorded in the journal."""
+    return click.option(
+        "--resume",
+        is_flag=True,
+        help=(
+            "Continue an interrupted write of the same file from the last block the "
+            "programmer confirmed, as recorded by --journal."
+        ),
+    )(command)
+
+
+def echo_timings(programmer):
+    """Print the write cycle times measured by the programmer to STDERR."""
+    stats = programmer.write_cycle_stats()
+    if stats is None:
+        click.echo("The programmer does not measure write cycle times.", err=True)
+    elif stats.count == 0:
+        click.echo("Write cycles: 0", err=True)
+    else:
+        click.echo(
+            (
+                f"Write cycles: {stats.count}, "
+                f"mean {programmer.write_cycle_time / 1000:.2f} ms, "
+                f"max {stats.max / 1000:.2f} ms, "
+                f"timeouts {stats.timeouts}"
+            ),
+            err=True,
+        )
+
+
+def echo_compression(programmer, before):
+    """
+    Print the compression of the data transferred since before to STDERR.
+
+    Nothing is printed if no data was run-length encoded.
+
+    Args:
+        programmer (Programmer): The programmer the data was transferred with.
+        before (CompressionStats): The programmer's compression_stats before the
+            transfer.
+
+    """
+    stats = programmer.compression_stats.since(before)
+    if stats.ratio is not None:
+        click.echo(
+            (
+                f"Compressed {stats.data_bytes} bytes to {stats.encoded_bytes} "
+                f"bytes, ratio {stats.ratio:.2f}"
+            ),
+            err=True,
+        )
+
+
+def echo_retries(programmer, before):
+    """
+    Print the number of damaged frames sent again since before to STDERR.
+
+    Nothing is printed if no frames were sent again.
+
+    Args:
+        programmer (Programmer): The programmer the data was transferred with.
+        before (int): The programmer's frame_retries before the transfer.
+
+    """
+    retries = programmer.frame_retries - before
+    if retries:
+        click.echo(f"Sent {retries} damaged frames again", err=True)
+
+
+def image_options(command):
+    """Add options for the format of an image file and the address it starts at."""
+    command = click.option(
+        "--offset",
+        type=HexInt(),
+        default="0",
+        help=(
+            "Added to each address of the file in hex, which may be negative. E.g. "
+            "-8000 to write an image built for 8000 - FFFF to the start of the EEPROM."
+        ),
+    )(command)
+    return click.option(
+        "--format",
+        "file_format",
+        type=click.Choice(image.FORMATS),
+        default="auto",
+        show_default=True,
+        help=(
+            "The format of the file. auto chooses Intel HEX or S-record from the "
+            "file's extension and binary otherwise."
+        ),
+    )(command)
+
+
+def read_image(binary_file, file_format="auto", offset=0):
+    """
+    Return the regions of the EEPROM given by an image file.
+
+    A binary file gives a single region starting at offset. Intel HEX and S-record
+    files are parsed a line at a time and give a region for each run of consecutive
+    addresses in the file.
+
+    Args:
+        binary_file (file): The image file, opened in binary mode.
+
+    Kwargs:
+        file_format (str): One of image.FORMATS. Default: "auto".
+        offset (int): Added to each address of the file. Default: 0.
+
+    Returns:
+        list(Region): The address and data of each region, in order of address.
+
+    """
+    file_format = image_format(binary_file, file_format)
+    if file_format == "ihex":
+        return image.regions(image.parse_intel_hex(binary_file), offset)
+    if file_format == "srec":
+        return image.regions(image.parse_srecord(binary_file), offset)
+    data = file_contents(binary_file)
+    return [image.Region(offset, data)] if len(data) else []
+
+
+def image_format(binary_file, file_format):
+    """Return the format of an image file, choosing it from its name if "auto"."""
+    if file_format == "auto":
+        return image.detect_format(getattr(binary_file, "name", ""))
+    return file_format
+
+
 @click.command()
 @click.argument("binary_file", type=click.File("rb"))
-def write(binary_file):
-    """Write a binary file to the EEPROM."""
-    programmer = Programmer()
-    programmer.write(binary_file.read())
+@image_options
+@click.option(
+    "--skip-fill",
+    type=HexInt(),
+    help=(
+        "A fill byte in hex, E.g. FF. If the EEPROM holds only this byte, only the "
+        "parts of the file which differ from it are written."
+    ),
+)
+@resume_option
+@timings_option
+@click.pass_obj
+def write(options, binary_file, file_format, offset, skip_fill, resume, timings):
+    """
+    Write a binary, Intel HEX or S-record file to the EEPROM.
+
+    Only the addresses given by an Intel HEX or S-record file are written.
+
+    With --skip-fill the EEPROM is checked for blankness first, without reading it if
+    its contents are known or the programmer can calculate CRCs. If it is blank only
+    the runs of the file which are not the fill byte are written, and the number of
+    bytes written is printed to STDERR.
+
+    With --journal the progress of the write is recorded until it completes. If it is
+    interrupted, running it again with --resume checks the last block written still
+    matches the file and continues after it, printing the number of bytes written to
+    STDERR.
+    """
+    programmer = connect(options)
+    before = programmer.compression_stats
+    retries = programmer.frame_retries
+    if (
+        skip_fill is None
+        and not resume
+        and regular_file(binary_file) is None
+        and image_format(binary_file, file_format) == "binary"
+    ):
+        programmer.write_stream(read_chunks(binary_file), start_address=offset)
+    else:
+        regions = read_image(binary_file, file_format, offset)
+        written = programmer.write_regions(regions, skip_fill=skip_fill, resume=resume)
+        if skip_fill is not None or resume:
+            total = sum(len(data) for _, data in regions)
+            click.echo(f"Wrote {written} of {total} bytes", err=True)
+    echo_compression(programmer, before)
+    echo_retries(programmer, retries)
+    if timings:
+        echo_timings(programmer)
 
 
 @click.command()
-def read():
-    """Read the contents of the EEPROM and print it a file."""
-    programmer = Programmer()
-    data = programmer.read()
-    click.echo(bytes(data), nl=False)
+@click.option(
+    "--output",
+    "-o",
+    type=click.File("wb"),
+    default="-",
+    help="The file to write the contents to. Default: STDOUT.",
+)
+@click.pass_obj
+def read(options, output):
+    """
+    Read the contents of the EEPROM and print it a file.
+
+    Each block is written as soon as it is read, so the output can be processed while
+    the rest of the EEPROM is read.
+    """
+    programmer = connect(options)
+    before = programmer.compression_stats
+    retries = programmer.frame_retries
+    for block in programmer.iter_read():
+        output.write(block)
+        output.flush()
+    echo_compression(programmer, before)
+    echo_retries(programmer, retries)
 
 
 @click.command()
 @click.argument("binary_file", type=click.File("rb"))
-def verify(binary_file):
+@image_options
+@click.pass_obj
+def verify(options, binary_file, file_format, offset):
     """
-    Verify the contents of the EEPROM match a binary file.
+    Verify the contents of the EEPROM match a binary, Intel HEX or S-record file.
 
     If the contents match the program will exit with 0.
 
     Otherwise a list of differences will be printed to STDOUT and the program will
     exit with 1.
+
+    Only the addresses given by an Intel HEX or S-record file are compared. If the
+    programmer can calculate CRCs the CRC of the EEPROM is compared with the file's,
+    and only the parts of the EEPROM that differ are read.
     """
-    programmer = Programmer()
-    expected_data = list(binary_file.read())
-    found_data = programmer.read()
-    if expected_data != found_data:
-        for address, expected in enumerate(expected_data):
-            found = found_data[address]
-            if found != expected:
-                click.echo(f"{address:04X} expected {expected:02X} found {found:02X}")
+    programmer = connect(options)
+    before = programmer.compression_stats
+    retries = programmer.frame_retries
+    mismatched = False
+    regions = read_image(binary_file, file_format, offset)
+    for address, expected, found in differences(programmer, regions):
+        click.echo(f"{address:04X} expected {expected:02X} found {found:02X}")
+        mismatched = True
+    echo_compression(programmer, before)
+    echo_retries(programmer, retries)
+    if mismatched:
         exit(1)
 
 
+def differences(programmer, regions):
+    """
+    Yield the differences between the contents of the EEPROM and regions of data.
+
+    If the programmer can calculate CRCs only the parts of the EEPROM that differ
+    are read.
+
+    Args:
+        programmer (Programmer): The programmer to read the EEPROM with.
+        regions (iterable(Region)): The address and data expected on the EEPROM of
+            each region.
+
+    Yields:
+        tuple(int, int, int): The address, expected byte and found byte of each
+            difference.
+
+    """
+    for region_start, expected_data in regions:
+        if programmer.crc_checking:
+            ranges = programmer.differing_ranges(
+                expected_data, start_address=region_start
+            )
+        else:
+            ranges = [(region_start, region_start + len(expected_data))]
+        for start, end in ranges:
+            found_data = programmer.read_bytes(start, end - 1)
+            expected_range = expected_data[start - region_start : end - region_start]
+            for address, expected in enumerate(expected_range, start):
+                found = found_data[address - start]
+                if found != expected:
+                    yield address, expected, found
+
+
+@click.command()
+@click.argument("binary_file", type=click.File("rb"))
+@image_options
+@resume_option
+@timings_option
+@click.pass_obj
+def update(options, binary_file, file_format, offset, resume, timings):
+    """
+    Update the contents of the EEPROM with a binary, Intel HEX or S-record file.
+
+    This will overwrite any data on the EEPROM that does not match the provided file.
+    Only the addresses given by an Intel HEX or S-record file are compared. The bytes
+    which differ are covered by the mix of byte, block, range and page writes
+    estimated to take the least time, given the time taken to send each command and
+    the write cycles it takes. The estimated and actual time taken by the writes are
+    printed to STDERR.
+
+    If the contents of the EEPROM are in the shadow cache they are compared with the
+    file without reading the EEPROM. If the programmer can hash blocks of the EEPROM
+    only the hashes are transferred to find the blocks that differ, which are
+    rewritten in full. Otherwise the EEPROM is read first. When the existing contents
+    are similar to the contents of the file this is much quicker than write command,
+    however when they differ greatly the extra time taken to read the EEPROM should be
+    taken into account.
+
+    With --journal and --resume an interrupted update continues after the last block
+    the programmer confirmed, and only the rest of the EEPROM is compared.
+    """
+    programmer = connect(options)
+    before = programmer.compression_stats
+    retries = programmer.frame_retries
+    existing_data = programmer.known_contents()
+    plans = []
+    for address, data in read_image(binary_file, file_format, offset):
+        end = address + len(data)
+        resumed = programmer.resume_address(data, address) if resume else address
+        runs = []
+        if resumed < end:
+            runs = changed_region_runs(
+                programmer, resumed, data[resumed - address :], existing_data
+            )
+        plan = programmer.plan_writes(runs, start_address=resumed, end_address=end)
+        plans.append((address, data, plan))
+    writes = [write for _, _, plan in plans for write in plan.writes]
+    start = time.perf_counter()
+    for address, data, plan in plans:
+        programmer.write_plan(data, plan.writes, start_address=address, save=False)
+        programmer.remember_contents(data, start_address=address, save=False)
+    programmer.save_contents()
+    elapsed = time.perf_counter() - start
+    click.echo(
+        (
+            f"Planned {len(writes)} writes of "
+            f"{sum(write.length for write in writes)} bytes, "
+            f"estimated {sum(plan.cost for _, _, plan in plans) / 1000:.2f} ms, "
+            f"took {elapsed * 1000:.2f} ms"
+        ),
+        err=True,
+    )
+    echo_compression(programmer, before)
+    echo_retries(programmer, retries)
+    if timings:
+        echo_timings(programmer)
+
+
+def changed_region_runs(programmer, address, data, existing_data=None):
+    """
+    Return the runs of a region of the EEPROM which differ from data.
+
+    Args:
+        programmer (Programmer): The programmer to compare the EEPROM with.
+        address (int): The address of the start of the region.
+        data (bytes-like): The data the region should hold.
+
+    Kwargs:
+        existing_data (bytes-like): The known contents of the EEPROM, if any.
+            Otherwise block hashes are compared if the programmer can calculate
+            them, or the region is read.
+
+    Returns:
+        list(tuple(int, int)): The start and end (exclusive) address of each run.
+
+    """
+    block_size = programmer.write_size
+    if existing_data is not None:
+        runs = planner.changed_runs(data, existing_data[address : address + len(data)])
+    elif programmer.block_hashing:
+        hashes = programmer.block_hashes(address, len(data), block_size)
+        runs = changed_hash_ranges(data, hashes, block_size)
+    else:
+        existing_data = programmer.read_bytes(address, address + len(data) - 1)
+        runs = planner.changed_runs(data, existing_data)
+    return [(address + start, address + end) for start, end in runs]
+
+
+def regular_file(binary_file):
+    """Return the file descriptor of a file if it is a non-empty regular file."""
+    try:
+        fileno = binary_file.fileno()
+        status = os.fstat(fileno)
+    except OSError:
+        return None
+    return fileno if stat.S_ISREG(status.st_mode) and status.st_size else None
+
+
+def file_contents(binary_file):
+    """
+    Return the contents of a binary file.
+
+    Regular files are mapped into memory rather than read. Other files, such as
+    pipes, are read in full.
+    """
+    fileno = regular_file(binary_file)
+    if fileno is None:
+        return binary_file.read()
+    return memoryview(mmap.mmap(fileno, 0, access=mmap.ACCESS_READ))
+
+
+def read_chunks(binary_file, size=4096):
+    """Return an iterator of the data in a file as it becomes available."""
+    read = getattr(binary_file, "read1", binary_file.read)
+    return iter(lambda: read(size), b"")
+
+
+def changed_hash_ranges(new_data, existing_hashes, block_size):
+    """
+    Return the ranges of blocks of data which do not match a list of block hashes.
+
+    Consecutive blocks which differ are combined into one range.
+
+    Args:
+        new_data (bytes-like): The data to compare.
+        existing_hashes (list(int)): The hash of each block of the data to compare
+            against, as returned by Programmer.block_hashes.
+        block_size (int): The number of bytes in each block compared.
+
+    Returns:
+        list(tuple(int, int)): The start and end (exclusive) of each range.
+
+    """
+    return combine_ranges(
+        (address, address + len(block))
+        for (address, block), existing_hash in zip(
+            blocks(new_data, block_size), existing_hashes
+        )
+        if commands.BlockHashes.hash(block) != existing_hash
+    )
+
+
+def blocks(data, block_size):
+    """Yield the address and contents of each block of data."""
+    for address in range(0, len(data), block_size):
+        yield address, data[address : address + block_size]
+
+
+def combine_ranges(ranges):
+    """Return a list of ranges with ranges that meet combined."""
+    combined = []
+    for start, end in ranges:
+        if combined and combined[-1][1] == start:
+            combined[-1] = (combined[-1][0], end)
+        else:
+            combined.append((start, end))
+    return combined
+
+
+@click.command()
+@click.option(
+    "--socket",
+    "socket_path",
+    type=click.Path(),
+    default=daemon.DEFAULT_SOCKET,
+    show_default=True,
+    help="The Unix socket to listen on.",
+)
+@click.pass_obj
+def serve(options, socket_path):
+    """
+    Hold the connection to the programmer and carry out commands from other calls.
+
+    Other commands use the daemon when passed --daemon with the same socket, or when
+    the EEPROM_DAEMON environment variable is set to it. The serial port is locked
+    while the daemon is running.
+    """
+    programmer = connect(options, daemon_socket=None, exclusive=True)
+    click.echo(f"Listening on {socket_path}", err=True)
+    daemon.serve(programmer, socket_path)
+
+
+@click.command()
+@click.option(
+    "--image",
+    "image_file",
+    type=click.File("rb"),
+    help="A binary file to load into the simulated EEPROM.",
+)
+@click.option(
+    "--write-cycle-time",
+    type=float,
+    default=3.0,
+    show_default=True,
+    help="The time taken by each write cycle in milliseconds.",
+)
+@click.option(
+    "--realtime/--no-realtime",
+    default=True,
+    help="Take as long as the programmer would, or respond as quickly as possible.",
+)
+def simulate(image_file, write_cycle_time, realtime):
+    """
+    Simulate a programmer on a pseudo terminal.
+
+    The path of the pseudo terminal is printed. Other commands use the simulator
+    when passed it with --port and --no-reset.
+    """
+    programmer = simulator.Simulator(
+        image=image_file.read() if image_file else b"",
+        write_cycle_time=write_cycle_time / 1000,
+        realtime=realtime,
+    )
+    master, slave, path = simulator.open_pty()
+    click.echo(path)
+    simulator.serve_pty(programmer, master)
+    os.close(slave)
+    os.close(master)
+
+
+@click.command()
+@click.argument("binary_file", type=click.File("rb"))
+@click.argument("ports", nargs=-1, required=True)
+@image_options
+@click.pass_obj
+def gang_write(options, binary_file, ports, file_format, offset):
+    """
+    Write a binary file to the EEPROMs of several programmers at once.
+
+    The result and throughput for each port is printed. If writing to any of them
+    fails the others are written and the program exits with 1.
+    """
+    regions = read_image(binary_file, file_format, offset)
+
+    def operation(programmer):
+        return programmer.write_regions(regions)
+
+    echo_gang_results(gang.run(ports, operation, **gang_options(options)))
+
+
 @click.command()
 @click.argument("binary_file", type=click.File("rb"))
-def update(binary_file):
+@click.argument("ports", nargs=-1, required=True)
+@image_options
+@click.pass_obj
+def gang_verify(options, binary_file, ports, file_format, offset):
     """
-    Update the contents of the EEPROM with the contents of a binary file.
+    Verify the EEPROMs of several programmers at once match a binary file.
 
-    This will read the EEPROM and overwrite any data that does not match the provided
-    file. This is done in blocks of 16 addresses. When the existing contents are similar
-    to the contents of the file this is much quicker than write command, however when
-    they differ greatly the extra time taken to read the EEPROM should be taken into
-    account.
+    The result and throughput for each port is printed. If any of them do not match
+    the program exits with 1.
     """
-    programmer = Programmer()
-    new_data = list(binary_file.read())
-    existing_data = programmer.read()
-    for address in range(0, len(new_data), 16):
-        new_block = new_data[address : address + 16]
-        existing_block = existing_data[address : address + 16]
-        if new_block != existing_block:
-            programmer.write_block(address, new_block)
+    regions = read_image(binary_file, file_format, offset)
+
+    def operation(programmer):
+        mismatches = [address for address, _, _ in differences(programmer, regions)]
+        if mismatches:
+            raise ValueError(
+                f"{len(mismatches)} bytes differ, the first at {mismatches[0]:04X}."
+            )
+        return sum(len(data) for _, data in regions)
+
+    echo_gang_results(gang.run(ports, operation, **gang_options(options)))
+
+
+def gang_options(options):
+    """Return the options for the programmer on each port of a gang."""
+    keys = (
+        "baud",
+        "baud_rates",
+        "baud_cache",
+        "binary",
+        "compress",
+        "checksums",
+        "max_retries",
+        "window",
+        "reset",
+    )
+    return {key: options[key] for key in keys}
+
+
+def echo_gang_results(results):
+    """Print the result for each port of a gang and exit with 1 if any failed."""
+    for result in results:
+        if result.error is None:
+            rate = result.data_bytes / result.seconds
+            click.echo(
+                f"{result.port}: OK, {result.data_bytes} bytes in "
+                f"{result.seconds:.2f} s ({rate:.0f} bytes/s)"
+            )
+        else:
+            click.echo(f"{result.port}: FAILED, {result.error}")
+    if any(result.error is not None for result in results):
+        exit(1)
 
 
 cli.add_command(version)
@@ -122,3 +801,7 @@ cli.add_command(write)
 cli.add_command(read)
 cli.add_command(verify)
 cli.add_command(update)
+cli.add_command(serve)
+cli.add_command(simulate)
+cli.add_command(gang_write)
+cli.add_command(gang_verify)
@@ -0,0 +1,490 @@
+"""
+A daemon which holds the connection to the programmer between CLI calls.
+
+The daemon owns a Programmer and accepts operations from clients over a Unix socket.
+Each message is a line of JSON followed by an optional block of raw data, the length
+of which is given by the "length" key of the JSON.
+
+Streamed data is sent as a message per chunk. A request with "chunks" set is followed
+by a message for each chunk of its data and an empty message. A method which yields
+blocks is answered with a message for each block with "more" set, then a final
+message with the result or error.
+"""
+
+import json
+import os
+import socket
+import socketserver
+import tempfile
+import threading
+
+from .planner import Plan, PlannedWrite
+from .programmer_commands import WriteCycleStats
+from .rle import CompressionStats
+
+DEFAULT_SOCKET = os.path.join(
+    os.environ.get("XDG_RUNTIME_DIR", tempfile.gettempdir()), "eeprom.sock"
+)
+
+# Methods clients may call mapped to the position of their data argument, if any.
+METHODS = {
+    "read_byte": None,
+    "write_byte": None,
+    "read_block": None,
+    "write_block": 1,
+    "read": None,
+    "read_bytes": None,
+    "iter_read": None,
+    "write": 0,
+    "write_stream": 0,
+    "write_cycle_stats": None,
+    "block_hashes": None,
+    "range_crc": None,
+    "differing_ranges": 0,
+    "known_contents": None,
+    "remember_contents": 0,
+    "save_contents": None,
+    "plan_writes": None,
+    "write_plan": 0,
+    "is_blank": None,
+    "resume_address": 0,
+}
+# Methods which return bytes, which are sent as raw data.
+DATA_RESULTS = ("read_block", "read", "read_bytes", "known_contents")
+# Methods which return an iterator of bytes, which are sent as they are yielded.
+STREAM_RESULTS = ("iter_read",)
+ATTRIBUTES = (
+    "write_size",
+    "write_cycle_time",
+    "block_hashing",
+    "crc_checking",
+    "compression",
+    "compression_stats",
+    "frame_checking",
+    "frame_retries",
+)
+
+
+class FairLock:
+    """A lock which is granted to waiting threads in the order they asked for it."""
+
+    def __init__(self):
+        """Create an unlocked lock."""
+        self._condition = threading.Condition()
+        self._next_ticket = 0
+        self._serving = 0
+
+    def __enter__(self):
+        """Wait for every earlier caller to release the lock, then take it."""
+        with self._condition:
+            ticket = self._next_ticket
+            self._next_ticket += 1
+            self._condition.wait_for(lambda: self._serving == ticket)
+
+    def __exit__(self, *exc_info):
+        """Release the lock to the next caller."""
+        with self._condition:
+            self._serving += 1
+            self._condition.notify_all()
+
+
+def send_message(stream, header, data=None):
+    """
+    Send a message over a socket.
+
+    Args:
+        stream (socket.socket): The socket to send to.
+        header (dict): The JSON part of the message.
+
+    Kwargs:
+        data (bytes-like): Raw data sent after the header without being copied.
+
+    """
+    data = memoryview(data) if data is not None else memoryview(b"")
+    header = dict(header, length=data.nbytes)
+    stream.sendall(json.dumps(header).encode("utf8") + b"\n")
+    if data.nbytes:
+        stream.sendall(data)
+
+
+def error_response(error):
+    """Return the response header reporting an error, named unless a ValueError."""
+    if isinstance(error, ValueError):
+        return {"error": str(error)}
+    return {"error": f"{type(error).__name__}: {error}"}
+
+
+def recieve_chunks(stream):
+    """Yield the data of chunk messages from a file-like socket until an empty one."""
+    while True:
+        _, data = recieve_message(stream)
+        if not data:
+            return
+        yield data
+
+
+def recieve_message(stream):
+    """
+    Return the header and data of a message recieved from a file-like socket.
+
+    The data is read directly into a preallocated bytearray.
+
+    Raises:
+        ConnectionError if the connection closes part way through a message.
+
+    """
+    line = stream.readline()
+    if not line:
+        raise ConnectionError("Connection closed.")
+    header = json.loads(line)
+    data = bytearray(header["length"])
+    view = memoryview(data)
+    offset = 0
+    while offset < len(data):
+        size = stream.readinto(view[offset:])
+        if not size:
+            raise ConnectionError("Connection closed.")
+        offset += size
+    return header, data
+
+
+class ProgrammerRequestHandler(socketserver.StreamRequestHandler):
+    """Handles the operations sent by one client."""
+
+    def handle(self):
+        """Carry out operations until the client disconnects."""
+        while True:
+            try:
+                header, data = recieve_message(self.rfile)
+                with self.server.lock:
+                    self.respond(header, data)
+            except ConnectionError:
+                return
+
+    def respond(self, header, data):
+        """Carry out an operation and send its response."""
+        if not header.get("chunks"):
+            response, response_data = self.server.dispatch(header, data)
+        else:
+            chunks = recieve_chunks(self.rfile)
+            response, response_data = self.server.dispatch(header, chunks)
+            for _ in chunks:
+                pass
+        if not response.get("stream"):
+            send_message(self.request, response, response_data)
+            return
+        try:
+            for block in response_data:
+                send_message(self.request, {"result": None, "more": True}, block)
+        except Exception as error:
+            send_message(self.request, error_response(error))
+        else:
+            send_message(self.request, {"result": None})
+        finally:
+            response_data.close()
+
+
+class ProgrammerServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """Serves operations on a Programmer to clients connected to a Unix socket."""
+
+    daemon_threads = True
+
+    def __init__(self, socket_path, programmer):
+        """
+        Create a server listening on socket_path.
+
+        Args:
+            socket_path (str): The path of the Unix socket to listen on.
+            programmer (Programmer): The programmer to carry out operations with.
+
+        """
+        self.programmer = programmer
+        self.lock = FairLock()
+        if os.path.exists(socket_path):
+            os.unlink(socket_path)
+        super().__init__(socket_path, ProgrammerRequestHandler)
+
+    def dispatch(self, header, data):
+        """
+        Return the response header and data for a request.
+
+        Any error raised by the request is returned to the client, so a bad request
+        does not end the connection.
+        """
+        try:
+            if "attribute" in header:
+                return self.get_attribute(header["attribute"]), None
+            return self.call(header["method"], header["args"], header["kwargs"], data)
+        except Exception as error:
+            return error_response(error), None
+
+    def get_attribute(self, name):
+        """Return the response to a request for an attribute of the programmer."""
+        if name not in ATTRIBUTES:
+            raise ValueError(f"Unknown attribute {name}.")
+        return {"result": getattr(self.programmer, name)}
+
+    def call(self, name, args, kwargs, data):
+        """Return the response to a request to call a programmer method."""
+        if name not in METHODS:
+            raise ValueError(f"Unknown method {name}.")
+        if METHODS[name] is not None:
+            args.insert(METHODS[name], data)
+        result = getattr(self.programmer, name)(*args, **kwargs)
+        if name in STREAM_RESULTS:
+            return {"stream": True}, iter(result)
+        if name in DATA_RESULTS and result is not None:
+            return {"result": None, "data": True}, bytes(result)
+        return {"result": result}, None
+
+    def server_close(self):
+        """Stop listening and remove the socket."""
+        super().server_close()
+        if os.path.exists(self.server_address):
+            os.unlink(self.server_address)
+
+
+def serve(programmer, socket_path=DEFAULT_SOCKET):
+    """
+    Serve operations on a programmer until interrupted.
+
+    Args:
+        programmer (Programmer): The programmer to carry out operations with.
+
+    Kwargs:
+        socket_path (str): The path of the Unix socket to listen on.
+
+    """
+    with ProgrammerServer(socket_path, programmer) as server:
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+
+
+class RemoteProgrammer:
+    """Carries out Programmer operations through a daemon."""
+
+    def __init__(self, socket_path=DEFAULT_SOCKET):
+        """
+        Connect to a daemon.
+
+        Kwargs:
+            socket_path (str): The path of the Unix socket the daemon listens on.
+
+        """
+        self.socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.socket.connect(socket_path)
+        self.stream = self.socket.makefile("rb")
+
+    def disconnect(self):
+        """Close the connection to the daemon."""
+        self.stream.close()
+        self.socket.close()
+
+    def request(self, header, data=None):
+        """Send a request to the daemon and return the result."""
+        send_message(self.socket, header, data)
+        return self.result()
+
+    def result(self):
+        """Return the result of the response to a request."""
+        response, response_data = recieve_message(self.stream)
+        if "error" in response:
+            raise ValueError(response["error"])
+        if response.get("data"):
+            return response_data
+        return response["result"]
+
+    def call(self, name, *args, data=None, **kwargs):
+        """Call a method of the daemon's programmer and return the result."""
+        if data is not None and not isinstance(data, (bytes, bytearray, memoryview)):
+            data = bytes(data)
+        return self.request(
+            {"method": name, "args": list(args), "kwargs": kwargs}, data
+        )
+
+    def read_byte(self, address):
+        """Return the byte stored in a particular address of the EEPROM."""
+        return self.call("read_byte", address)
+
+    def write_byte(self, address, byte):
+        """Write a byte to an address in the EEPROM."""
+        return self.call("write_byte", address, byte)
+
+    def read_block(self, address):
+        """Return a block of 16 consecutive bytes from the EEPROM."""
+        return list(self.call("read_block", address))
+
+    def write_block(self, address, data):
+        """Write a block of 16 consecutive bytes to the EEPROM."""
+        return self.call("write_block", address, data=data)
+
+    def read(self, start_address=None, end_address=None):
+        """Return a block of data from the EEPROM as a list."""
+        return list(self.call("read", start_address, end_address))
+
+    def read_bytes(self, start_address=None, end_address=None):
+        """Return a block of data from the EEPROM."""
+        return self.call("read_bytes", start_address, end_address)
+
+    def iter_read(self, start_address=None, end_address=None):
+        """
+        Yield the blocks of data read from the EEPROM as the daemon sends them.
+
+        If the iterator is closed early the rest of the blocks are recieved and
+        discarded, as the daemon reads until the end of the range.
+        """
+        header = {"method": "iter_read", "args": [start_address, end_address]}
+        send_message(self.socket, dict(header, kwargs={}))
+        finished = False
+        try:
+            while True:
+                response, block = recieve_message(self.stream)
+                if not response.get("more"):
+                    finished = True
+                    if "error" in response:
+                        raise ValueError(response["error"])
+                    return
+                yield bytes(block)
+        finally:
+            while not finished:
+                response, _ = recieve_message(self.stream)
+                finished = not response.get("more")
+
+    def write(self, data, start_address=None, skip_fill=None, resume=False):
+        """Write a block of data to the EEPROM and return the number of bytes written."""
+        return self.call(
+            "write",
+            data=data,
+            start_address=start_address,
+            skip_fill=skip_fill,
+            resume=resume,
+        )
+
+    def write_regions(self, regions, skip_fill=None, resume=False):
+        """Write each of a number of regions of data, each with its own request."""
+        return sum(
+            self.write(data, start_address=address, skip_fill=skip_fill, resume=resume)
+            for address, data in regions
+        )
+
+    def write_stream(self, chunks, start_address=None):
+        """Write data to the EEPROM, sending each chunk to the daemon as it is read."""
+        header = {"method": "write_stream", "args": [], "chunks": True}
+        send_message(self.socket, dict(header, kwargs={"start_address": start_address}))
+        try:
+            for chunk in chunks:
+                if len(chunk):
+                    send_message(self.socket, {}, chunk)
+        except BaseException:
+            send_message(self.socket, {})
+            recieve_message(self.stream)
+            raise
+        send_message(self.socket, {})
+        return self.result()
+
+    def write_cycle_stats(self):
+        """Return the write cycle times measured by the programmer."""
+        stats = self.call("write_cycle_stats")
+        return WriteCycleStats(*stats) if stats is not None else None
+
+    def block_hashes(self, address, length, block_size):
+        """Return the CRC16 of each block of a range of the EEPROM."""
+        return self.call("block_hashes", address, length, block_size)
+
+    def range_crc(self, address, length):
+        """Return the CRC32 of a range of the EEPROM."""
+        return self.call("range_crc", address, length)
+
+    def differing_ranges(self, data, start_address=None, block_size=64):
+        """Return the ranges of the EEPROM which do not match data."""
+        ranges = self.call(
+            "differing_ranges",
+            data=data,
+            start_address=start_address,
+            block_size=block_size,
+        )
+        return [tuple(_) for _ in ranges]
+
+    def is_blank(self, start_address=None, end_address=None, fill=0xFF):
+        """Return True if a range of the EEPROM holds only a fill byte."""
+        return self.call("is_blank", start_address, end_address, fill=fill)
+
+    def known_contents(self):
+        """Return the contents of the EEPROM if they are known without reading it."""
+        return self.call("known_contents")
+
+    def remember_contents(self, data, start_address=None, save=True):
+        """Record that part of the EEPROM holds data."""
+        return self.call(
+            "remember_contents", data=data, start_address=start_address, save=save
+        )
+
+    def save_contents(self):
+        """Save the known contents to the shadow cache, if they have changed."""
+        return self.call("save_contents")
+
+    def resume_address(self, data, start_address=None):
+        """Return the address from which an interrupted write of data can continue."""
+        return self.call("resume_address", data=data, start_address=start_address)
+
+    def plan_writes(self, runs, start_address=None, end_address=None):
+        """Return the cheapest commands with which to write runs of changed bytes."""
+        writes, cost = self.call(
+            "plan_writes",
+            [list(run) for run in runs],
+            start_address=start_address,
+            end_address=end_address,
+        )
+        return Plan([PlannedWrite(*write) for write in writes], cost)
+
+    def write_plan(self, data, writes, start_address=None, save=True):
+        """Write the parts of data chosen by a plan to the EEPROM."""
+        return self.call(
+            "write_plan",
+            [list(write) for write in writes],
+            data=data,
+            start_address=start_address,
+            save=save,
+        )
+
+    @property
+    def write_size(self):
+        """Return the number of bytes writes are aligned to."""
+        return self.request({"attribute": "write_size"})
+
+    @property
+    def write_cycle_time(self):
+        """Return the estimated time of a write cycle in microseconds."""
+        return self.request({"attribute": "write_cycle_time"})
+
+    @property
+    def block_hashing(self):
+        """Return True if the programmer can hash blocks of the EEPROM."""
+        return self.request({"attribute": "block_hashing"})
+
+    @property
+    def crc_checking(self):
+        """Return True if the programmer can calculate CRCs of the EEPROM."""
+        return self.request({"attribute": "crc_checking"})
+
+    @property
+    def compression(self):
+        """Return True if range and page data is run-length encoded."""
+        return self.request({"attribute": "compression"})
+
+    @property
+    def compression_stats(self):
+        """Return the bytes of data transferred run-length encoded."""
+        return CompressionStats(*self.request({"attribute": "compression_stats"}))
+
+    @property
+    def frame_checking(self):
+        """Return True if binary frames are checked with checksums."""
+        return self.request({"attribute": "frame_checking"})
+
+    @property
+    def frame_retries(self):
+        """Return the number of times damaged frames have been sent again."""
+        return self.request({"attribute": "frame_retries"})
@@ -9,6 +9,7 @@ class BaseEEPROM:
     max_address = 0xFFFF
     data_bits = 8
     max_byte = 0xFF
+    page_size = 1
 
     @classmethod
     def is_valid_address(cls, address):
@@ -21,6 +22,14 @@ class BaseEEPROM:
                 )
             )
 
+    @classmethod
+    def is_valid_page(cls, address, length):
+        """Raise ValueError if a range of addresses is not within a single page."""
+        if address // cls.page_size != (address + length - 1) // cls.page_size:
+            raise ValueError(
+                f"Range {address:04X} - {address + length - 1:04X} crosses a page boundary"
+            )
+
     @classmethod
     def is_valid_data(cls, data):
         """Raise ValueError if data is not a valid byte."""
@@ -33,6 +42,7 @@ class AT28C25(BaseEEPROM):
 
     name = "AT28C25"
     max_address = 0x7FFF
+    page_size = 64
 
 
 def get_EEPROM(name):
@@ -0,0 +1,57 @@
+"""
+Carry out the same operation with several programmers at once.
+
+Each programmer is connected to and operated by its own worker thread. The threads
+spend most of their time waiting on their serial ports, so the total throughput grows
+with the number of programmers.
+"""
+
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+from .programmer import Programmer
+
+GangResult = namedtuple("GangResult", "port error seconds data_bytes")
+
+
+def run(ports, operation, **kwargs):
+    """
+    Carry out an operation with the programmer on each of several ports at once.
+
+    An error on one port is recorded in its result and does not stop the others.
+
+    Args:
+        ports (iterable(str)): The serial ports of the programmers.
+        operation (callable): Called with the Programmer for each port. Returns the
+            number of bytes of data it transferred. Raises ValueError or OSError if
+            it fails.
+
+    Kwargs:
+        Passed on to Programmer.
+
+    Returns:
+        list(GangResult): The result for each port, in the order of ports. error is
+            None if the operation succeeded and the error's message otherwise.
+
+    """
+    ports = list(ports)
+    with ThreadPoolExecutor(max_workers=max(len(ports), 1)) as executor:
+        return list(
+            executor.map(lambda port: run_port(port, operation, **kwargs), ports)
+        )
+
+
+def run_port(port, operation, **kwargs):
+    """Carry out an operation with the programmer on a port and return its result."""
+    start = time.perf_counter()
+    try:
+        programmer = Programmer(port=port, **kwargs)
+        try:
+            data_bytes = operation(programmer)
+        finally:
+            programmer.disconnect()
+    except (ValueError, OSError) as error:
+        message = str(error) or type(error).__name__
+        return GangResult(port, message, time.perf_counter() - start, 0)
+    return GangResult(port, None, time.perf_counter() - start, data_bytes)
@@ -0,0 +1,175 @@
+"""
+Read EEPROM images from Intel HEX and Motorola S-record files.
+
+Both formats give the address of each record of data, so an image need not cover the
+whole EEPROM. The records are parsed a line at a time and combined into a sparse map
+of regions, each a run of consecutive addresses, so that only the addresses the image
+gives are written or verified.
+"""
+
+import os
+from collections import namedtuple
+
+Region = namedtuple("Region", "address data")
+
+FORMATS = ("auto", "binary", "ihex", "srec")
+EXTENSIONS = {
+    ".hex": "ihex",
+    ".ihex": "ihex",
+    ".ihx": "ihex",
+    ".srec": "srec",
+    ".s19": "srec",
+    ".s28": "srec",
+    ".s37": "srec",
+    ".mot": "srec",
+}
+# The number of address bytes of each type of S-record.
+SRECORD_ADDRESS_SIZES = {
+    "0": 2,
+    "1": 2,
+    "2": 3,
+    "3": 4,
+    "5": 2,
+    "6": 3,
+    "7": 4,
+    "8": 3,
+    "9": 2,
+}
+
+
+def detect_format(path):
+    """Return the format of an image file from its extension, binary if unknown."""
+    return EXTENSIONS.get(os.path.splitext(str(path))[1].lower(), "binary")
+
+
+def parse_intel_hex(lines):
+    """
+    Yield the records of data in an Intel HEX file.
+
+    Extended segment and extended linear address records are applied to the
+    addresses of the data records which follow them. Parsing stops at the end of file
+    record.
+
+    Args:
+        lines (iterable(bytes)): The lines of the file.
+
+    Yields:
+        tuple(int, bytes): The address and data of each data record.
+
+    Raises:
+        ValueError if a line is not a valid record.
+
+    """
+    base = 0
+    for number, text in _lines(lines, b":"):
+        record = _hex(number, text)
+        if len(record) < 5 or len(record) != record[0] + 5 or sum(record) & 0xFF:
+            raise ValueError(f"Line {number}: invalid Intel HEX record.")
+        address, record_type, data = record[1:3], record[3], record[4:-1]
+        if record_type == 0x00:
+            yield base + int.from_bytes(address, "big"), data
+        elif record_type == 0x01:
+            return
+        elif record_type == 0x02:
+            base = int.from_bytes(data, "big") * 16
+        elif record_type == 0x04:
+            base = int.from_bytes(data, "big") << 16
+        elif record_type not in (0x03, 0x05):
+            raise ValueError(f"Line {number}: unknown record type {record_type:02X}.")
+
+
+def parse_srecord(lines):
+    """
+    Yield the records of data in a Motorola S-record file.
+
+    Header and count records are skipped. Parsing stops at the first termination
+    record.
+
+    Args:
+        lines (iterable(bytes)): The lines of the file.
+
+    Yields:
+        tuple(int, bytes): The address and data of each S1, S2 or S3 record.
+
+    Raises:
+        ValueError if a line is not a valid record.
+
+    """
+    for number, text in _lines(lines, b"S"):
+        record_type = text[:1].decode("ascii", "replace")
+        if record_type not in SRECORD_ADDRESS_SIZES:
+            raise ValueError(f"Line {number}: unknown record type S{record_type}.")
+        record = _hex(number, text[1:])
+        address_size = SRECORD_ADDRESS_SIZES[record_type]
+        if (
+            len(record) < address_size + 2
+            or record[0] != len(record) - 1
+            or sum(record) & 0xFF != 0xFF
+        ):
+            raise ValueError(f"Line {number}: invalid S-record.")
+        if record_type in "123":
+            address = int.from_bytes(record[1 : 1 + address_size], "big")
+            yield address, record[1 + address_size : -1]
+        elif record_type in "789":
+            return
+
+
+def _lines(lines, start):
+    for number, line in enumerate(lines, 1):
+        line = line.strip()
+        if not line:
+            continue
+        if not line.startswith(start):
+            raise ValueError(
+                f"Line {number}: expected a record starting {start.decode()}."
+            )
+        yield number, line[len(start) :]
+
+
+def _hex(number, text):
+    try:
+        return bytes.fromhex(text.decode("ascii"))
+    except ValueError:
+        raise ValueError(f"Line {number}: invalid hexadecimal.")
+
+
+def regions(records, offset=0):
+    """
+    Return the regions of consecutive addresses covered by records of data.
+
+    Args:
+        records (iterable(tuple(int, bytes-like))): The address and data of each
+            record.
+
+    Kwargs:
+        offset (int): Added to the address of each record. Default: 0.
+
+    Returns:
+        list(Region): The address and data of each region, in order of address.
+
+    Raises:
+        ValueError if records overlap or an address is below zero.
+
+    """
+    unsorted = []
+    for address, data in records:
+        address += offset
+        if address < 0:
+            raise ValueError(f"Address {address - offset:X} is below zero with offset.")
+        if unsorted and _end(unsorted[-1]) == address:
+            unsorted[-1].data.extend(data)
+        elif data:
+            unsorted.append(Region(address, bytearray(data)))
+    merged = []
+    for region in sorted(unsorted):
+        if merged and _end(merged[-1]) > region.address:
+            raise ValueError(f"Data overlaps at address {region.address:04X}.")
+        if merged and _end(merged[-1]) == region.address:
+            merged[-1].data.extend(region.data)
+        else:
+            merged.append(region)
+    return merged
+
+
+def _end(region):
+    return region.address + len(region.data)
@@ -0,0 +1,100 @@
+"""
+Record the progress of writes so that an interrupted write can be resumed.
+
+The journal is a JSON file holding the address ranges the programmer has confirmed
+writing for each write in progress. A write is identified by the port and a hash of
+the data and the address it is written to, so an entry is only used to resume the
+same image on the same programmer. Writes are made in order of address, so each
+range runs from the start of the data to the end of the last write the programmer
+acknowledged, and the data before it need not be written again. The entry is removed
+once the write completes.
+"""
+
+import hashlib
+import json
+import os
+from pathlib import Path
+
+
+def write_key(port, address, data):
+    """Return the key of the journal entry for writing data to an address."""
+    digest = hashlib.sha1(bytes(data)).hexdigest()[:16]
+    return f"{port} {address:04X} {digest}"
+
+
+class WriteJournal:
+    """Stores the confirmed address ranges of writes in progress in a JSON file."""
+
+    def __init__(self, path):
+        """
+        Create a journal.
+
+        Args:
+            path (str): The path of the JSON file. It is created, along with its
+                directory, when the first range is recorded.
+
+        """
+        self.path = Path(path)
+
+    def load(self):
+        """Return the entries of all writes, or an empty dict if none can be read."""
+        try:
+            entries = json.loads(self.path.read_text())
+        except (OSError, ValueError):
+            return {}
+        return entries if isinstance(entries, dict) else {}
+
+    def completed(self, key):
+        """
+        Return the address ranges confirmed written for a write.
+
+        Args:
+            key (str): The key of the write, as returned by write_key.
+
+        Returns:
+            list(tuple(int, int)): The start and end (exclusive) of each range, in
+                order. Empty if the write is not in the journal.
+
+        """
+        ranges = self.load().get(key)
+        if not isinstance(ranges, list):
+            return []
+        return [
+            tuple(_)
+            for _ in ranges
+            if isinstance(_, list)
+            and len(_) == 2
+            and all(isinstance(i, int) for i in _)
+        ]
+
+    def record(self, key, start, end):
+        """
+        Record that a range has been written, merging it with the ranges recorded.
+
+        Args:
+            key (str): The key of the write.
+            start (int): The first address written.
+            end (int): The end (exclusive) of the addresses written.
+
+        """
+        merged = []
+        for range_start, range_end in sorted(self.completed(key) + [(start, end)]):
+            if merged and range_start <= merged[-1][1]:
+                merged[-1][1] = max(merged[-1][1], range_end)
+            else:
+                merged.append([range_start, range_end])
+        entries = self.load()
+        entries[key] = merged
+        self._save(entries)
+
+    def remove(self, key):
+        """Remove the entry of a write which has completed."""
+        entries = self.load()
+        if entries.pop(key, None) is not None:
+            self._save(entries)
+
+    def _save(self, entries):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        temporary_path = self.path.with_suffix(".tmp")
+        temporary_path.write_text(json.dumps(entries, indent=2, sort_keys=True))
+        os.replace(temporary_path, self.path)
@@ -0,0 +1,212 @@
+"""
+Plan the cheapest commands with which to write the changes to the EEPROM.
+
+Each write command costs the time taken to send it and its response over the serial
+link plus the write cycles it takes. A byte or range written a byte at a time takes a
+write cycle per byte, so rewriting bytes which have not changed is expensive, while a
+page write takes one write cycle however many bytes it writes. The planner finds the
+exact runs of bytes which have changed and covers them with the mix of commands that
+is estimated to take the least time, rewriting unchanged bytes only where that is
+cheaper than sending another command.
+"""
+
+from bisect import bisect_right
+from collections import namedtuple
+
+from . import programmer_commands as commands
+
+PlannedWrite = namedtuple("PlannedWrite", "command address length")
+Plan = namedtuple("Plan", "writes cost")
+
+
+class CostModel:
+    """Estimates the time taken by the programmer to carry out write commands."""
+
+    BITS_PER_BYTE = 10
+
+    def __init__(
+        self, write_commands, baud=115200, write_cycle_time=10000, page_size=1
+    ):
+        """
+        Create a cost model.
+
+        Args:
+            write_commands (list(tuple)): A tuple of (command, min_length,
+                max_length) for each write command the programmer can use, where
+                command is a ProgrammerCommand and the lengths are the numbers of
+                bytes it can write.
+
+        Kwargs:
+            baud (int): The baud rate of the serial connection. Default: 115200.
+            write_cycle_time (float): The time taken by each write cycle in
+                microseconds. Default: 10000.
+            page_size (int): The number of bytes in a page of the EEPROM. Page writes
+                do not cross page boundaries. Default: 1.
+
+        """
+        self.write_commands = write_commands
+        self.baud = baud
+        self.write_cycle_time = write_cycle_time
+        self.page_size = page_size
+        self._costs = {}
+
+    @property
+    def byte_time(self):
+        """Return the microseconds taken to send a byte over the serial link."""
+        return self.BITS_PER_BYTE * 1000000 / self.baud
+
+    def cost(self, command, length):
+        """
+        Return the estimated time taken to write bytes with a command.
+
+        Args:
+            command (ProgrammerCommand): The write command.
+            length (int): The number of bytes written.
+
+        Returns:
+            float: The time in microseconds.
+
+        """
+        if (command, length) not in self._costs:
+            serial_bytes = request_length(command, length) + response_length(command)
+            self._costs[command, length] = (
+                serial_bytes * self.byte_time
+                + write_cycles(command, length) * self.write_cycle_time
+            )
+        return self._costs[command, length]
+
+    def max_length(self, command, max_length, address):
+        """Return the most bytes a command can write starting at an address."""
+        if issubclass(command, commands.WritePage):
+            return min(max_length, self.page_size - address % self.page_size)
+        return max_length
+
+
+def request_length(command, length):
+    """Return the number of bytes sent to write bytes with a command."""
+    if command is commands.WriteByte:
+        return len(command.format_request(0, 0))
+    # Data without runs, so that run-length encoded commands are costed at their
+    # longest.
+    return len(command.format_request(0, bytes(i % 256 for i in range(length))))
+
+
+def response_length(command):
+    """Return the number of bytes recieved in reply to a write command."""
+    if issubclass(command, commands.BinaryCommand):
+        return 2
+    return len(command.SUCCESS_MESSAGE) + 2
+
+
+def write_cycles(command, length):
+    """Return the number of write cycles taken to write bytes with a command."""
+    if issubclass(command, (commands.WriteByte, commands.WritePage)):
+        return 1
+    return length
+
+
+def changed_runs(new_data, existing_data, block_size=16):
+    """
+    Return the runs of consecutive bytes which differ between two sets of data.
+
+    Blocks are compared first, so only the bytes of blocks which differ are compared
+    one at a time.
+
+    Args:
+        new_data (bytes-like): The data to compare.
+        existing_data (bytes-like): The data to compare against.
+
+    Kwargs:
+        block_size (int): The number of bytes compared at once. Default: 16.
+
+    Returns:
+        list(tuple(int, int)): The start and end (exclusive) of each run.
+
+    """
+    runs = []
+    for block_start in range(0, len(new_data), block_size):
+        block_end = min(block_start + block_size, len(new_data))
+        if new_data[block_start:block_end] == existing_data[block_start:block_end]:
+            continue
+        for address in range(block_start, block_end):
+            if new_data[address] == existing_data[address]:
+                continue
+            if runs and runs[-1][1] == address:
+                runs[-1] = (runs[-1][0], address + 1)
+            else:
+                runs.append((address, address + 1))
+    return runs
+
+
+def plan(runs, cost_model, start=None, end=None):
+    """
+    Return the cheapest commands with which to write runs of changed bytes.
+
+    The bytes between start and end can be rewritten, so a command may cover the gap
+    between runs, or extend past the end of a run to fill a command of fixed length.
+
+    Args:
+        runs (iterable(tuple(int, int))): The start and end (exclusive) addresses of
+            each run of bytes which must be written, in order.
+        cost_model (CostModel): The commands available and their costs.
+
+    Kwargs:
+        start (int): The first address which can be written. Defaults to the start
+            of the first run.
+        end (int): The end (exclusive) of the addresses which can be written.
+            Defaults to the end of the last run.
+
+    Returns:
+        Plan: The writes, in order of address, and their total estimated cost in
+            microseconds.
+
+    """
+    runs = list(runs)
+    if not runs:
+        return Plan([], 0)
+    start = runs[0][0] if start is None else start
+    end = runs[-1][1] if end is None else end
+    changed = bytearray(end - start)
+    for run_start, run_end in runs:
+        changed[run_start - start : run_end - start] = b"\x01" * (run_end - run_start)
+    run_ends = [run_end for _, run_end in runs]
+    best = [0.0] * (end - start + 1)
+    choices = [None] * (end - start)
+    for address in range(end - 1, start - 1, -1):
+        offset = address - start
+        if not changed[offset]:
+            best[offset] = best[offset + 1]
+            continue
+        best[offset] = float("inf")
+        for write in _candidate_writes(address, start, end, run_ends, cost_model):
+            command, write_start, write_end = write
+            cost = cost_model.cost(command, write_end - write_start)
+            cost += best[write_end - start]
+            if cost < best[offset]:
+                best[offset], choices[offset] = cost, write
+    writes = []
+    address = start
+    while address < end:
+        if not changed[address - start]:
+            address += 1
+            continue
+        command, write_start, write_end = choices[address - start]
+        writes.append(PlannedWrite(command.name, write_start, write_end - write_start))
+        address = write_end
+    return Plan(writes, best[0])
+
+
+def _candidate_writes(address, start, end, run_ends, cost_model):
+    for command, min_length, max_length in cost_model.write_commands:
+        if min_length == max_length:
+            write_start = max(start, min(address, end - max_length))
+            if write_start + max_length <= end:
+                yield command, write_start, write_start + max_length
+            continue
+        limit = address + cost_model.max_length(command, max_length, address)
+        first = bisect_right(run_ends, address)
+        last = bisect_right(run_ends, limit)
+        for run_end in run_ends[first:last]:
+            yield command, address, run_end
+        if last < len(run_ends):
+            yield command, address, limit
@@ -1,15 +1,249 @@
 """The Programmer class manages communication with the EEPROM programmer."""
 
+from collections import deque
+
+from . import planner
 from . import programmer_commands as commands
+from . import rle, shadow
 from .arduino import Arduino
+from .baudrates import BaudCache
 from .eeprom_type import get_EEPROM
+from .journal import WriteJournal, write_key
+
+
+class BaseProgrammer:
+    """
+    Validation and planning of commands shared by the programmer classes.
+
+    Subclasses connect to the programmer and set the features it supports.
+    """
+
+    DEFAULT_WRITE_CYCLE_TIME = 10000
+    PROTOCOL_VERSION = 1
+    BLOCK_HASHES_VERSION = 2
+    RANGE_CRC_VERSION = 3
+    COMPRESSION_VERSION = 4
+    BAUD_VERSION = 5
+    CHECKSUM_VERSION = 6
+
+    def _validate_range(self, address, length):
+        if length < 1 or length > self.max_range:
+            raise ValueError(f"Range length {length} out of range 1 - {self.max_range}")
+        self.eeprom.is_valid_address(address)
+        self.eeprom.is_valid_address(address + length - 1)
+
+    def _read_requests(self, start, end):
+        if self.max_range:
+            return self.max_range, self._read_range_requests(start, end)
+        requests = (
+            (self.read_block_command, address, (address,))
+            for address in range(start, end + 1, 16)
+        )
+        return 16, requests
+
+    def _read_range_requests(self, start, end):
+        for address in range(start, end + 1, self.max_range):
+            length = min(self.max_range, end + 1 - address)
+            yield (self.read_range_command, address, (address, length))
+
+    def _read_block_data(self, block, address, end, size):
+        length = min(size, end + 1 - address)
+        if len(block) < length:
+            raise ValueError(
+                f"Expected {length} bytes from read at {address:04X}, "
+                f"got {len(block)}."
+            )
+        return block[:length]
+
+    def _pending_blocks(self, address, pending, written, final=False):
+        _, size = self._write_command()
+        while pending:
+            length = self._write_length(address, size)
+            if len(pending) < length and not final:
+                return
+            block = bytes(pending[:length])
+            self.eeprom.is_valid_address(address + len(block) - 1)
+            del pending[:length]
+            written += block
+            yield address, block
+            address += len(block)
+
+    def _write_requests(self, address, data):
+        command, size = self._write_command()
+        i = 0
+        while i < len(data):
+            length = self._write_length(address + i, size)
+            yield (command, address + i, (address + i, data[i : i + length]))
+            i += length
+
+    def _write_command(self):
+        if self.page_writes:
+            return self.write_page_command, self.eeprom.page_size
+        if self.max_range:
+            return self.write_range_command, self.max_range
+        return self.write_block_command, 16
+
+    def _write_length(self, address, size):
+        return size - address % size if self.page_writes else size
+
+    def _must_wait(self, in_flight, request):
+        """
+        Return True if a response is needed before request can be sent.
+
+        Args:
+            in_flight (deque): Tuples of (command, address, request) for the commands
+                sent and not yet answered, oldest first.
+            request (bytes): The next request to send.
+
+        """
+        if not in_flight:
+            return False
+        in_flight_bytes = sum(len(sent) for _, _, sent in in_flight)
+        return (
+            len(in_flight) >= self.window
+            or in_flight_bytes + len(request) > self.credits
+        )
+
+    @property
+    def page_writes(self):
+        """Return True if writes are made a page at a time."""
+        return 1 < self.eeprom.page_size <= self.max_page
+
+    @property
+    def write_size(self):
+        """Return the number of bytes writes are aligned to."""
+        return self.eeprom.page_size if self.page_writes else 16
+
+    @property
+    def read_block_command(self):
+        """Return the command used to read blocks of 16 bytes."""
+        return commands.ReadBlockBinary if self.binary else commands.ReadBlock
+
+    @property
+    def write_block_command(self):
+        """Return the command used to write blocks of 16 bytes."""
+        return commands.WriteBlockBinary if self.binary else commands.WriteBlock
+
+    @property
+    def read_range_command(self):
+        """Return the command used to read ranges."""
+        return commands.ReadRangeEncoded if self.compression else commands.ReadRange
+
+    @property
+    def write_range_command(self):
+        """Return the command used to write ranges."""
+        return commands.WriteRangeEncoded if self.compression else commands.WriteRange
+
+    @property
+    def write_page_command(self):
+        """Return the command used to write pages."""
+        return commands.WritePageEncoded if self.compression else commands.WritePage
+
+    @property
+    def write_commands(self):
+        """
+        Return the write commands available.
+
+        Returns:
+            dict: Tuples of (command, min_length, max_length) mapped to the name of
+                each command, where the lengths are the numbers of bytes the command
+                can write.
+
+        """
+        write_commands = [
+            (commands.WriteByte, 1, 1),
+            (
+                (commands.WriteBlockBinary, 1, 16)
+                if self.binary
+                else (commands.WriteBlock, 16, 16)
+            ),
+        ]
+        if self.frame_checking:
+            # The programmer rejects unchecked writes, and a block frame can write
+            # a single byte.
+            del write_commands[0]
+        if self.max_range:
+            write_commands.append((self.write_range_command, 1, self.max_range))
+        if self.page_writes:
+            write_commands.append((self.write_page_command, 1, self.eeprom.page_size))
+        return {write[0].name: write for write in write_commands}
+
+    @property
+    def cost_model(self):
+        """Return a CostModel of the write commands available."""
+        return planner.CostModel(
+            list(self.write_commands.values()),
+            baud=self.arduino.baud,
+            write_cycle_time=self.write_cycle_time,
+            page_size=self.eeprom.page_size,
+        )
+
+    def plan_writes(self, runs, start_address=None, end_address=None):
+        """
+        Return the cheapest commands with which to write runs of changed bytes.
+
+        The choice is made with the cost model of the commands the programmer can
+        use and the estimated write cycle time.
+
+        Args:
+            runs (iterable(tuple(int, int))): The start and end (exclusive) address
+                of each run of bytes which must be written, in order.
 
+        Kwargs:
+            start_address (int): The first address which may be rewritten. Defaults
+                to the start of the first run.
+            end_address (int): The end (exclusive) of the addresses which may be
+                rewritten. Defaults to the end of the last run.
+
+        Returns:
+            Plan: The writes and their total estimated cost in microseconds.
+
+        """
+        return planner.plan(
+            [tuple(run) for run in runs],
+            self.cost_model,
+            start=start_address,
+            end=end_address,
+        )
 
-class Programmer:
+    def _plan_requests(self, writes, data, start):
+        write_commands = self.write_commands
+        for name, address, length in writes:
+            command = write_commands[name][0]
+            block = data[address - start : address - start + length]
+            if command is commands.WriteByte:
+                yield (command, address, (address, block[0]))
+            else:
+                yield (command, address, (address, block))
+
+
+class Programmer(BaseProgrammer):
     """Manages communication with the EEPROM programmer."""
 
+    # Seconds to ping at a new baud rate, within the time the firmware waits.
+    BAUD_CONFIRM_TIMEOUT = 0.2
+    # Seconds to ping at the previous rate, longer than the firmware waits.
+    BAUD_FALLBACK_TIMEOUT = 1
+    # Seconds to wait for a checked frame, longer than the slowest command takes.
+    FRAME_TIMEOUT = 2
+
     def __init__(
-        self, port="/dev/ttyUSB0", baud=115200, eeprom_type="AT28C25", init_delay=2
+        self,
+        port="/dev/ttyUSB0",
+        baud=115200,
+        eeprom_type="AT28C25",
+        init_delay=2,
+        reset=True,
+        exclusive=False,
+        binary=False,
+        window=1,
+        shadow_cache=None,
+        compress=False,
+        baud_rates=None,
+        baud_cache=None,
+        checksums=False,
+        max_retries=3,
+        journal=None,
     ):
         """
         Create a connection to the EEPROM programer.
@@ -19,17 +253,195 @@ class Programmer:
                 Default: "/dev/ttyUSB0"
             baud (int): The baud rate of the serial connection. Default: 115200.
             eeprom_type (str): The name of the type of EEPROM in use. Default: "AT28C25".
-            init_delay (int): The time in seconds to wait for the Arduino to initialise.
+            init_delay (int): The maximum time in seconds to wait for the Arduino to
+                initialise.
+            reset (bool): If False connect to an already running Arduino without
+                resetting it. Default: True.
+            exclusive (bool): Lock the serial port so no other process can use it
+                while connected. Default: False.
+            binary (bool): Transfer blocks using binary frames if the programmer
+                supports them. Falls back to hex encoded commands if it does not.
+                Default: False.
+            window (int): The maximum number of commands to send before waiting
+                for their responses when reading or writing blocks. Commands are
+                only sent ahead while they fit in the buffer advertised by the
+                programmer. Default: 1.
+            shadow_cache (str): A directory in which to keep the last known contents
+                of EEPROMs so that they need not be read again. Default: None.
+            compress (bool): Run-length encode the data of range and page reads and
+                writes if the programmer supports it. Default: False.
+            baud_rates (iterable(int)): Faster baud rates to switch to after
+                connecting at baud, if the programmer supports it. The highest rate
+                at which the link works is used. Default: None.
+            baud_cache (str): The path of a JSON file in which to remember the
+                highest baud rate that worked with each port. Rates above it are not
+                tried again. When reset is False the remembered rate is tried before
+                baud, in case the programmer was left at it. Default: None.
+            checksums (bool): Check every binary frame sent and recieved with a
+                CRC16 if the programmer supports it. Damaged frames are sent again.
+                Default: False.
+            max_retries (int): The number of times a damaged frame is sent again
+                before giving up. Default: 3.
+            journal (str): The path of a JSON file in which to record the progress of
+                writes, so that an interrupted write can be resumed. Default: None.
+
+        If binary frames, a window or baud rates are requested the programmer's
+        protocol version is checked first and they are only used if it supports them.
+        Baud rates are negotiated from protocol version 5.
+
+        When binary frames are in use the programmer is asked for the largest range
+        it can read or write with a single command and reads and writes use ranges of
+        that size. If the programmer can also write whole pages of the EEPROM in a
+        single write cycle writes are made a page at a time, aligned to page
+        boundaries. Programmers which support binary frames from protocol version 2
+        can also return hashes of blocks of the EEPROM, from protocol version 3
+        the CRC32 of ranges of the EEPROM, and from protocol version 4 they can
+        decode and encode run-length encoded ranges and pages. The bytes saved are
+        counted in compression_stats. From protocol version 6 frames can be checked,
+        and the number of frames sent again is counted in frame_retries.
 
         """
         self.eeprom_type = eeprom_type
         self.eeprom = get_EEPROM(self.eeprom_type)
-        self.arduino = Arduino(port=port, baud=baud)
-        self.arduino.open(init_delay=init_delay)
+        self.connect_baud = baud
+        baud_cache = BaudCache(baud_cache) if baud_cache else None
+        self._open_arduino(port, init_delay, reset, exclusive, baud_cache)
+        if binary or window > 1 or baud_rates:
+            self.protocol_version = commands.ProtocolVersion.send(self)
+        else:
+            self.protocol_version = 0
+        if baud_rates and self.protocol_version >= self.BAUD_VERSION:
+            self._negotiate_remembered_baud(port, baud_rates, baud_cache)
+        supported = self.protocol_version >= self.PROTOCOL_VERSION
+        self.binary = binary and supported and commands.EnableBinary.send(self)
+        self.window = window
+        self.credits = commands.Credits.send(self) if window > 1 and supported else 0
+        self.max_range = commands.MaxRange.send(self) if self.binary else 0
+        self.max_page = commands.MaxPage.send(self) if self.binary else 0
+        self.block_hashing = (
+            self.binary and self.protocol_version >= self.BLOCK_HASHES_VERSION
+        )
+        self.crc_checking = (
+            self.binary and self.protocol_version >= self.RANGE_CRC_VERSION
+        )
+        self.compression = (
+            compress
+            and self.binary
+            and self.protocol_version >= self.COMPRESSION_VERSION
+        )
+        self.compression_stats = rle.CompressionStats(0, 0)
+        self.frame_checking = (
+            checksums
+            and self.binary
+            and self.protocol_version >= self.CHECKSUM_VERSION
+            and commands.EnableChecksums.send(self)
+        )
+        if self.frame_checking:
+            self.arduino.set_timeout(self.FRAME_TIMEOUT)
+        self.max_retries = max_retries
+        self.frame_retries = 0
+        self.write_cycle_time = self.DEFAULT_WRITE_CYCLE_TIME
+        self.shadow_cache = shadow.ShadowCache(shadow_cache) if shadow_cache else None
+        self.journal = WriteJournal(journal) if journal else None
+        self.contents = None
+        self.contents_saved = True
+
+    def _open_arduino(self, port, init_delay, reset, exclusive, baud_cache):
+        remembered = baud_cache.get(port) if baud_cache and not reset else None
+        if remembered is not None and remembered != self.connect_baud:
+            # A programmer which was not reset may still be at the remembered rate.
+            self.arduino = Arduino(port=port, baud=remembered)
+            try:
+                self.arduino.open(
+                    init_delay=self.BAUD_CONFIRM_TIMEOUT,
+                    reset=False,
+                    exclusive=exclusive,
+                )
+                return
+            except ValueError:
+                self.arduino.close()
+        self.arduino = Arduino(port=port, baud=self.connect_baud)
+        self.arduino.open(init_delay=init_delay, reset=reset, exclusive=exclusive)
 
     def disconnect(self):
-        """Close the connection to the arduino."""
-        self.arduino.close()
+        """
+        Close the connection to the arduino.
+
+        If a faster baud rate was negotiated the programmer is first returned to the
+        rate the connection was made at, so that it can be connected to again
+        without being reset.
+        """
+        try:
+            if self.arduino.baud != self.connect_baud:
+                self._switch_baud(self.connect_baud)
+        finally:
+            self.arduino.close()
+
+    def negotiate_baud(self, baud_rates):
+        """
+        Switch to the highest of a list of baud rates at which the link works.
+
+        Each rate above the current one is proposed to the programmer in turn,
+        highest first. After switching the link is confirmed by pinging the
+        programmer at the new rate. If it does not respond both sides return to the
+        previous rate and the next rate is tried.
+
+        Args:
+            baud_rates (iterable(int)): The baud rates to try.
+
+        Returns:
+            int: The baud rate in use.
+
+        Raises:
+            ValueError if the programmer does not support baud rate negotiation, or
+                does not respond at the previous rate after a failed switch.
+
+        """
+        if self.protocol_version < self.BAUD_VERSION:
+            raise ValueError("Baud rate negotiation is not supported.")
+        for baud in sorted(set(baud_rates), reverse=True):
+            if baud <= self.arduino.baud or self._switch_baud(baud):
+                break
+        return self.arduino.baud
+
+    def _switch_baud(self, baud):
+        previous = self.arduino.baud
+        commands.SetBaud.send(self, baud)
+        self.arduino.set_baud(baud)
+        try:
+            self.arduino.ping(self.BAUD_CONFIRM_TIMEOUT)
+        except ValueError:
+            self.arduino.set_baud(previous)
+            self.arduino.ping(self.BAUD_FALLBACK_TIMEOUT)
+            return False
+        return True
+
+    def _negotiate_remembered_baud(self, port, baud_rates, baud_cache):
+        remembered = baud_cache.get(port) if baud_cache else None
+        if remembered is not None:
+            baud_rates = [baud for baud in baud_rates if baud <= remembered]
+        baud = self.negotiate_baud(baud_rates)
+        if baud_cache:
+            baud_cache.set(port, baud)
+
+    def write_cycle_stats(self):
+        """
+        Return the write cycle times measured by the programmer since the last call.
+
+        The mean write cycle time is kept in write_cycle_time, in microseconds, as
+        the estimate for future writes. Until it has been measured it is the
+        datasheet worst case.
+
+        Returns:
+            WriteCycleStats: The number of write cycles, their total and maximum
+                time in microseconds and the number which timed out. None if the
+                programmer does not measure write cycles.
+
+        """
+        stats = commands.WriteCycleTimes.send(self)
+        if stats and stats.count:
+            self.write_cycle_time = stats.total / stats.count
+        return stats
 
     def read_byte(self, address):
         """
@@ -39,6 +451,8 @@ class Programmer:
             address (int): The address number to read from.
         """
         self.eeprom.is_valid_address(address)
+        if self.frame_checking:
+            return self._send(commands.ReadRange, address, address, 1)[0]
         return commands.ReadByte.send(self, address)
 
     def write_byte(self, address, byte):
@@ -55,7 +469,11 @@ class Programmer:
         """
         self.eeprom.is_valid_address(address)
         self.eeprom.is_valid_data(byte)
-        return commands.WriteByte.send(self, address, byte)
+        if self.frame_checking:
+            self._send(commands.WriteBlockBinary, address, address, [byte])
+        else:
+            commands.WriteByte.send(self, address, byte)
+        self.remember_contents([byte], start_address=address)
 
     def read_block(self, address):
         """
@@ -65,7 +483,7 @@ class Programmer:
             address (int): The address of the first byte in the block.
 
         Returns:
-            int
+            list(int)
 
         Raises:
             ValueError if address is out of range for the EEPROM.
@@ -73,7 +491,7 @@ class Programmer:
         """
         self.eeprom.is_valid_address(address)
         self.eeprom.is_valid_address(address + 15)
-        return commands.ReadBlock.send(self, address)
+        return list(self._send(self.read_block_command, address, address))
 
     def write_block(self, address, data):
         """
@@ -91,11 +509,235 @@ class Programmer:
         self.eeprom.is_valid_address(address + 15)
         for byte in data:
             self.eeprom.is_valid_data(byte)
-        return commands.WriteBlock.send(self, address, data)
+        self._send(self.write_block_command, address, address, data)
+        self.remember_contents(data, start_address=address)
+
+    def read_range(self, address, length):
+        """
+        Return a range of consecutive bytes from the EEPROM.
+
+        Kwargs:
+            address (int): The address of the first byte in the range.
+            length (int): The number of bytes to read. At most max_range.
+
+        Returns:
+            list(int)
+
+        Raises:
+            ValueError if the range is out of range for the EEPROM or the
+                programmer.
+
+        """
+        self._validate_range(address, length)
+        data = self._send(self.read_range_command, address, address, length)
+        if len(data) != length:
+            raise ValueError(
+                f"Expected {length} bytes from read_range, got {len(data)}."
+            )
+        return list(data)
+
+    def write_range(self, address, data):
+        """
+        Write a range of consecutive bytes to the EEPROM.
+
+        Kwargs:
+            address (int): The address of the first byte in the range.
+            data (list[int]): The bytes to write. At most max_range.
+
+        Raises:
+            ValueError if address or data is out of range for the EEPROM or the
+                programmer.
+
+        """
+        self._validate_range(address, len(data))
+        for byte in data:
+            self.eeprom.is_valid_data(byte)
+        self._send(self.write_range_command, address, address, data)
+        self.remember_contents(data, start_address=address)
+
+    def write_page(self, address, data):
+        """
+        Write bytes within a single page of the EEPROM in one write cycle.
+
+        Kwargs:
+            address (int): The address of the first byte to write.
+            data (list[int]): The bytes to write. Must not cross a page boundary.
+
+        Raises:
+            ValueError if page writes are not available, the data crosses a page
+                boundary or address or data is out of range for the EEPROM.
+
+        """
+        if not self.page_writes:
+            raise ValueError("Page writes are not supported.")
+        self.eeprom.is_valid_address(address)
+        self.eeprom.is_valid_address(address + len(data) - 1)
+        self.eeprom.is_valid_page(address, len(data))
+        for byte in data:
+            self.eeprom.is_valid_data(byte)
+        self._send(self.write_page_command, address, address, data)
+        self.remember_contents(data, start_address=address)
+
+    def block_hashes(self, address, length, block_size):
+        """
+        Return the CRC16 of each block of a range of the EEPROM.
+
+        The hashes are calculated by the programmer, so blocks can be compared with
+        BlockHashes.hash of the expected data without reading them.
+
+        Kwargs:
+            address (int): The address of the first block.
+            length (int): The number of bytes to hash. If it is not a multiple of
+                block_size the last block is shorter.
+            block_size (int): The number of bytes in each block.
+
+        Returns:
+            list(int)
+
+        Raises:
+            ValueError if the programmer can not hash blocks or the range is out of
+                range for the EEPROM.
+
+        """
+        if not self.block_hashing:
+            raise ValueError("The programmer does not support block hashes.")
+        self.eeprom.is_valid_address(address)
+        self.eeprom.is_valid_address(address + max(length, 1) - 1)
+        hashes = []
+        for response in self.pipeline(
+            self._block_hash_requests(address, length, block_size)
+        ):
+            hashes += response
+        return hashes
+
+    def _block_hash_requests(self, address, length, block_size):
+        full_blocks, remainder = divmod(length, block_size)
+        chunk_size = commands.BlockHashes.MAX_BLOCKS
+        for block in range(0, full_blocks, chunk_size):
+            start = address + block * block_size
+            count = min(chunk_size, full_blocks - block)
+            yield (commands.BlockHashes, start, (start, block_size, count))
+        if remainder:
+            start = address + full_blocks * block_size
+            yield (commands.BlockHashes, start, (start, remainder, 1))
+
+    def range_crc(self, address, length):
+        """
+        Return the CRC32 of a range of the EEPROM, calculated by the programmer.
+
+        Kwargs:
+            address (int): The address of the first byte in the range.
+            length (int): The number of bytes in the range.
+
+        Returns:
+            int: The CRC32. The firmware rejects empty ranges, so the CRC of an empty
+                range is returned without sending a command.
+
+        Raises:
+            ValueError if the programmer can not calculate CRCs or the range is out of
+                range for the EEPROM.
+
+        """
+        self._validate_crc_range(address, length)
+        if not length:
+            return commands.RangeCRC.hash(b"")
+        return self._send(commands.RangeCRC, address, address, length)
+
+    def differing_ranges(self, data, start_address=None, block_size=64):
+        """
+        Return the ranges of the EEPROM which do not match data.
+
+        The CRC32 of the whole range is compared first, so an EEPROM which matches is
+        checked with a single command. Ranges which do not match are split in half
+        and compared again until they are no longer than block_size.
+
+        Args:
+            data (list(int)): The data expected on the EEPROM.
+
+        Kwargs:
+            start_address (int): The address data starts at. Defaults to the lowest
+                address on the EEPROM.
+            block_size (int): The size of the smallest range compared. Default: 64.
+
+        Returns:
+            list(tuple(int, int)): The start and end (exclusive) address of each range
+                which does not match, in order.
+
+        Raises:
+            ValueError if the programmer can not calculate CRCs or data is out of
+                range for the EEPROM.
+
+        """
+        start = start_address or self.eeprom.min_address
+        self._validate_crc_range(start, len(data))
+        pending = [(start, start + len(data))] if data else []
+        differing = []
+        while pending:
+            requests = (
+                (commands.RangeCRC, range_start, (range_start, range_end - range_start))
+                for range_start, range_end in pending
+            )
+            split = []
+            for (range_start, range_end), crc in zip(pending, self.pipeline(requests)):
+                expected = data[range_start - start : range_end - start]
+                if crc == commands.RangeCRC.hash(expected):
+                    continue
+                if range_end - range_start <= block_size:
+                    differing.append((range_start, range_end))
+                else:
+                    middle = (range_start + range_end) // 2
+                    split += [(range_start, middle), (middle, range_end)]
+            pending = split
+        return sorted(differing)
+
+    def _validate_crc_range(self, address, length):
+        if not self.crc_checking:
+            raise ValueError("The programmer does not support range CRCs.")
+        if length > commands.RangeCRC.MAX_LENGTH:
+            raise ValueError(
+                f"Range length {length} out of range 0 - {commands.RangeCRC.MAX_LENGTH}"
+            )
+        self.eeprom.is_valid_address(address)
+        self.eeprom.is_valid_address(address + max(length, 1) - 1)
+
+    def is_blank(self, start_address=None, end_address=None, fill=0xFF):
+        """
+        Return True if a range of the EEPROM holds only a fill byte.
+
+        The range is compared with the known contents of the EEPROM if there are
+        any, otherwise with its CRC if the programmer can calculate CRCs. Only if
+        neither is available is the range read.
+
+        Kwargs:
+            start_address (int): The start address of the range. Defaults to the
+                lowest address on the EEPROM.
+            end_address (int): The end address of the range. Defaults to the
+                highest address on the EEPROM.
+            fill (int): The fill byte of a blank EEPROM. Default: 0xFF.
+
+        Returns:
+            bool
+
+        Raises:
+            ValueError if address is out of range for the EEPROM.
+
+        """
+        start = start_address or self.eeprom.min_address
+        end = end_address or self.eeprom.max_address
+        self.eeprom.is_valid_address(start)
+        self.eeprom.is_valid_address(end)
+        blank = bytes([fill]) * (end + 1 - start)
+        contents = self.known_contents()
+        if contents is not None:
+            offset = start - self.eeprom.min_address
+            return contents[offset : offset + len(blank)] == blank
+        if self.crc_checking:
+            return self.range_crc(start, len(blank)) == commands.RangeCRC.hash(blank)
+        return self.read_bytes(start, end) == blank
 
     def read(self, start_address=None, end_address=None):
         """
-        Return a block of data from the EEPROM.
+        Return a block of data from the EEPROM as a list.
 
         Kwargs:
             start_address (int): The start address of the block. Defaults to the
@@ -106,29 +748,136 @@ class Programmer:
         Returns:
             list(int)
 
+        Raises:
+            ValueError if address is out of range for the EEPROM.
+        """
+        return list(self.read_bytes(start_address, end_address))
+
+    def read_bytes(self, start_address=None, end_address=None):
+        """
+        Return a block of data from the EEPROM.
+
+        Kwargs:
+            start_address (int): The start address of the block. Defaults to the
+                lowest address on the EEPROM.
+            end_address (int): The end address of the block. Defaults to the
+                highest address on the EEPROM.
+
+        Returns:
+            bytearray
+
         Raises:
             ValueError if address is out of range for the EEPROM.
         """
         start = start_address or self.eeprom.min_address
         end = end_address or self.eeprom.max_address
-        data = []
-        for address in range(start, end - 1, 16):
-            data += self.read_block(address)
+        self.eeprom.is_valid_address(start)
+        self.eeprom.is_valid_address(end)
+        data = bytearray(max(end + 1 - start, 0))
+        self.read_into(data, start_address=start)
         return data
 
-    def write(self, data, start_address=None):
+    def read_into(self, buffer, start_address=None):
+        """
+        Read a block of data from the EEPROM into a buffer.
+
+        Each block is copied into the buffer as it arrives from the programmer.
+
+        Args:
+            buffer (bytes-like): A writable buffer, such as a bytearray or a
+                memoryview, which is filled with the data.
+
+        Kwargs:
+            start_address (int): The address of the first byte read. Defaults to
+                the lowest address on the EEPROM.
+
+        Returns:
+            int: The number of bytes read.
+
+        Raises:
+            ValueError if address is out of range for the EEPROM.
+        """
+        view = memoryview(buffer).cast("B")
+        if not view:
+            return 0
+        start = start_address or self.eeprom.min_address
+        offset = 0
+        for block in self.iter_read(start, start + len(view) - 1):
+            view[offset : offset + len(block)] = block
+            offset += len(block)
+        return offset
+
+    def iter_read(self, start_address=None, end_address=None):
+        """
+        Return an iterator of the blocks of data read from the EEPROM.
+
+        Each block is yielded as soon as it arrives from the programmer, so the data
+        can be processed while the rest of the EEPROM is read. If the iterator is
+        closed early the responses to commands already sent are discarded.
+
+        Kwargs:
+            start_address (int): The start address of the data. Defaults to the
+                lowest address on the EEPROM.
+            end_address (int): The end address of the data. Defaults to the highest
+                address on the EEPROM.
+
+        Returns:
+            iterator(bytes)
+
+        Raises:
+            ValueError if address is out of range for the EEPROM.
+        """
+        start = start_address or self.eeprom.min_address
+        end = end_address or self.eeprom.max_address
+        self.eeprom.is_valid_address(start)
+        self.eeprom.is_valid_address(end)
+        return self._read_blocks(start, end)
+
+    def _read_blocks(self, start, end):
+        size, requests = self._read_requests(start, end)
+        whole_eeprom = (start, end) == (
+            self.eeprom.min_address,
+            self.eeprom.max_address,
+        )
+        image = bytearray() if self.contents is None and whole_eeprom else None
+        address = start
+        try:
+            for block in self.pipeline(requests):
+                block = self._read_block_data(block, address, end, size)
+                length = len(block)
+                if image is None:
+                    self.remember_contents(block, start_address=address, save=False)
+                else:
+                    image += block
+                yield block
+                address += length
+            if image is not None:
+                self.remember_contents(image, start_address=start, save=False)
+        finally:
+            self.save_contents()
+
+    def write(self, data, start_address=None, skip_fill=None, resume=False):
         """
         Write a block of data to the EEPROM.
 
+        If there is a journal the progress of the write is recorded in it until the
+        write completes.
+
         Args:
-            data (list(int)): A list of bytes to write to the EEPROM.
+            data (bytes-like or list(int)): The bytes to write to the EEPROM. Blocks
+                are sliced from it, so a memoryview is written without copying it.
 
         Kwargs:
             start_address (int): The first address to write to. Defaults to the lowest
                 address on the EEPROM.
+            skip_fill (int): A fill byte which need not be written. If the EEPROM
+                already holds only this byte where data is to be written, only the
+                runs of data which differ from it are written. Default: None.
+            resume (bool): Continue an interrupted write of the same data from the
+                address given by resume_address. Default: False.
 
         Returns:
-            list(int)
+            int: The number of bytes written.
 
         Raises:
             ValueError if address or data is out of range for the EEPROM.
@@ -137,7 +886,418 @@ class Programmer:
         start = start_address or 0
         address = start or self.eeprom.min_address
         self.eeprom.is_valid_address(start + len(data) - 1)
-        for i in range(0, len(data), 16):
-            block = data[i : i + 16]
-            self.write_block(address, block)
-            address += 16
+        for byte in data:
+            self.eeprom.is_valid_data(byte)
+        end = address + len(data)
+        resumed = self.resume_address(data, address) if resume else address
+        if skip_fill is not None:
+            self.eeprom.is_valid_data(skip_fill)
+            if resumed < end and self.is_blank(resumed, end - 1, fill=skip_fill):
+                runs = planner.changed_runs(
+                    data[resumed - address :], bytes([skip_fill]) * (end - resumed)
+                )
+                plan = self.plan_writes(
+                    [
+                        (resumed + run_start, resumed + run_end)
+                        for run_start, run_end in runs
+                    ],
+                    start_address=resumed,
+                    end_address=end,
+                )
+                self.write_plan(data, plan.writes, start_address=address, save=False)
+                self.remember_contents(data, start_address=address)
+                return sum(write.length for write in plan.writes)
+        key = self._journal_key(address, data)
+        requests = self._write_requests(resumed, data[resumed - address :])
+        try:
+            for _ in self._journaled_pipeline(
+                (key, address, request) for request in requests
+            ):
+                pass
+        except ValueError:
+            self.contents = None
+            raise
+        self._complete_journal(key)
+        self.remember_contents(data, start_address=address)
+        return end - resumed
+
+    def write_regions(self, regions, skip_fill=None, resume=False):
+        """
+        Write each of a number of regions of data to the EEPROM.
+
+        Only the addresses within the regions are written, each region with the
+        cheapest commands found by plan_writes. The regions are written in a single
+        pipeline, and the progress of each is recorded in the journal as for write.
+
+        Args:
+            regions (iterable(Region)): The address and data of each region, as
+                returned by image.regions.
+
+        Kwargs:
+            skip_fill (int): A fill byte which need not be written, as for write.
+                Each region is checked to hold only this byte. Default: None.
+            resume (bool): Continue interrupted writes of the regions, as for write.
+                Default: False.
+
+        Returns:
+            int: The number of bytes written.
+
+        Raises:
+            ValueError if an address or data is out of range for the EEPROM.
+
+        """
+        regions = list(regions)
+        if skip_fill is not None:
+            return sum(
+                self.write(
+                    data, start_address=address, skip_fill=skip_fill, resume=resume
+                )
+                for address, data in regions
+            )
+        plans = []
+        written = 0
+        for address, data in regions:
+            end = address + len(data)
+            resumed = self.resume_address(data, address) if resume else address
+            written += end - resumed
+            plan = self.plan_writes([(resumed, end)], resumed, end)
+            for write in plan.writes:
+                self._validate_planned_write(write, data, address)
+            key = self._journal_key(address, data)
+            plans.append((address, data, plan.writes, key))
+        requests = (
+            (key, address, request)
+            for address, data, writes, key in plans
+            for request in self._plan_requests(writes, data, address)
+        )
+        try:
+            for _ in self._journaled_pipeline(requests):
+                pass
+        except ValueError:
+            self.contents = None
+            raise
+        for address, data, _, key in plans:
+            self._complete_journal(key)
+            self.remember_contents(data, start_address=address, save=False)
+        self.save_contents()
+        return written
+
+    def write_stream(self, chunks, start_address=None):
+        """
+        Write data to the EEPROM as it becomes available.
+
+        Each block is written as soon as enough data has arrived to fill it, so
+        writing starts before all of the data is available.
+
+        Args:
+            chunks (iterable): Chunks of data of any size, each bytes-like.
+
+        Kwargs:
+            start_address (int): The first address to write to. Defaults to the lowest
+                address on the EEPROM.
+
+        Returns:
+            int: The number of bytes written.
+
+        Raises:
+            ValueError if the data runs past the end of the EEPROM. The data before
+                the end of the EEPROM is written first.
+
+        """
+        address = start_address or self.eeprom.min_address
+        self.eeprom.is_valid_address(address)
+        written = bytearray()
+        requests = (
+            request
+            for block_address, block in self._stream_blocks(address, chunks, written)
+            for request in self._write_requests(block_address, block)
+        )
+        try:
+            for _ in self.pipeline(requests):
+                pass
+        except ValueError:
+            self.contents = None
+            raise
+        self.remember_contents(written, start_address=address)
+        return len(written)
+
+    def write_plan(self, data, writes, start_address=None, save=True):
+        """
+        Write the parts of data chosen by a plan to the EEPROM.
+
+        The writes must be in order of address. If there is a journal, each write
+        the programmer acknowledges is recorded in it as completing the data up to
+        the end of the write, as the data between the writes is not to be changed.
+
+        Args:
+            data (bytes-like): The data to write from.
+            writes (iterable(PlannedWrite)): The commands to write with, as returned
+                by plan_writes. The addresses written must be within data.
+
+        Kwargs:
+            start_address (int): The address of the start of data. Defaults to the
+                lowest address on the EEPROM.
+            save (bool): Save the updated contents to the shadow cache. If False
+                they are saved by save_contents. Default: True.
+
+        Raises:
+            ValueError if a command is not available or an address or data is out of
+                range for the EEPROM or data.
+
+        """
+        start = start_address or self.eeprom.min_address
+        writes = [planner.PlannedWrite(*write) for write in writes]
+        for write in writes:
+            self._validate_planned_write(write, data, start)
+        key = self._journal_key(start, data)
+        requests = self._plan_requests(writes, data, start)
+        try:
+            for _ in self._journaled_pipeline(
+                (key, start, request) for request in requests
+            ):
+                pass
+        except ValueError:
+            self.contents = None
+            raise
+        self._complete_journal(key)
+        if self.contents is not None:
+            contents = bytearray(self.contents)
+            for _, address, length in writes:
+                offset = address - self.eeprom.min_address
+                block = data[address - start : address - start + length]
+                contents[offset : offset + length] = block
+            self.remember_contents(contents, save=save)
+
+    def resume_address(self, data, start_address=None):
+        """
+        Return the address from which an interrupted write of data can continue.
+
+        The journal gives the end of the writes of data the programmer acknowledged
+        before the write was interrupted. The block before it is read back to check
+        the EEPROM still holds what was written.
+
+        Args:
+            data (bytes-like): The data being written.
+
+        Kwargs:
+            start_address (int): The address data is written to. Defaults to the
+                lowest address on the EEPROM.
+
+        Returns:
+            int: The address to continue writing from. start_address if there is no
+                journal, the write is not in it or the block before the address does
+                not match data.
+
+        """
+        start = start_address or self.eeprom.min_address
+        key = self._journal_key(start, data)
+        if key is None:
+            return start
+        end = start
+        for range_start, range_end in self.journal.completed(key):
+            if range_start <= start < range_end:
+                end = min(range_end, start + len(data))
+        if end == start:
+            return start
+        boundary = max(start, end - self.write_size)
+        expected = bytes(data[boundary - start : end - start])
+        if self.read_bytes(boundary, end - 1) != expected:
+            return start
+        return end
+
+    def _journal_key(self, address, data):
+        if self.journal is None:
+            return None
+        return write_key(self.arduino.port, address, data)
+
+    def _journaled_pipeline(self, requests):
+        sent = deque()
+
+        def send():
+            for key, start, request in requests:
+                sent.append((key, start, request))
+                yield request
+
+        for response in self.pipeline(send()):
+            key, start, (command, address, args) = sent.popleft()
+            if key is not None:
+                length = 1 if command is commands.WriteByte else len(args[1])
+                self.journal.record(key, start, address + length)
+            yield response
+
+    def _complete_journal(self, key):
+        if key is not None:
+            self.journal.remove(key)
+
+    def _validate_planned_write(self, write, data, start):
+        name, address, length = write
+        if name not in self.write_commands:
+            raise ValueError(f"Write command {name} is not available.")
+        command, min_length, max_length = self.write_commands[name]
+        if not min_length <= length <= max_length:
+            raise ValueError(
+                f"{name} can not write {length} bytes at {address:04X}, "
+                f"only {min_length} - {max_length}."
+            )
+        if address < start or address + length > start + len(data):
+            raise ValueError(f"Planned write at {address:04X} is outside the data.")
+        self.eeprom.is_valid_address(address)
+        self.eeprom.is_valid_address(address + length - 1)
+        if issubclass(command, commands.WritePage):
+            self.eeprom.is_valid_page(address, length)
+        for byte in data[address - start : address - start + length]:
+            self.eeprom.is_valid_data(byte)
+
+    def _stream_blocks(self, address, chunks, written):
+        pending = bytearray()
+        for chunk in chunks:
+            pending += chunk
+            yield from self._pending_blocks(address + len(written), pending, written)
+        yield from self._pending_blocks(
+            address + len(written), pending, written, final=True
+        )
+
+    def known_contents(self):
+        """
+        Return the contents of the EEPROM if they are known without reading it.
+
+        They are known once all of the EEPROM has been read or written through this
+        programmer. Otherwise, if the programmer can calculate CRCs, the EEPROM's
+        fingerprint is found from a few sampled blocks and its CRC and looked up in
+        the shadow cache.
+
+        Returns:
+            bytearray: The contents of the EEPROM, or None if they are not known.
+
+        """
+        if self.contents is None and self.shadow_cache and self.crc_checking:
+            start, size = self.eeprom.min_address, self._eeprom_size()
+            samples = [
+                self.read_range(start + address, length)
+                for address, length in shadow.sample_ranges(size)
+            ]
+            key = shadow.fingerprint(samples, self.range_crc(start, size))
+            self.contents = self.shadow_cache.load(key, size)
+        return bytearray(self.contents) if self.contents is not None else None
+
+    def remember_contents(self, data, start_address=None, save=True):
+        """
+        Record that part of the EEPROM holds data.
+
+        Once the contents of all of the EEPROM are known they are kept up to date and
+        saved to the shadow cache, if there is one.
+
+        Args:
+            data (bytes-like or list(int)): The data held by the EEPROM.
+
+        Kwargs:
+            start_address (int): The address data starts at. Defaults to the lowest
+                address on the EEPROM.
+            save (bool): Save the contents to the shadow cache now. If False they
+                are saved by the next call to save_contents, so that an operation
+                made of many changes saves them once. Default: True.
+
+        """
+        data = bytes(data)
+        offset = (start_address or self.eeprom.min_address) - self.eeprom.min_address
+        if self.contents is not None:
+            if self.contents[offset : offset + len(data)] == data:
+                return
+            self.contents[offset : offset + len(data)] = data
+        elif offset == 0 and len(data) == self._eeprom_size():
+            self.contents = bytearray(data)
+        else:
+            return
+        self.contents_saved = False
+        if save:
+            self.save_contents()
+
+    def save_contents(self):
+        """Save the known contents to the shadow cache, if they have changed."""
+        if self.contents_saved or self.contents is None:
+            return
+        if self.shadow_cache:
+            self.shadow_cache.save(self.contents)
+        self.contents_saved = True
+
+    def _eeprom_size(self):
+        return self.eeprom.max_address + 1 - self.eeprom.min_address
+
+    def _send(self, command, address, *args):
+        [response] = self.pipeline([(command, address, args)])
+        return response
+
+    def pipeline(self, requests):
+        """
+        Send commands to the programmer and yield their responses in order.
+
+        Up to window commands are sent before waiting for a response, so long as the
+        unanswered commands fit within the credits advertised by the programmer.
+
+        When frames are checked a damaged response, or a request the programmer
+        reports was damaged, is recovered by pinging the programmer, which answers
+        once it has handled every request before the ping, and sending the failed
+        command and those sent after it again. Each command is sent again at most
+        max_retries times.
+
+        Args:
+            requests (iterable): Tuples of (command, address, args) where command is
+                a ProgrammerCommand, address is the address the command acts on and
+                args are the arguments passed to the command.
+
+        Yields:
+            The processed response of each command.
+
+        Raises:
+            ValueError if a response is invalid, or still damaged after max_retries.
+                The message includes the address of the failed command.
+
+        """
+        in_flight = deque()
+        try:
+            for command, address, args in requests:
+                request = command.prepare_request(self, *args)
+                while self._must_wait(in_flight, request):
+                    yield self._pipeline_response(in_flight)
+                self.arduino.serial_send_bytes(request)
+                in_flight.append((command, address, request))
+            while in_flight:
+                yield self._pipeline_response(in_flight)
+        except (GeneratorExit, ValueError):
+            self._discard_responses(in_flight)
+            raise
+
+    def _pipeline_response(self, in_flight):
+        command, address, _ = in_flight[0]
+        retries = 0
+        while True:
+            try:
+                response = command.response(self)
+            except commands.FrameError as error:
+                if retries == self.max_retries:
+                    in_flight.clear()
+                    self.arduino.ping(self.FRAME_TIMEOUT)
+                    raise ValueError(f"Address {address:04X}: {error}") from error
+                retries += 1
+                self.frame_retries += 1
+                self._resend(in_flight)
+            except ValueError as error:
+                in_flight.popleft()
+                self._discard_responses(in_flight)
+                raise ValueError(f"Address {address:04X}: {error}") from error
+            else:
+                in_flight.popleft()
+                return response
+
+    def _resend(self, in_flight):
+        self.arduino.ping(self.FRAME_TIMEOUT)
+        for _, _, request in in_flight:
+            self.arduino.serial_send_bytes(request)
+
+    def _discard_responses(self, in_flight):
+        while in_flight:
+            command, _, _ = in_flight.popleft()
+            try:
+                command.response(self)
+            except ValueError:
+                pass
@@ -1,5 +1,17 @@
 """Serial commands for the EEPROM progammer."""
 
+import binascii
+import zlib
+from collections import namedtuple
+
+from . import rle
+
+WriteCycleStats = namedtuple("WriteCycleStats", "count total max timeouts")
+
+
+class FrameError(ValueError):
+    """A binary frame was damaged or lost on the serial link and can be resent."""
+
 
 class ProgrammerCommand:
     """Base class for programmer commands."""
@@ -11,10 +23,29 @@ class ProgrammerCommand:
     @classmethod
     def send(cls, programmer, *args):
         """Send a command to the programmer and handle the response."""
+        cls.request(programmer, *args)
+        return cls.response(programmer)
+
+    @classmethod
+    def request(cls, programmer, *args):
+        """Send a command to the programmer without waiting for the response."""
+        programmer.arduino.serial_send_bytes(cls.prepare_request(programmer, *args))
+
+    @classmethod
+    def prepare_request(cls, programmer, *args):
+        """Return the request sent to a programmer for the command."""
+        return cls.format_request(*args)
+
+    @classmethod
+    def response(cls, programmer):
+        """Recieve and handle the response to a command sent with request."""
+        return cls.process_response(programmer.arduino.serial_recieve())
+
+    @classmethod
+    def format_request(cls, *args):
+        """Return the command and its arguments as they are sent over serial."""
         message = cls.CODE + cls.format_arguments(*args)
-        programmer.arduino.serial_send(message)
-        response = programmer.arduino.serial_recieve()
-        return cls.process_response(response)
+        return message.encode("utf8") + b"\n"
 
     @classmethod
     def format_arguments(self, *args):
@@ -107,7 +138,7 @@ class ReadBlock(ProgrammerCommand):
     def process_response(cls, response):
         """Handle the serial response."""
         try:
-            return [int(digit, 16) for digit in response.strip().split(" ")]
+            return bytes.fromhex(response)
         except ValueError:
             raise ValueError(f"{cls.name} got unexpected response: {response}")
 
@@ -128,3 +159,532 @@ class WriteBlock(ProgrammerCommand):
     def format_arguments(cls, address, data):
         """Return the command arguments as a string."""
         return "".join([cls.format_address(address), cls.format_data(data)])
+
+
+class ProtocolVersion(ProgrammerCommand):
+    """
+    Return the version of the serial protocol supported by the programmer.
+
+    Returns:
+        int: The protocol version, 0 if the programmer does not report one.
+    """
+
+    CODE = "V"
+    name = "protocol_version"
+
+    @classmethod
+    def format_arguments(cls):
+        """Return the command arguments as a string."""
+        return ""
+
+    @classmethod
+    def process_response(cls, response):
+        """Handle the serial response."""
+        return int(response) if response.isdigit() else 0
+
+
+class EnableBinary(ProgrammerCommand):
+    """
+    Ask the programmer whether it accepts binary framed commands.
+
+    Returns:
+        bool: True if the programmer supports binary frames, otherwise False.
+    """
+
+    CODE = "B"
+    name = "enable_binary"
+
+    @classmethod
+    def format_arguments(cls):
+        """Return the command arguments as a string."""
+        return ""
+
+    @classmethod
+    def process_response(cls, response):
+        """Handle the serial response."""
+        return response == cls.SUCCESS_MESSAGE
+
+
+class Credits(ProgrammerCommand):
+    """
+    Return the number of bytes the programmer can buffer while it is busy.
+
+    Commands may be sent ahead of their responses so long as the total size of the
+    unanswered commands does not exceed this number.
+
+    Returns:
+        int: The number of bytes available, 0 if the programmer does not support
+            pipelined commands.
+    """
+
+    CODE = "C"
+    name = "credits"
+
+    @classmethod
+    def format_arguments(cls):
+        """Return the command arguments as a string."""
+        return ""
+
+    @classmethod
+    def process_response(cls, response):
+        """Handle the serial response."""
+        return int(response) if response.isdigit() else 0
+
+
+class MaxRange(ProgrammerCommand):
+    """
+    Return the largest number of bytes the programmer can read or write in a range.
+
+    Returns:
+        int: The maximum range length, 0 if the programmer does not support ranges.
+    """
+
+    CODE = "L"
+    name = "max_range"
+
+    @classmethod
+    def format_arguments(cls):
+        """Return the command arguments as a string."""
+        return ""
+
+    @classmethod
+    def process_response(cls, response):
+        """Handle the serial response."""
+        return int(response) if response.isdigit() else 0
+
+
+class MaxPage(ProgrammerCommand):
+    """
+    Return the largest number of bytes the programmer can write as a single page.
+
+    Returns:
+        int: The maximum page length, 0 if the programmer does not support page
+            writes.
+    """
+
+    CODE = "G"
+    name = "max_page"
+
+    @classmethod
+    def format_arguments(cls):
+        """Return the command arguments as a string."""
+        return ""
+
+    @classmethod
+    def process_response(cls, response):
+        """Handle the serial response."""
+        return int(response) if response.isdigit() else 0
+
+
+class WriteCycleTimes(ProgrammerCommand):
+    """
+    Return the write cycle times measured since they were last requested.
+
+    The programmer waits for each write cycle to complete by polling the EEPROM and
+    records how long each took in microseconds.
+
+    Returns:
+        WriteCycleStats: The number of write cycles, their total and maximum time in
+            microseconds and the number of write cycles which did not complete before
+            the programmer's timeout. None if the programmer does not measure write
+            cycles.
+    """
+
+    CODE = "M"
+    name = "write_cycle_times"
+
+    @classmethod
+    def format_arguments(cls):
+        """Return the command arguments as a string."""
+        return ""
+
+    @classmethod
+    def process_response(cls, response):
+        """Handle the serial response."""
+        values = response.split(" ")
+        if len(values) != 4 or not all(value.isdigit() for value in values):
+            return None
+        return WriteCycleStats(*[int(value) for value in values])
+
+
+class SetBaud(ProgrammerCommand):
+    """
+    Switch the programmer to a new baud rate.
+
+    The programmer acknowledges at the current rate and then waits for a ping at the
+    new rate, restoring the current rate if one does not arrive.
+
+    Args:
+        baud (int): The new baud rate.
+    """
+
+    CODE = "U"
+    name = "set_baud"
+
+    @classmethod
+    def format_arguments(cls, baud):
+        """Return the command arguments as a string."""
+        return str(baud)
+
+
+class EnableChecksums(ProgrammerCommand):
+    """
+    Ask the programmer to add a checksum to every binary frame.
+
+    Returns:
+        bool: True if the programmer checks frames, otherwise False.
+    """
+
+    CODE = "F"
+    name = "enable_checksums"
+
+    @classmethod
+    def format_arguments(cls):
+        """Return the command arguments as a string."""
+        return ""
+
+    @classmethod
+    def process_response(cls, response):
+        """Handle the serial response."""
+        return response == cls.SUCCESS_MESSAGE
+
+
+class BinaryCommand(ProgrammerCommand):
+    """
+    Base class for binary framed programmer commands.
+
+    Commands are sent as a frame of one code byte, one length byte and the payload.
+    The programmer replies with a status byte, a length byte and the payload. Once
+    checksums are enabled both end each frame with the CRC16 of the rest of it, and
+    the programmer replies to a request which does not match its checksum with the
+    RETRY status.
+    """
+
+    ACK = 0x06
+    RETRY = 0x18
+
+    @classmethod
+    def prepare_request(cls, programmer, *args):
+        """Return the request frame, with a checksum if the programmer checks them."""
+        request = super().prepare_request(programmer, *args)
+        if programmer.frame_checking:
+            request += cls.checksum(request)
+        return request
+
+    @classmethod
+    def response(cls, programmer):
+        """Recieve and handle the response to a command sent with request."""
+        if programmer.frame_checking:
+            payload = cls.recieve_checked_frame(programmer)
+        else:
+            payload = cls.recieve_frame(programmer)
+        return cls.process_frame(programmer, payload)
+
+    @classmethod
+    def process_frame(cls, programmer, payload):
+        """Handle the payload of a frame recieved from a programmer."""
+        return cls.process_response(payload)
+
+    @classmethod
+    def format_request(cls, *args):
+        """Return the command and its arguments as a binary frame."""
+        payload = cls.format_arguments(*args)
+        return bytes([ord(cls.CODE), len(payload)]) + payload
+
+    @classmethod
+    def recieve_frame(cls, programmer):
+        """Return the payload of a frame recieved from the programmer."""
+        status, length = programmer.arduino.serial_recieve_bytes(2)
+        payload = programmer.arduino.serial_recieve_bytes(length) if length else b""
+        cls.check_status(status)
+        return payload
+
+    @classmethod
+    def recieve_checked_frame(cls, programmer):
+        """
+        Return the payload of a frame with a checksum recieved from the programmer.
+
+        Raises:
+            FrameError if the frame is incomplete, does not match its checksum or the
+                programmer asks for the request to be sent again.
+
+        """
+        try:
+            header = programmer.arduino.serial_recieve_bytes(2)
+            rest = programmer.arduino.serial_recieve_bytes(header[1] + 2)
+        except ValueError as error:
+            raise FrameError(f"{cls.name} got an incomplete response: {error}")
+        payload, checksum = rest[:-2], rest[-2:]
+        if checksum != cls.checksum(header + payload):
+            raise FrameError(f"{cls.name} got a response with an invalid checksum.")
+        if header[0] == cls.RETRY:
+            raise FrameError(f"{cls.name} request was damaged.")
+        cls.check_status(header[0])
+        return payload
+
+    @classmethod
+    def checksum(cls, frame):
+        """Return the CRC16 which ends a frame, as the programmer calculates it."""
+        return binascii.crc_hqx(bytes(frame), 0).to_bytes(2, "big")
+
+    @classmethod
+    def check_status(cls, status):
+        """Raise ValueError if the status byte of a response is not ACK."""
+        if status != cls.ACK:
+            raise ValueError(f"{cls.name} got unexpected response status: {status:02X}")
+
+    @classmethod
+    def process_response(cls, response):
+        """Handle the serial response."""
+        if response:
+            raise ValueError(f"{cls.name} got unexpected response: {response.hex()}")
+
+    @classmethod
+    def format_address(cls, address):
+        """Return an address number as two big endian bytes."""
+        return address.to_bytes(2, "big")
+
+    @classmethod
+    def format_data(cls, data):
+        """Return a list containing bytes of data as bytes."""
+        return bytes(data)
+
+
+class ReadBlockBinary(BinaryCommand):
+    """
+    Return a block of 16 consecutive bytes from the EEPROM using a binary frame.
+
+    Args:
+        address (int): The address of the first byte in the block.
+    """
+
+    CODE = "t"
+    name = "read_block"
+
+    @classmethod
+    def format_arguments(cls, address):
+        """Return the command arguments as bytes."""
+        return cls.format_address(address)
+
+    @classmethod
+    def process_response(cls, response):
+        """Handle the serial response."""
+        if len(response) != 16:
+            raise ValueError(f"{cls.name} got unexpected response: {response.hex()}")
+        return response
+
+
+class WriteBlockBinary(BinaryCommand):
+    """
+    Write a block of up to 16 consecutive bytes to the EEPROM using a binary frame.
+
+    Args:
+        address (int): The address of the first byte in the block.
+        data (list[int]): A list of up to 16 bytes to write.
+    """
+
+    CODE = "s"
+    name = "write_block"
+
+    @classmethod
+    def format_arguments(cls, address, data):
+        """Return the command arguments as bytes."""
+        return cls.format_address(address) + cls.format_data(data)
+
+
+class ReadRange(BinaryCommand):
+    """
+    Return a range of consecutive bytes from the EEPROM.
+
+    Args:
+        address (int): The address of the first byte in the range.
+        length (int): The number of bytes to read.
+    """
+
+    CODE = "x"
+    name = "read_range"
+
+    @classmethod
+    def format_arguments(cls, address, length):
+        """Return the command arguments as bytes."""
+        return cls.format_address(address) + bytes([length])
+
+    @classmethod
+    def process_response(cls, response):
+        """Handle the serial response."""
+        return response
+
+
+class WriteRange(BinaryCommand):
+    """
+    Write a range of consecutive bytes to the EEPROM.
+
+    Args:
+        address (int): The address of the first byte in the range.
+        data (list[int]): The bytes to write.
+    """
+
+    CODE = "y"
+    name = "write_range"
+
+    @classmethod
+    def format_arguments(cls, address, data):
+        """Return the command arguments as bytes."""
+        return cls.format_address(address) + cls.format_data(data)
+
+
+class WritePage(BinaryCommand):
+    """
+    Write bytes within one page of the EEPROM using a single write cycle.
+
+    Args:
+        address (int): The address of the first byte to write.
+        data (list[int]): The bytes to write. Must not cross a page boundary.
+    """
+
+    CODE = "p"
+    name = "write_page"
+
+    @classmethod
+    def format_arguments(cls, address, data):
+        """Return the command arguments as bytes."""
+        return cls.format_address(address) + cls.format_data(data)
+
+
+class ReadRangeEncoded(ReadRange):
+    """
+    Return a range of consecutive bytes from the EEPROM, run-length encoded.
+
+    Args:
+        address (int): The address of the first byte in the range.
+        length (int): The number of bytes to read.
+    """
+
+    CODE = "u"
+
+    @classmethod
+    def process_frame(cls, programmer, payload):
+        """Handle the payload of a frame and count the bytes saved by encoding."""
+        data = cls.process_response(payload)
+        programmer.compression_stats = programmer.compression_stats.add(
+            len(data), len(payload)
+        )
+        return data
+
+    @classmethod
+    def process_response(cls, response):
+        """Handle the serial response."""
+        try:
+            return rle.decode(response)
+        except ValueError:
+            raise ValueError(f"{cls.name} got unexpected response: {response.hex()}")
+
+
+class EncodedWrite:
+    """Mixin for write commands which send their data run-length encoded."""
+
+    @classmethod
+    def prepare_request(cls, programmer, address, data):
+        """Return the request and count the bytes saved by encoding."""
+        request = super().prepare_request(programmer, address, data)
+        programmer.compression_stats = programmer.compression_stats.add(
+            len(data), request[1] - 2
+        )
+        return request
+
+    @classmethod
+    def format_arguments(cls, address, data):
+        """Return the command arguments as bytes."""
+        return cls.format_address(address) + rle.encode(data)
+
+
+class WriteRangeEncoded(EncodedWrite, WriteRange):
+    """
+    Write a range of consecutive bytes to the EEPROM, run-length encoded.
+
+    Args:
+        address (int): The address of the first byte in the range.
+        data (list[int]): The bytes to write.
+    """
+
+    CODE = "v"
+
+
+class WritePageEncoded(EncodedWrite, WritePage):
+    """
+    Write bytes within one page of the EEPROM in one write cycle, run-length encoded.
+
+    Args:
+        address (int): The address of the first byte to write.
+        data (list[int]): The bytes to write. Must not cross a page boundary.
+    """
+
+    CODE = "q"
+
+
+class BlockHashes(BinaryCommand):
+    """
+    Return the CRC16 of each of a number of consecutive blocks of the EEPROM.
+
+    Args:
+        address (int): The address of the first block.
+        block_size (int): The number of bytes in each block.
+        count (int): The number of blocks. At most MAX_BLOCKS.
+    """
+
+    CODE = "h"
+    name = "block_hashes"
+    MAX_BLOCKS = 127
+
+    @classmethod
+    def format_arguments(cls, address, block_size, count):
+        """Return the command arguments as bytes."""
+        return (
+            cls.format_address(address) + block_size.to_bytes(2, "big") + bytes([count])
+        )
+
+    @classmethod
+    def process_response(cls, response):
+        """Handle the serial response."""
+        if len(response) % 2:
+            raise ValueError(f"{cls.name} got unexpected response: {response.hex()}")
+        return [
+            int.from_bytes(response[i : i + 2], "big")
+            for i in range(0, len(response), 2)
+        ]
+
+    @classmethod
+    def hash(cls, data):
+        """Return the CRC16 of data as it is calculated by the programmer."""
+        return binascii.crc_hqx(bytes(data), 0)
+
+
+class RangeCRC(BinaryCommand):
+    """
+    Return the CRC32 of a range of the EEPROM.
+
+    Args:
+        address (int): The address of the first byte in the range.
+        length (int): The number of bytes in the range.
+    """
+
+    CODE = "k"
+    name = "range_crc"
+    MAX_LENGTH = 0xFFFF
+
+    @classmethod
+    def format_arguments(cls, address, length):
+        """Return the command arguments as bytes."""
+        return cls.format_address(address) + length.to_bytes(2, "big")
+
+    @classmethod
+    def process_response(cls, response):
+        """Handle the serial response."""
+        if len(response) != 4:
+            raise ValueError(f"{cls.name} got unexpected response: {response.hex()}")
+        return int.from_bytes(response, "big")
+
+    @classmethod
+    def hash(cls, data):
+        """Return the CRC32 of data as it is calculated by the programmer."""
+        return zlib.crc32(bytes(data))
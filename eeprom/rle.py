@@ -0,0 +1,117 @@
+"""
+Run-length encode data sent over the serial link.
+
+Data is encoded with PackBits. Each run starts with a control byte: 0 - 127 is
+followed by that many plus one literal bytes, 129 - 255 is followed by one byte which
+is repeated 257 minus the control byte times, and 128 is ignored. Blank and padded
+areas of an image compress to a small fraction of their size, while data without
+runs grows by at most one byte in 128, and decoding needs no buffer beyond the
+decoded data, so the programmer can decode it within its RAM.
+"""
+
+from collections import namedtuple
+
+MAX_RUN = 128
+
+
+def encode(data):
+    """
+    Return data run-length encoded with PackBits.
+
+    Args:
+        data (bytes-like): The data to encode.
+
+    Returns:
+        bytes
+
+    """
+    data = bytes(data)
+    encoded = bytearray()
+    literal_start = i = 0
+    while i < len(data):
+        run_end = i + 1
+        while (
+            run_end < len(data) and run_end - i < MAX_RUN and data[run_end] == data[i]
+        ):
+            run_end += 1
+        if run_end - i < 3:
+            i = run_end
+            continue
+        _literals(encoded, data[literal_start:i])
+        encoded += bytes([257 - (run_end - i), data[i]])
+        literal_start = i = run_end
+    _literals(encoded, data[literal_start:])
+    return bytes(encoded)
+
+
+def _literals(encoded, data):
+    for i in range(0, len(data), MAX_RUN):
+        chunk = data[i : i + MAX_RUN]
+        encoded += bytes([len(chunk) - 1]) + chunk
+
+
+def decode(data, max_length=None):
+    """
+    Return data decoded from PackBits.
+
+    Args:
+        data (bytes-like): The encoded data.
+
+    Kwargs:
+        max_length (int): The most bytes the data may decode to. Default: None.
+
+    Returns:
+        bytes
+
+    Raises:
+        ValueError if the data is not valid or decodes to more than max_length bytes.
+
+    """
+    data = bytes(data)
+    decoded = bytearray()
+    i = 0
+    while i < len(data):
+        control = data[i]
+        if control < 128:
+            chunk = data[i + 1 : i + control + 2]
+            if len(chunk) != control + 1:
+                raise ValueError("Run-length encoded data ends within a literal run.")
+            i += control + 2
+        elif control > 128:
+            if i + 1 >= len(data):
+                raise ValueError("Run-length encoded data ends within a repeated run.")
+            chunk = data[i + 1 : i + 2] * (257 - control)
+            i += 2
+        else:
+            i += 1
+            continue
+        decoded += chunk
+        if max_length is not None and len(decoded) > max_length:
+            raise ValueError(f"Run-length encoded data is longer than {max_length}.")
+    return bytes(decoded)
+
+
+class CompressionStats(namedtuple("CompressionStats", "data_bytes encoded_bytes")):
+    """The bytes of data sent and recieved run-length encoded, before and after."""
+
+    __slots__ = ()
+
+    def add(self, data_bytes, encoded_bytes):
+        """Return the stats with the lengths of more data added."""
+        return CompressionStats(
+            self.data_bytes + data_bytes, self.encoded_bytes + encoded_bytes
+        )
+
+    def since(self, earlier):
+        """Return the stats of the data transferred since earlier stats were taken."""
+        return CompressionStats(
+            self.data_bytes - earlier.data_bytes,
+            self.encoded_bytes - earlier.encoded_bytes,
+        )
+
+    @property
+    def ratio(self):
+        """Return the number of data bytes per encoded byte, or None if none."""
+        if not self.encoded_bytes:
+            return None
+        return self.data_bytes / self.encoded_bytes
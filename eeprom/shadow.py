@@ -0,0 +1,107 @@
+"""
+A cache of the last known contents of EEPROMs.
+
+Each image is stored under a fingerprint of its contents made from a few sampled
+blocks and the CRC32 of the whole image. The fingerprint of the EEPROM in the
+programmer is found from the same samples and a CRC32 calculated by the programmer, so
+an image is only used while the EEPROM still holds it, and a different or changed
+chip is not mistaken for it.
+"""
+
+import hashlib
+import os
+import zlib
+from pathlib import Path
+
+SAMPLE_COUNT = 8
+SAMPLE_SIZE = 16
+
+
+def sample_ranges(size):
+    """Return the (address, length) of each block sampled from an image of size bytes."""
+    step = max(size // SAMPLE_COUNT, SAMPLE_SIZE)
+    return [
+        (address, min(SAMPLE_SIZE, size - address)) for address in range(0, size, step)
+    ][:SAMPLE_COUNT]
+
+
+def fingerprint(samples, crc):
+    """
+    Return the fingerprint of an image.
+
+    Args:
+        samples (list(list(int))): The blocks given by sample_ranges.
+        crc (int): The CRC32 of the image.
+
+    """
+    digest = hashlib.sha1()
+    for sample in samples:
+        digest.update(bytes(sample))
+    return f"{crc:08x}-{digest.hexdigest()[:16]}"
+
+
+def image_fingerprint(data):
+    """Return the fingerprint of an image held in memory."""
+    samples = [
+        data[address : address + length] for address, length in sample_ranges(len(data))
+    ]
+    return fingerprint(samples, zlib.crc32(bytes(data)))
+
+
+class ShadowCache:
+    """Stores images of EEPROMs in a directory by their fingerprints."""
+
+    MAX_IMAGES = 16
+
+    def __init__(self, directory):
+        """
+        Create a cache.
+
+        Args:
+            directory (str): The directory images are stored in. It is created when
+                the first image is saved.
+
+        """
+        self.directory = Path(directory)
+
+    def path(self, key):
+        """Return the path of the image with a fingerprint."""
+        return self.directory / f"{key}.bin"
+
+    def load(self, key, size):
+        """
+        Return the image with a fingerprint.
+
+        Args:
+            key (str): The fingerprint of the image.
+            size (int): The size of the image.
+
+        Returns:
+            bytearray: The image, or None if it is not cached.
+
+        """
+        try:
+            data = bytearray(self.path(key).read_bytes())
+        except OSError:
+            return None
+        if len(data) != size:
+            return None
+        os.utime(self.path(key))
+        return data
+
+    def save(self, data):
+        """
+        Store an image, removing the least recently used images beyond MAX_IMAGES.
+
+        Args:
+            data (bytes-like): The image.
+
+        """
+        self.directory.mkdir(parents=True, exist_ok=True)
+        path = self.path(image_fingerprint(data))
+        temporary_path = path.with_suffix(".tmp")
+        temporary_path.write_bytes(bytes(data))
+        os.replace(temporary_path, path)
+        images = sorted(self.directory.glob("*.bin"), key=lambda _: _.stat().st_mtime)
+        for old_path in images[: -self.MAX_IMAGES]:
+            old_path.unlink()
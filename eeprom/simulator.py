@@ -0,0 +1,852 @@
+"""
+A simulator of the EEPROM programmer for use without hardware.
+
+The simulator runs the programmer's serial protocol against an EEPROM held in memory.
+Time is kept on a virtual clock which advances as data crosses the serial link at the
+baud rate of the connection and as the simulated EEPROM is read and written, so
+transfer modes can be compared without waiting for them. Reads with a timeout only
+return the bytes which arrive within it on the virtual clock. Bytes sent while the
+simulated programmer is busy wait in a recieve queue of the same size as the
+firmware's and are lost if it overflows. Faults can be injected into the responses
+and into individual addresses.
+
+Programmer opens a simulator when its port is a URL of the form
+"sim://name?option=value&...". Simulators are kept by name so that later connections
+to the same name see the same EEPROM. Options only apply when a simulator is created:
+
+    size: The size of the EEPROM in bytes. Default: 0x8000.
+    fill: The value of every byte of a new EEPROM. Default: 0xFF.
+    image: The path of a binary file loaded into the start of the EEPROM.
+    write_cycle_time: The seconds taken by each write cycle. Default: 0.003.
+    read_time: The seconds taken to read a byte. Default: 0.00005.
+    fast_read_time: The seconds taken to read a byte for a hash. Default: 0.00001.
+    corrupt: The probability of each byte sent to the host being corrupted.
+    drop: The probability of each byte sent to the host being lost.
+    corrupt_requests: The probability of each byte sent by the host being corrupted.
+    bad: Comma separated hex addresses which can not be written.
+    seed: The seed of the random numbers used to inject faults.
+    realtime: If 1 wait for simulated time to pass as it would with hardware.
+    max_baud: The highest baud rate at which the serial link works.
+    max_page: The most bytes written by a page write, 0 for no page writes. Default: 64.
+
+The simulator can also be served on a pseudo terminal, which is opened like any other
+serial port, with the simulate command.
+"""
+
+import math
+import os
+import random
+import re
+import select
+import time
+from collections import deque
+from urllib.parse import parse_qsl, urlsplit
+
+import serial
+
+from . import programmer_commands as commands
+from . import rle
+from .arduino import Arduino
+
+AWAIT_CODE = 0
+IN_MESSAGE = 1
+AWAIT_FRAME_LENGTH = 2
+IN_FRAME = 3
+
+simulators = {}
+
+
+class Simulator:
+    """Simulates the programmer's firmware and the EEPROM connected to it."""
+
+    READY_MESSAGE = b"READY\r\n"
+    SUCCESS_MESSAGE = b"ACK"
+    FRAME_ACK = 0x06
+    FRAME_NAK = 0x15
+    FRAME_RETRY = 0x18
+    PROTOCOL_VERSION = 6
+    RECIEVE_QUEUE_SIZE = 320
+    MAX_MESSAGE_LENGTH = 40
+    MAX_RANGE_LENGTH = 128
+    MAX_PAGE_LENGTH = 64
+    WRITE_CYCLE_TIMEOUT = 0.012
+    FRAME_TIMEOUT = 0.05
+    BITS_PER_BYTE = 10
+
+    def __init__(
+        self,
+        size=0x8000,
+        fill=0xFF,
+        image=b"",
+        baud=115200,
+        write_cycle_time=0.003,
+        read_time=0.00005,
+        fast_read_time=0.00001,
+        corrupt=0,
+        drop=0,
+        corrupt_requests=0,
+        bad=(),
+        seed=None,
+        realtime=False,
+        max_baud=None,
+        max_page=MAX_PAGE_LENGTH,
+    ):
+        """
+        Create a simulated programmer.
+
+        Kwargs:
+            size (int): The size of the EEPROM in bytes. Default: 0x8000.
+            fill (int): The value of every byte of the EEPROM. Default: 0xFF.
+            image (bytes): Data loaded into the start of the EEPROM. Default: b"".
+            baud (int): The baud rate of the serial link. Default: 115200.
+            write_cycle_time (float): The seconds taken by each write cycle.
+                Default: 0.003.
+            read_time (float): The seconds taken to read a byte. Default: 0.00005.
+            fast_read_time (float): The seconds taken to read a byte when hashing
+                ranges, which the firmware does through the ports. Default: 0.00001.
+            corrupt (float): The probability of each byte sent to the host having a
+                bit flipped. Default: 0.
+            drop (float): The probability of each byte sent to the host being lost.
+                Default: 0.
+            corrupt_requests (float): The probability of each byte sent by the host
+                having a bit flipped. Default: 0.
+            bad (iterable): Addresses which can not be written. Writing to them
+                times out. Default: ().
+            seed (int): The seed of the random numbers used to inject faults.
+            realtime (bool): If True reads wait for simulated time to pass on the
+                system clock. Default: False.
+            max_baud (int): The highest baud rate at which the serial link works.
+                Bytes sent faster are lost. Default: None.
+            max_page (int): The most bytes written by a page write, as firmware
+                built for a different EEPROM would report, or 0 to simulate firmware
+                without page writes. Default: 64.
+
+        """
+        self.memory = bytearray([fill]) * size
+        self.memory[: len(image)] = image
+        self.baud = baud
+        self.write_cycle_time = write_cycle_time
+        self.read_time = read_time
+        self.fast_read_time = fast_read_time
+        self.corrupt = corrupt
+        self.drop = drop
+        self.corrupt_requests = corrupt_requests
+        self.bad = set(bad)
+        self.random = random.Random(seed)
+        self.realtime = realtime
+        self.max_baud = max_baud
+        self.max_page = max_page
+        self.clock = 0.0
+        self._epoch = time.monotonic()
+        self.bytes_recieved = 0
+        self.bytes_sent = 0
+        self.overflows = 0
+        self.busy_time = 0.0
+        self._restart()
+
+    @property
+    def byte_time(self):
+        """Return the seconds taken to send a byte over the serial link."""
+        return self.BITS_PER_BYTE / self.baud
+
+    def _restart(self):
+        """Clear the state of the firmware."""
+        self._state = AWAIT_CODE
+        self._message = bytearray()
+        self._frame_code = None
+        self._frame_length = 0
+        self._frame = bytearray()
+        self._frame_time = 0.0
+        self._rx_buffer = deque()
+        self._output = deque()
+        self._in_free = self._device_free = self._out_free = self.clock
+        self.write_cycle_count = 0
+        self.write_cycle_total = 0
+        self.write_cycle_max = 0
+        self.write_cycle_timeouts = 0
+        # The baud rate set by the host, or None to follow the port's rate.
+        self.firmware_baud = None
+        self._previous_baud = None
+        self.frame_checking = False
+
+    def reset(self):
+        """Restart the firmware, as happens when the host raises DTR."""
+        self._restart()
+        self._send(self.READY_MESSAGE)
+
+    def recieve(self, data):
+        """
+        Recieve bytes sent by the host.
+
+        Args:
+            data (bytes): The bytes sent.
+
+        """
+        self._update_clock()
+        if self.link_broken:
+            self._recieve_noise()
+            return
+        for byte in data:
+            if self.corrupt_requests and self.random.random() < self.corrupt_requests:
+                byte ^= 1 << self.random.randrange(8)
+            self._in_free = max(self._in_free, self.clock) + self.byte_time
+            self._run_until(self._in_free)
+            if self._device_free <= self._in_free:
+                self._process(byte, self._in_free)
+            elif len(self._rx_buffer) < self.RECIEVE_QUEUE_SIZE:
+                self._rx_buffer.append((byte, self._in_free))
+            else:
+                self.overflows += 1
+        self.bytes_recieved += len(data)
+
+    @property
+    def link_broken(self):
+        """Return True if bytes sent by the host arrive as noise."""
+        return (self.firmware_baud is not None and self.firmware_baud != self.baud) or (
+            self.max_baud is not None and self.baud > self.max_baud
+        )
+
+    def _recieve_noise(self):
+        """Restore the previous baud rate if a new one has not been confirmed."""
+        if self._previous_baud is not None:
+            self.firmware_baud, self._previous_baud = self._previous_baud, None
+            self._reset_recieve()
+
+    @property
+    def in_waiting(self):
+        """Return the number of bytes which will be sent to the host."""
+        self._run_until(float("inf"))
+        return sum(len(chunk) for chunk, end in self._output)
+
+    def read(self, size, timeout=None):
+        """
+        Return up to size bytes sent to the host.
+
+        The clock advances to the time the last byte returned arrives. If a timeout
+        is given only the bytes which arrive within it are returned and, if there
+        are fewer than size, the clock advances by the whole timeout, as a serial
+        port waits. Otherwise every byte the firmware will send is available, as
+        counted by in_waiting.
+
+        Args:
+            size (int): The maximum number of bytes to return.
+
+        Kwargs:
+            timeout (float): The most seconds to wait for size bytes. Default: None.
+
+        """
+        self._update_clock()
+        self._run_until(float("inf"))
+        limit = self.clock + timeout if timeout else float("inf")
+        data = bytearray()
+        while self._output and len(data) < size:
+            chunk, end = self._output[0]
+            taken = chunk[: min(size - len(data), self._arrived(chunk, end, limit))]
+            if not taken:
+                break
+            del chunk[: len(taken)]
+            data += taken
+            self._advance(end - len(chunk) * self.byte_time)
+            if not chunk:
+                self._output.popleft()
+        if len(data) < size and limit < float("inf"):
+            self._advance(limit)
+        return bytes(data)
+
+    def clear_output(self):
+        """Discard bytes which have reached the host and not been read."""
+        self._update_clock()
+        self._run_until(float("inf"))
+        while self._output:
+            chunk, end = self._output[0]
+            del chunk[: self._arrived(chunk, end, self.clock)]
+            if chunk:
+                return
+            self._output.popleft()
+
+    def _arrived(self, chunk, end, clock):
+        """Return the number of bytes of a chunk sent by end which arrive by clock."""
+        if end <= clock:
+            return len(chunk)
+        # The bytes of a chunk arrive one byte time apart, the last at end.
+        late = math.ceil((end - clock) / self.byte_time - 1e-9)
+        return max(len(chunk) - late, 0)
+
+    def _update_clock(self):
+        """Bring the clock up to date with the system clock in real time mode."""
+        if self.realtime:
+            self.clock = max(self.clock, time.monotonic() - self._epoch)
+
+    def _advance(self, clock):
+        """Advance the clock, waiting for the time to pass in real time mode."""
+        self.clock = max(self.clock, clock)
+        if self.realtime:
+            delay = self.clock - (time.monotonic() - self._epoch)
+            if delay > 0:
+                time.sleep(delay)
+
+    def _run_until(self, clock):
+        """Process buffered bytes the firmware reaches by a point in time."""
+        while self._rx_buffer and self._device_free <= clock:
+            byte, arrival = self._rx_buffer.popleft()
+            self._process(byte, max(arrival, self._device_free))
+
+    def _busy(self, seconds):
+        """Keep the firmware busy for a number of seconds."""
+        self._device_free += seconds
+        self.busy_time += seconds
+
+    def _send(self, data):
+        """Queue bytes to be sent to the host once the firmware is done with them."""
+        output = bytearray()
+        for byte in data:
+            if self.drop and self.random.random() < self.drop:
+                continue
+            if self.corrupt and self.random.random() < self.corrupt:
+                byte ^= 1 << self.random.randrange(8)
+            output.append(byte)
+        self._out_free = max(self._out_free, self._device_free)
+        self._out_free += len(data) * self.byte_time
+        self.bytes_sent += len(data)
+        if output:
+            self._output.append((output, self._out_free))
+
+    def _send_line(self, text):
+        """Queue a line of text to be sent to the host."""
+        self._send(text + b"\r\n")
+
+    def _process(self, byte, clock):
+        """Handle a byte read from the receive buffer."""
+        self._device_free = clock
+        if self._frame_timed_out(clock):
+            self._state = AWAIT_CODE
+            if self.frame_checking:
+                self._send_frame(status=self.FRAME_RETRY)
+        self._frame_time = clock
+        if self._state == AWAIT_CODE:
+            if chr(byte) in BINARY_CODES and self._previous_baud is None:
+                self._frame_code = chr(byte)
+                self._state = AWAIT_FRAME_LENGTH
+            else:
+                self._state = IN_MESSAGE
+                self._process_message_byte(byte)
+        elif self._state == IN_MESSAGE:
+            self._process_message_byte(byte)
+        elif self._state == AWAIT_FRAME_LENGTH:
+            self._frame_length = byte
+            self._frame = bytearray()
+            self._state = IN_FRAME
+            if self._frame_length == self._frame_end == 0:
+                self._state = AWAIT_CODE
+                self._parse_frame()
+        else:
+            self._frame.append(byte)
+            if len(self._frame) == self._frame_end:
+                self._state = AWAIT_CODE
+                self._parse_frame()
+
+    def _frame_timed_out(self, clock):
+        """Return True if a frame was left incomplete for too long."""
+        return (
+            self._state in (AWAIT_FRAME_LENGTH, IN_FRAME)
+            and clock - self._frame_time > self.FRAME_TIMEOUT
+        )
+
+    @property
+    def _frame_end(self):
+        """Return the number of bytes after the length of the current frame."""
+        return self._frame_length + (2 if self.frame_checking else 0)
+
+    def _process_message_byte(self, byte):
+        """Add a byte to the current message, handling it when it is complete."""
+        if byte == ord("\n"):
+            self._state = AWAIT_CODE
+            message = self._message.decode("latin-1")
+            self._message = bytearray()
+            self._parse_message(message)
+        elif len(self._message) < self.MAX_MESSAGE_LENGTH:
+            self._message.append(byte)
+
+    def _parse_message(self, message):
+        """Handle a text command."""
+        if self._previous_baud is not None:
+            self._confirm_baud(message)
+            return
+        if self.frame_checking and message[:1] in self.UNCHECKED_DATA_CODES:
+            # A checked frame with a damaged code can look like one of these.
+            self._send_frame(status=self.FRAME_NAK)
+            return
+        handler = self.MESSAGE_HANDLERS.get(message[:1])
+        if handler is None:
+            self._send_line(message[:1].encode("latin-1") or b"\x00")
+        else:
+            handler(self, message)
+
+    def _parse_frame(self):
+        """Handle a binary frame, replying with an error if it is not valid."""
+        if self.frame_checking:
+            header = bytes([ord(self._frame_code), self._frame_length])
+            frame, checksum = self._frame[:-2], self._frame[-2:]
+            if checksum != commands.BinaryCommand.checksum(header + frame):
+                self._send_frame(status=self.FRAME_RETRY)
+                return
+            self._frame = frame
+        handler, valid = self.FRAME_HANDLERS[self._frame_code]
+        if valid(self, self._frame):
+            handler(self, self._frame)
+        else:
+            self._send_frame(status=self.FRAME_NAK)
+
+    def _send_frame(self, payload=b"", status=FRAME_ACK):
+        """Queue a binary reply to be sent to the host."""
+        frame = bytes([status, len(payload)]) + bytes(payload)
+        if self.frame_checking:
+            frame += commands.BinaryCommand.checksum(frame)
+        self._send(frame)
+
+    def _read_eeprom(self, address):
+        """Return the value of an address of the EEPROM."""
+        self._busy(self.read_time)
+        return self.memory[address % len(self.memory)]
+
+    def _fast_read_eeprom(self, address, length):
+        """Return a range of the EEPROM, read as the firmware does for hashes."""
+        self._busy(self.fast_read_time * length)
+        return bytes(
+            self.memory[(address + i) % len(self.memory)] for i in range(length)
+        )
+
+    def _write_eeprom(self, address, data):
+        """Write a byte to the EEPROM and wait for the write cycle."""
+        self._store(address, data)
+        self._wait_for_write_cycle(address)
+
+    def _write_page(self, address, data):
+        """Write a page of bytes to the EEPROM in a single write cycle."""
+        for offset, byte in enumerate(data):
+            self._store(address + offset, byte)
+        self._wait_for_write_cycle(address + len(data) - 1)
+
+    def _store(self, address, data):
+        """Store a byte unless it is written to a bad address."""
+        if address not in self.bad:
+            self.memory[address % len(self.memory)] = data
+
+    def _wait_for_write_cycle(self, address):
+        """Wait for a write cycle, recording its time as the firmware does."""
+        if address in self.bad:
+            elapsed = self.WRITE_CYCLE_TIMEOUT
+            self.write_cycle_timeouts += 1
+        else:
+            elapsed = self.write_cycle_time
+        self._busy(elapsed)
+        elapsed = round(elapsed * 1000000)
+        self.write_cycle_count += 1
+        self.write_cycle_total += elapsed
+        self.write_cycle_max = max(self.write_cycle_max, elapsed)
+
+    def _read_byte(self, message):
+        """Reply with the value of an address."""
+        self._send_line(f"{self._read_eeprom(parse_hex(message, 1, 5)):X}".encode())
+
+    def _write_byte(self, message):
+        """Write a byte to an address."""
+        self._write_eeprom(parse_hex(message, 1, 5), parse_hex(message, 5, 7))
+        self._send_line(self.SUCCESS_MESSAGE)
+
+    def _read_16(self, message):
+        """Reply with 16 bytes as hexadecimal text."""
+        address = parse_hex(message, 1, 5)
+        data = [self._read_eeprom(address + i) for i in range(16)]
+        self._send_line("".join(f"{byte:02X} " for byte in data).encode())
+
+    def _write_16(self, message):
+        """Write 16 bytes sent as hexadecimal text."""
+        address = parse_hex(message, 1, 5)
+        for i in range(16):
+            self._write_eeprom(address + i, parse_hex(message, 5 + i * 2, 7 + i * 2))
+        self._send_line(self.SUCCESS_MESSAGE)
+
+    def _success(self, message):
+        """Reply with the success message."""
+        self._send_line(self.SUCCESS_MESSAGE)
+
+    def _enable_checksums(self, message):
+        """Reply with the success message, then check every frame."""
+        self._send_line(self.SUCCESS_MESSAGE)
+        self.frame_checking = True
+
+    def _credits(self, message):
+        """Reply with the size of the recieve queue."""
+        self._send_line(str(self.RECIEVE_QUEUE_SIZE).encode())
+
+    def _max_range(self, message):
+        """Reply with the largest range which can be read or written at once."""
+        self._send_line(str(self.MAX_RANGE_LENGTH).encode())
+
+    def _max_page(self, message):
+        """Reply with the largest page which can be written at once."""
+        self._send_line(str(self.max_page).encode())
+
+    def _protocol_version(self, message):
+        """Reply with the version of the protocol."""
+        self._send_line(str(self.PROTOCOL_VERSION).encode())
+
+    def _set_baud(self, message):
+        """Acknowledge, then switch baud rate until a ping at the new rate."""
+        if not message[1:].isdigit() or not int(message[1:]):
+            self._send_line(message[:1].encode("latin-1"))
+            return
+        self._send_line(self.SUCCESS_MESSAGE)
+        self._previous_baud = self.baud
+        self.firmware_baud = int(message[1:])
+
+    def _confirm_baud(self, message):
+        """Keep a new baud rate if the host pings, otherwise restore the previous."""
+        if message == Arduino.PING_MESSAGE:
+            self._send_line(self.SUCCESS_MESSAGE)
+        else:
+            self.firmware_baud = self._previous_baud
+        self._previous_baud = None
+        self._reset_recieve()
+
+    def _reset_recieve(self):
+        """Discard bytes recieved around a baud rate switch, which may be noise."""
+        self._rx_buffer.clear()
+        self._state = AWAIT_CODE
+        self._message = bytearray()
+
+    def _write_cycle_times(self, message):
+        """Reply with the write cycle times recorded and reset them."""
+        stats = (
+            self.write_cycle_count,
+            self.write_cycle_total,
+            self.write_cycle_max,
+            self.write_cycle_timeouts,
+        )
+        self._send_line(" ".join(str(_) for _ in stats).encode())
+        self.write_cycle_count = 0
+        self.write_cycle_total = 0
+        self.write_cycle_max = 0
+        self.write_cycle_timeouts = 0
+
+    def _read_range(self, frame):
+        """Reply with a range of bytes in a binary frame."""
+        address = frame_address(frame)
+        self._send_frame([self._read_eeprom(address + i) for i in range(frame[2])])
+
+    def _write_range(self, frame):
+        """Write a range of bytes a byte at a time."""
+        address = frame_address(frame)
+        for offset, byte in enumerate(frame[2:]):
+            self._write_eeprom(address + offset, byte)
+        self._send_frame()
+
+    def _write_page_frame(self, frame):
+        """Write a range of bytes as a single page."""
+        self._write_page(frame_address(frame), frame[2:])
+        self._send_frame()
+
+    def _read_range_encoded(self, frame):
+        """Reply with a range of bytes run-length encoded in a binary frame."""
+        address = frame_address(frame)
+        data = bytes(self._read_eeprom(address + i) for i in range(frame[2]))
+        self._send_frame(rle.encode(data))
+
+    def _block_hashes(self, frame):
+        """Reply with the CRC16 of each of a number of blocks."""
+        address = frame_address(frame)
+        block_size = (frame[2] << 8) | frame[3]
+        hashes = bytearray()
+        for block in range(frame[4]):
+            data = self._fast_read_eeprom(address + block * block_size, block_size)
+            hashes += commands.BlockHashes.hash(data).to_bytes(2, "big")
+        self._send_frame(hashes)
+
+    def _range_crc(self, frame):
+        """Reply with the CRC32 of a range."""
+        data = self._fast_read_eeprom(frame_address(frame), (frame[2] << 8) | frame[3])
+        self._send_frame(commands.RangeCRC.hash(data).to_bytes(4, "big"))
+
+    MESSAGE_HANDLERS = {
+        commands.ReadByte.CODE: _read_byte,
+        commands.WriteByte.CODE: _write_byte,
+        commands.ReadBlock.CODE: _read_16,
+        commands.WriteBlock.CODE: _write_16,
+        commands.EnableBinary.CODE: _success,
+        Arduino.PING_MESSAGE: _success,
+        commands.Credits.CODE: _credits,
+        commands.MaxRange.CODE: _max_range,
+        commands.MaxPage.CODE: _max_page,
+        commands.WriteCycleTimes.CODE: _write_cycle_times,
+        commands.ProtocolVersion.CODE: _protocol_version,
+        commands.SetBaud.CODE: _set_baud,
+        commands.EnableChecksums.CODE: _enable_checksums,
+    }
+
+    # Text commands which read or write the EEPROM, refused while frames are checked.
+    UNCHECKED_DATA_CODES = (
+        commands.ReadByte.CODE,
+        commands.WriteByte.CODE,
+        commands.ReadBlock.CODE,
+        commands.WriteBlock.CODE,
+    )
+
+    FRAME_HANDLERS = {
+        commands.ReadBlockBinary.CODE: (
+            lambda self, frame: self._read_range(frame + b"\x10"),
+            lambda self, frame: len(frame) == 2,
+        ),
+        commands.WriteBlockBinary.CODE: (
+            _write_range,
+            lambda self, frame: 2 < len(frame) <= 18,
+        ),
+        commands.ReadRange.CODE: (
+            _read_range,
+            lambda self, frame: len(frame) == 3
+            and 0 < frame[2] <= self.MAX_RANGE_LENGTH,
+        ),
+        commands.WriteRange.CODE: (
+            _write_range,
+            lambda self, frame: 2 < len(frame) <= self.MAX_RANGE_LENGTH + 2,
+        ),
+        commands.WritePage.CODE: (
+            _write_page_frame,
+            lambda self, frame: 2 < len(frame) <= self.max_page + 2,
+        ),
+        commands.ReadRangeEncoded.CODE: (
+            _read_range_encoded,
+            lambda self, frame: len(frame) == 3
+            and 0 < frame[2] <= self.MAX_RANGE_LENGTH,
+        ),
+        commands.WriteRangeEncoded.CODE: (
+            lambda self, frame: self._write_range(frame[:2] + rle.decode(frame[2:])),
+            lambda self, frame: len(frame) > 2
+            and 0 < decoded_length(frame[2:], self.MAX_RANGE_LENGTH),
+        ),
+        commands.WritePageEncoded.CODE: (
+            lambda self, frame: self._write_page_frame(
+                frame[:2] + rle.decode(frame[2:])
+            ),
+            lambda self, frame: len(frame) > 2
+            and 0 < decoded_length(frame[2:], self.max_page),
+        ),
+        commands.BlockHashes.CODE: (
+            _block_hashes,
+            lambda self, frame: len(frame) == 5
+            and (frame[2] or frame[3])
+            and 0 < frame[4] * 2 <= 255,
+        ),
+        commands.RangeCRC.CODE: (
+            _range_crc,
+            lambda self, frame: len(frame) == 4 and (frame[2] or frame[3]),
+        ),
+    }
+
+
+BINARY_CODES = tuple(Simulator.FRAME_HANDLERS)
+
+
+def parse_hex(message, start, end):
+    """
+    Return part of a message parsed as a hexadecimal number as the firmware does.
+
+    Leading hexadecimal digits are parsed and anything after them is ignored. If
+    there are none the result is 0.
+    """
+    digits = re.match("[0-9A-Fa-f]*", message[start:end][:4]).group()
+    return int(digits, 16) if digits else 0
+
+
+def frame_address(frame):
+    """Return the address at the start of a binary frame."""
+    return (frame[0] << 8) | frame[1]
+
+
+def decoded_length(data, max_length):
+    """Return the length of run-length encoded data, or 0 if it is not valid."""
+    try:
+        return len(rle.decode(data, max_length=max_length))
+    except ValueError:
+        return 0
+
+
+def read_file(path):
+    """Return the contents of a file."""
+    with open(path, "rb") as f:
+        return f.read()
+
+
+URL_OPTIONS = {
+    "size": lambda value: int(value, 0),
+    "fill": lambda value: int(value, 0),
+    "image": read_file,
+    "write_cycle_time": float,
+    "read_time": float,
+    "fast_read_time": float,
+    "corrupt": float,
+    "drop": float,
+    "corrupt_requests": float,
+    "bad": lambda value: [int(address, 16) for address in value.split(",")],
+    "seed": int,
+    "realtime": lambda value: value.lower() in ("1", "true", "yes"),
+    "max_baud": int,
+    "max_page": int,
+}
+
+
+def get_simulator(url):
+    """
+    Return the simulator for a sim:// URL, creating it if it does not exist.
+
+    A URL without a name always creates a new simulator.
+
+    Raises:
+        serial.SerialException if the URL is not valid.
+
+    """
+    parts = urlsplit(url)
+    try:
+        if parts.scheme != "sim":
+            raise ValueError("the URL must start with sim://")
+        options = {
+            name: URL_OPTIONS[name](value) for name, value in parse_qsl(parts.query)
+        }
+    except KeyError as error:
+        raise serial.SerialException(f"Unknown simulator option {error} in {url}.")
+    except (ValueError, OSError) as error:
+        raise serial.SerialException(f"Invalid simulator URL {url}: {error}")
+    name = parts.netloc + parts.path
+    if not name:
+        return Simulator(**options)
+    if name not in simulators:
+        simulators[name] = Simulator(**options)
+    return simulators[name]
+
+
+class SimulatedSerial(serial.SerialBase):
+    """A pyserial compatible serial port connected to a simulator."""
+
+    def __init__(self, *args, simulator=None, **kwargs):
+        """
+        Create a serial port.
+
+        Accepts the arguments of serial.Serial.
+
+        Kwargs:
+            simulator (Simulator): The simulator to connect to. If None the simulator
+                is found from the port URL when the port is opened.
+
+        """
+        self.simulator = simulator
+        super().__init__(*args, **kwargs)
+
+    def open(self):
+        """
+        Open the port, resetting the simulator if DTR is raised.
+
+        Raises:
+            serial.SerialException if the port is already open, no port is set or
+                the port URL is not valid.
+
+        """
+        if self.is_open:
+            raise serial.SerialException("Port is already open.")
+        if self.simulator is None:
+            if self._port is None:
+                raise serial.SerialException(
+                    "Port must be configured before it can be used."
+                )
+            self.simulator = get_simulator(self._port)
+        self.is_open = True
+        self._reconfigure_port()
+        if self._dtr_state:
+            self.simulator.reset()
+
+    def close(self):
+        """Close the port."""
+        self.is_open = False
+
+    def _reconfigure_port(self, force_update=False):
+        """Apply the baud rate of the port to the simulator."""
+        self.simulator.baud = self._baudrate
+
+    def _update_dtr_state(self):
+        """Reset the simulator when DTR is raised, as it resets an Arduino."""
+        if self._dtr_state:
+            self.simulator.reset()
+
+    @property
+    def in_waiting(self):
+        """Return the number of bytes waiting to be read."""
+        return self.simulator.in_waiting
+
+    def read(self, size=1):
+        """Return up to size bytes from the simulator."""
+        if not self.is_open:
+            raise serial.SerialException("Port is not open.")
+        return self.simulator.read(size, timeout=self._timeout)
+
+    def write(self, data):
+        """Send bytes to the simulator."""
+        if not self.is_open:
+            raise serial.SerialException("Port is not open.")
+        data = bytes(data)
+        self.simulator.recieve(data)
+        return len(data)
+
+    def reset_input_buffer(self):
+        """Discard bytes waiting to be read."""
+        self.simulator.clear_output()
+
+    def reset_output_buffer(self):
+        """Do nothing, as written bytes are passed to the simulator immediately."""
+
+    def flush(self):
+        """Do nothing, as written bytes are passed to the simulator immediately."""
+
+
+def open_pty():
+    """
+    Open a pseudo terminal for a simulator in raw mode.
+
+    Pseudo terminals are only available on POSIX systems, so the modules for them
+    are imported here rather than preventing the package importing elsewhere.
+
+    Returns:
+        (tuple): The file descriptors of the master and slave ends and the path of
+            the slave end, which programs open as a serial port.
+
+    """
+    import pty
+    import tty
+
+    master, slave = pty.openpty()
+    tty.setraw(slave)
+    return master, slave, os.ttyname(slave)
+
+
+def serve_pty(simulator, master, stop=None, interval=0.05):
+    """
+    Relay data between a pseudo terminal and a simulator until interrupted.
+
+    The pseudo terminal can not signal DTR so the simulator is not reset and programs
+    must connect without resetting it.
+
+    Args:
+        simulator (Simulator): The simulator to serve.
+        master (int): The file descriptor of the master end of the pseudo terminal.
+
+    Kwargs:
+        stop (threading.Event): Stop serving when set. Default: None.
+        interval (float): Seconds between checks of stop. Default: 0.05.
+
+    """
+    try:
+        while stop is None or not stop.is_set():
+            readable, _, _ = select.select([master], [], [], interval)
+            if readable:
+                simulator.recieve(os.read(master, 1024))
+                os.write(master, simulator.read(simulator.in_waiting))
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1 @@
+"""Handlers for serial port URLs used with serial.serial_for_url."""
@@ -0,0 +1,5 @@
+"""Opens "sim://" URLs as serial ports connected to the programmer simulator."""
+
+from ..simulator import SimulatedSerial as Serial
+
+__all__ = ["Serial"]
@@ -1,3 +1,5 @@
+#include <util/crc16.h>
+
 #define ADD_DATA 2
 #define ADD_CLK 3
 #define ADD_LATCH 4
@@ -10,11 +12,86 @@ const char WRITE_CODE = 'W';
 const char READ_CODE = 'R';
 const char READ_16_CODE = 'T';
 const char WRITE_16_CODE = 'S';
+const char BINARY_CODE = 'B';
+const char CREDITS_CODE = 'C';
+const char MAX_RANGE_CODE = 'L';
+const char MAX_PAGE_CODE = 'G';
+const char WRITE_CYCLE_TIMES_CODE = 'M';
+const char PROTOCOL_VERSION_CODE = 'V';
+const char PING_CODE = 'P';
+const char BAUD_CODE = 'U';
+const char CHECKSUM_CODE = 'F';
+
+// Incremented whenever commands are added so the host can tell which it may use.
+const int PROTOCOL_VERSION = 6;
+
+// Binary frame codes. Frames are <code><length><payload> and are answered
+// with <status><length><payload>. Once checksums are enabled both end with
+// the CRC16 (XMODEM) of the rest of the frame.
+const char READ_16_BINARY_CODE = 't';
+const char WRITE_16_BINARY_CODE = 's';
+const char READ_RANGE_CODE = 'x';
+const char WRITE_RANGE_CODE = 'y';
+const char WRITE_PAGE_CODE = 'p';
+const char BLOCK_HASHES_CODE = 'h';
+const char RANGE_CRC_CODE = 'k';
+// Range and page frames with their data run-length encoded with PackBits.
+const char READ_RANGE_RLE_CODE = 'u';
+const char WRITE_RANGE_RLE_CODE = 'v';
+const char WRITE_PAGE_RLE_CODE = 'q';
+
+const byte FRAME_ACK = 0x06;
+const byte FRAME_NAK = 0x15;
+// Replied to a checked frame which was damaged, so the host sends it again.
+const byte FRAME_RETRY = 0x18;
+const int MAX_FRAME_LENGTH = 255;
+const int MAX_RANGE_LENGTH = 128;
+const int MAX_PAGE_LENGTH = 64;
+const int MAX_MESSAGE_LENGTH = 40;
+// Bytes recieved are moved from the serial buffer, which holds only 64 bytes,
+// into a queue of this size whenever the programmer waits for the EEPROM, so
+// the host can send several range or page frames ahead. Advertised as credits.
+const int RECIEVE_QUEUE_SIZE = 320;
+// Milliseconds to wait for the host to ping at a new baud rate.
+const unsigned long BAUD_CONFIRM_TIMEOUT = 500;
+// Milliseconds after which an incomplete frame is abandoned.
+const unsigned long FRAME_TIMEOUT = 50;
+
+// Recieve states
+const byte AWAIT_CODE = 0;
+const byte IN_MESSAGE = 1;
+const byte AWAIT_FRAME_LENGTH = 2;
+const byte IN_FRAME = 3;
+
+// The current baud rate. Every reset starts at 115200, which the host connects at.
+unsigned long baudRate = 115200;
 
 int writeEnableDelay = 1;
-int betweenWriteDelay = 12;
+bool pollWriteCycle = true;
+unsigned long writeCycleTimeout = 12000; // Microseconds. 10ms is the worst case.
+
+// Measured write cycle times in microseconds, reset when reported.
+unsigned long writeCycleCount = 0;
+unsigned long writeCycleTotal = 0;
+unsigned long writeCycleMax = 0;
+unsigned long writeCycleTimeouts = 0;
 
 String message;
+byte frame[MAX_FRAME_LENGTH + 2];
+// Decoded data of run-length encoded frames, and data read to be encoded.
+byte rangeData[MAX_RANGE_LENGTH];
+int decodedLength;
+byte recieveState = AWAIT_CODE;
+char frameCode;
+int frameLength;
+int frameRecieved;
+byte recieveQueue[RECIEVE_QUEUE_SIZE];
+int queueStart = 0;
+int queueLength = 0;
+bool frameChecking = false;
+unsigned long frameTime;
+// The CRC16 of the reply frame being sent.
+uint16_t replyCrc;
 
 void setup()
 {
@@ -23,12 +100,43 @@ void setup()
   pinMode(ADD_LATCH, OUTPUT);
   digitalWrite(WRITE_ENABLE, HIGH);
   pinMode(WRITE_ENABLE, OUTPUT);
-  Serial.begin(115200);
+  message.reserve(MAX_MESSAGE_LENGTH);
+  Serial.begin(baudRate);
+  Serial.println("READY");
 }
 
 void loop()
 {
-  recieve();
+  pollSerial();
+  while (queueLength > 0)
+  {
+    byte c = recieveQueue[queueStart];
+    queueStart = (queueStart + 1) % RECIEVE_QUEUE_SIZE;
+    queueLength--;
+    recieve(c);
+    pollSerial();
+  }
+  if (frameTimedOut())
+  {
+    recieveState = AWAIT_CODE;
+    if (frameChecking)
+    {
+      sendFrameStatus(FRAME_RETRY);
+    }
+  }
+}
+
+// Move bytes waiting in the serial buffer to the recieve queue. Called from
+// every loop which keeps the programmer busy so the serial buffer never
+// overflows while the host has no more than RECIEVE_QUEUE_SIZE bytes in flight.
+void pollSerial()
+{
+  while (Serial.available() && queueLength < RECIEVE_QUEUE_SIZE)
+  {
+    recieveQueue[(queueStart + queueLength) % RECIEVE_QUEUE_SIZE] = Serial.read();
+    queueLength++;
+    frameTime = millis();
+  }
 }
 
 //EEPROM Functions
@@ -52,6 +160,7 @@ byte readEEPROM(int address)
   {
     pinMode(pin, INPUT);
   }
+  pollSerial();
   setAddress(address, /*outputEnable*/ true);
   byte data = 0;
   for (int pin = EEPROM_D7; pin >= EEPROM_D0; pin--)
@@ -63,6 +172,7 @@ byte readEEPROM(int address)
 
 void writeEEPROM(int address, byte data)
 {
+  byte written = data;
   for (int pin = EEPROM_D0; pin <= EEPROM_D7; pin++)
   {
     pinMode(pin, OUTPUT);
@@ -76,15 +186,118 @@ void writeEEPROM(int address, byte data)
   digitalWrite(WRITE_ENABLE, LOW);
   delayMicroseconds(writeEnableDelay);
   digitalWrite(WRITE_ENABLE, HIGH);
-  delay(betweenWriteDelay);
+  if (pollWriteCycle)
+  {
+    waitForWriteCycle(address, written);
+  }
+}
+
+// Wait for a write cycle to complete using DATA polling. While the write
+// cycle is in progress reading the last address written returns the
+// complement of bit 7 of the data written.
+void waitForWriteCycle(int address, byte data)
+{
+  unsigned long start = micros();
+  for (int pin = EEPROM_D0; pin <= EEPROM_D7; pin++)
+  {
+    pinMode(pin, INPUT);
+  }
+  setAddress(address, /*outputEnable*/ true);
+  unsigned long elapsed = 0;
+  while ((byte)(digitalRead(EEPROM_D7) << 7) != (data & 0x80))
+  {
+    pollSerial();
+    elapsed = micros() - start;
+    if (elapsed > writeCycleTimeout)
+    {
+      writeCycleTimeouts++;
+      break;
+    }
+  }
+  elapsed = micros() - start;
+  writeCycleCount++;
+  writeCycleTotal += elapsed;
+  if (elapsed > writeCycleMax)
+  {
+    writeCycleMax = elapsed;
+  }
+}
+
+// Page writes must load each byte within 150us of the last, which is too
+// tight for digitalWrite and shiftOut, so the pins are driven through the
+// ports directly. ADD_DATA, ADD_CLK and ADD_LATCH are PD2 - PD4, EEPROM_D0 -
+// D2 are PD5 - PD7, EEPROM_D3 - D7 are PB0 - PB4 and WRITE_ENABLE is PB5.
+void fastShiftOut(byte value)
+{
+  for (int bit = 7; bit >= 0; bit--)
+  {
+    if (value & (1 << bit))
+    {
+      PORTD |= _BV(PD2);
+    }
+    else
+    {
+      PORTD &= ~_BV(PD2);
+    }
+    PORTD |= _BV(PD3);
+    PORTD &= ~_BV(PD3);
+  }
+}
+
+void loadPageByte(int address, byte data)
+{
+  fastShiftOut((address >> 8) | 0x80);
+  fastShiftOut(address);
+  PORTD &= ~_BV(PD4);
+  PORTD |= _BV(PD4);
+  PORTD &= ~_BV(PD4);
+  PORTD = (PORTD & 0x1F) | (data << 5);
+  PORTB = (PORTB & 0xE0) | (data >> 3);
+  PORTB &= ~_BV(PB5);
+  delayMicroseconds(writeEnableDelay);
+  PORTB |= _BV(PB5);
+}
+
+void setDataPinsInput()
+{
+  for (int pin = EEPROM_D0; pin <= EEPROM_D7; pin++)
+  {
+    pinMode(pin, INPUT);
+  }
+}
+
+// Hashes and checksums read every byte of a range, so the address is set and
+// the data read through the ports directly. The data pins must be inputs.
+byte fastReadEEPROM(int address)
+{
+  pollSerial();
+  fastShiftOut(address >> 8);
+  fastShiftOut(address);
+  PORTD &= ~_BV(PD4);
+  PORTD |= _BV(PD4);
+  PORTD &= ~_BV(PD4);
+  delayMicroseconds(1);
+  return (PIND >> 5) | ((PINB & 0x1F) << 3);
+}
+
+void writePageEEPROM(int address, byte *data, int count)
+{
+  for (int pin = EEPROM_D0; pin <= EEPROM_D7; pin++)
+  {
+    pinMode(pin, OUTPUT);
+  }
+  for (int i = 0; i < count; i++)
+  {
+    loadPageByte(address + i, data[i]);
+  }
+  waitForWriteCycle(address + count - 1, data[count - 1]);
 }
 
 void writeEnableEEPROM()
 {
   int oldWriteEnableDelay = writeEnableDelay;
-  int oldBetweenWriteDelay = betweenWriteDelay;
   writeEnableDelay = 0;
-  betweenWriteDelay = 0;
+  pollWriteCycle = false;
   writeEEPROM(0x5555, 0xAA);
   writeEEPROM(0x2AAA, 0x55);
   writeEEPROM(0x5555, 0x80);
@@ -92,34 +305,98 @@ void writeEnableEEPROM()
   writeEEPROM(0x2AAA, 0x55);
   writeEEPROM(0x5555, 0x20);
   writeEnableDelay = oldWriteEnableDelay;
-  betweenWriteDelay = oldBetweenWriteDelay;
+  pollWriteCycle = true;
 }
 
 // Serial Functions
-void recieve()
+// Messages and frames are assembled a byte at a time as they arrive and
+// handled once complete.
+void recieve(byte c)
 {
-  while (!Serial.available())
+  switch (recieveState)
   {
+  case AWAIT_CODE:
+    if (isBinaryCode(c))
+    {
+      frameCode = c;
+      recieveState = AWAIT_FRAME_LENGTH;
+    }
+    else
+    {
+      recieveState = IN_MESSAGE;
+      recieveMessageByte(c);
+    }
+    break;
+  case IN_MESSAGE:
+    recieveMessageByte(c);
+    break;
+  case AWAIT_FRAME_LENGTH:
+    frameLength = c;
+    frameRecieved = 0;
+    recieveState = IN_FRAME;
+    if (frameEnd() == 0)
+    {
+      recieveState = AWAIT_CODE;
+      parseFrame(frameCode, frameLength);
+    }
+    break;
+  case IN_FRAME:
+    frame[frameRecieved++] = c;
+    if (frameRecieved == frameEnd())
+    {
+      recieveState = AWAIT_CODE;
+      parseFrame(frameCode, frameLength);
+    }
+    break;
   }
+}
 
-  while (Serial.available())
+// The number of bytes after the length of the frame being recieved.
+int frameEnd()
+{
+  return frameLength + (frameChecking ? 2 : 0);
+}
+
+// A frame left incomplete is abandoned, whether or not frames are checked, so
+// that noise which looked like the start of a frame cannot swallow the next
+// command.
+bool frameTimedOut()
+{
+  return (recieveState == AWAIT_FRAME_LENGTH || recieveState == IN_FRAME) &&
+         millis() - frameTime > FRAME_TIMEOUT;
+}
+
+void recieveMessageByte(char c)
+{
+  if (c == '\n')
+  {
+    recieveState = AWAIT_CODE;
+    parseMessage(message);
+    message = "";
+  }
+  else if (message.length() < MAX_MESSAGE_LENGTH)
   {
-    char c = Serial.read();
     message += c;
-    delay(30);
-    if (c == '\n')
-    {
-      break;
-    }
   }
-  parseMessage(message);
-  message = "";
+}
+
+// Text commands which read or write the EEPROM, refused while frames are checked.
+bool isUncheckedDataCode(char code)
+{
+  return code == READ_CODE || code == WRITE_CODE || code == READ_16_CODE ||
+         code == WRITE_16_CODE;
 }
 
 void parseMessage(String message)
 {
   char instructionCode = message.charAt(0);
-  if (instructionCode == WRITE_CODE)
+  if (frameChecking && isUncheckedDataCode(instructionCode))
+  {
+    // A checked frame with a damaged code can look like one of these, so they
+    // are refused rather than trusted.
+    sendFrameStatus(FRAME_NAK);
+  }
+  else if (instructionCode == WRITE_CODE)
   {
     handleWriteByte(message);
   }
@@ -135,6 +412,41 @@ void parseMessage(String message)
   {
     handleWrite16(message);
   }
+  else if (instructionCode == BINARY_CODE || instructionCode == PING_CODE)
+  {
+    writeSuccess();
+  }
+  else if (instructionCode == CREDITS_CODE)
+  {
+    // Commands waiting in the recieve queue are not lost while we are busy, so
+    // the host may send ahead up to the size of the queue.
+    Serial.println(RECIEVE_QUEUE_SIZE);
+  }
+  else if (instructionCode == MAX_RANGE_CODE)
+  {
+    Serial.println(MAX_RANGE_LENGTH);
+  }
+  else if (instructionCode == MAX_PAGE_CODE)
+  {
+    Serial.println(MAX_PAGE_LENGTH);
+  }
+  else if (instructionCode == WRITE_CYCLE_TIMES_CODE)
+  {
+    handleWriteCycleTimes();
+  }
+  else if (instructionCode == PROTOCOL_VERSION_CODE)
+  {
+    Serial.println(PROTOCOL_VERSION);
+  }
+  else if (instructionCode == BAUD_CODE)
+  {
+    handleSetBaud(message);
+  }
+  else if (instructionCode == CHECKSUM_CODE)
+  {
+    writeSuccess();
+    frameChecking = true;
+  }
   else
   {
     recieveError(instructionCode);
@@ -151,6 +463,88 @@ void writeSuccess()
   Serial.println("ACK");
 }
 
+// Acknowledge at the current rate, then switch to the requested baud rate. The
+// host must ping at the new rate to confirm the link works. If anything else
+// arrives, or nothing within BAUD_CONFIRM_TIMEOUT, the previous rate is
+// restored so the host can fall back to it.
+void handleSetBaud(String message)
+{
+  long rate = message.substring(1).toInt();
+  if (rate <= 0)
+  {
+    recieveError(BAUD_CODE);
+    return;
+  }
+  writeSuccess();
+  Serial.flush();
+  Serial.begin(rate);
+  if (awaitPing())
+  {
+    baudRate = rate;
+    resetRecieve();
+    writeSuccess();
+  }
+  else
+  {
+    Serial.begin(baudRate);
+    resetRecieve();
+  }
+}
+
+// Discard anything recieved around a baud rate switch. It may be noise from the
+// host sending at the other rate, which must not be taken as the start of a
+// frame or message.
+void resetRecieve()
+{
+  while (Serial.available())
+  {
+    Serial.read();
+  }
+  queueStart = 0;
+  queueLength = 0;
+  recieveState = AWAIT_CODE;
+  message = "";
+}
+
+bool awaitPing()
+{
+  String line = "";
+  unsigned long start = millis();
+  while (millis() - start < BAUD_CONFIRM_TIMEOUT)
+  {
+    if (!Serial.available())
+    {
+      continue;
+    }
+    char c = Serial.read();
+    if (c == '\n')
+    {
+      return line.length() == 1 && line.charAt(0) == PING_CODE;
+    }
+    if (line.length() >= MAX_MESSAGE_LENGTH)
+    {
+      return false;
+    }
+    line += c;
+  }
+  return false;
+}
+
+void handleWriteCycleTimes()
+{
+  Serial.print(writeCycleCount);
+  Serial.print(' ');
+  Serial.print(writeCycleTotal);
+  Serial.print(' ');
+  Serial.print(writeCycleMax);
+  Serial.print(' ');
+  Serial.println(writeCycleTimeouts);
+  writeCycleCount = 0;
+  writeCycleTotal = 0;
+  writeCycleMax = 0;
+  writeCycleTimeouts = 0;
+}
+
 void handleReadByte(String message)
 {
   long address = parseHexInString(message, 1, 5);
@@ -194,6 +588,314 @@ void handleWrite16(String message)
   writeSuccess();
 }
 
+bool isBinaryCode(char instructionCode)
+{
+  return (
+      instructionCode == READ_16_BINARY_CODE ||
+      instructionCode == WRITE_16_BINARY_CODE ||
+      instructionCode == READ_RANGE_CODE ||
+      instructionCode == WRITE_RANGE_CODE ||
+      instructionCode == WRITE_PAGE_CODE ||
+      instructionCode == BLOCK_HASHES_CODE ||
+      instructionCode == RANGE_CRC_CODE ||
+      instructionCode == READ_RANGE_RLE_CODE ||
+      instructionCode == WRITE_RANGE_RLE_CODE ||
+      instructionCode == WRITE_PAGE_RLE_CODE);
+}
+
+void parseFrame(char instructionCode, int length)
+{
+  if (frameChecking && !frameChecksumValid(instructionCode, length))
+  {
+    sendFrameStatus(FRAME_RETRY);
+  }
+  else if (instructionCode == READ_16_BINARY_CODE && length == 2)
+  {
+    handleRead16Binary();
+  }
+  else if (instructionCode == WRITE_16_BINARY_CODE && length > 2 && length <= 18)
+  {
+    handleWriteRange(frame + 2, length - 2);
+  }
+  else if (instructionCode == READ_RANGE_CODE && length == 3 && frame[2] > 0 && frame[2] <= MAX_RANGE_LENGTH)
+  {
+    handleReadRange(frame[2]);
+  }
+  else if (instructionCode == WRITE_RANGE_CODE && length > 2 && length <= MAX_RANGE_LENGTH + 2)
+  {
+    handleWriteRange(frame + 2, length - 2);
+  }
+  else if (instructionCode == WRITE_PAGE_CODE && length > 2 && length <= MAX_PAGE_LENGTH + 2)
+  {
+    handleWritePage(frame + 2, length - 2);
+  }
+  else if (instructionCode == READ_RANGE_RLE_CODE && length == 3 && frame[2] > 0 && frame[2] <= MAX_RANGE_LENGTH)
+  {
+    handleReadRangeEncoded(frame[2]);
+  }
+  else if (instructionCode == WRITE_RANGE_RLE_CODE && length > 2 && decodeFrame(length, MAX_RANGE_LENGTH))
+  {
+    handleWriteRange(rangeData, decodedLength);
+  }
+  else if (instructionCode == WRITE_PAGE_RLE_CODE && length > 2 && decodeFrame(length, MAX_PAGE_LENGTH))
+  {
+    handleWritePage(rangeData, decodedLength);
+  }
+  else if (instructionCode == BLOCK_HASHES_CODE && length == 5 && frameBlockSize() > 0 && frame[4] > 0 && frame[4] * 2 <= MAX_FRAME_LENGTH)
+  {
+    handleBlockHashes(frameBlockSize(), frame[4]);
+  }
+  else if (instructionCode == RANGE_CRC_CODE && length == 4 && frameBlockSize() > 0)
+  {
+    handleRangeCRC(frameBlockSize());
+  }
+  else
+  {
+    sendFrameError();
+  }
+}
+
+// Check the CRC16 which follows the payload of a checked frame. The frame is
+// checked before it is handled so a damaged frame is never carried out.
+bool frameChecksumValid(char instructionCode, int length)
+{
+  uint16_t crc = _crc_xmodem_update(0, instructionCode);
+  crc = _crc_xmodem_update(crc, length);
+  for (int i = 0; i < length; i++)
+  {
+    crc = _crc_xmodem_update(crc, frame[i]);
+  }
+  return frame[length] == (byte)(crc >> 8) && frame[length + 1] == (byte)crc;
+}
+
+// Reply frames are sent with beginFrame, replyByte and endFrame, which adds
+// the checksum when frames are checked.
+void beginFrame(byte status, int length)
+{
+  replyCrc = 0;
+  replyByte(status);
+  replyByte((byte)length);
+}
+
+void replyByte(byte b)
+{
+  replyCrc = _crc_xmodem_update(replyCrc, b);
+  Serial.write(b);
+  pollSerial();
+}
+
+void endFrame()
+{
+  if (frameChecking)
+  {
+    Serial.write((byte)(replyCrc >> 8));
+    Serial.write((byte)replyCrc);
+  }
+}
+
+void sendFrame(byte *payload, int length)
+{
+  beginFrame(FRAME_ACK, length);
+  for (int i = 0; i < length; i++)
+  {
+    replyByte(payload[i]);
+  }
+  endFrame();
+}
+
+void sendFrameStatus(byte status)
+{
+  beginFrame(status, 0);
+  endFrame();
+}
+
+void sendFrameError()
+{
+  sendFrameStatus(FRAME_NAK);
+}
+
+int frameAddress()
+{
+  return (frame[0] << 8) | frame[1];
+}
+
+void handleRead16Binary()
+{
+  byte data[16];
+  int address = frameAddress();
+  for (int i = 0; i < 16; i++)
+  {
+    data[i] = readEEPROM(address + i);
+  }
+  sendFrame(data, 16);
+}
+
+void handleReadRange(int count)
+{
+  int address = frameAddress();
+  beginFrame(FRAME_ACK, count);
+  for (int i = 0; i < count; i++)
+  {
+    replyByte(readEEPROM(address + i));
+  }
+  endFrame();
+}
+
+void handleWriteRange(byte *data, int count)
+{
+  int address = frameAddress();
+  for (int i = 0; i < count; i++)
+  {
+    writeEEPROM(address + i, data[i]);
+  }
+  sendFrame(frame, 0);
+}
+
+void handleWritePage(byte *data, int count)
+{
+  writePageEEPROM(frameAddress(), data, count);
+  sendFrame(frame, 0);
+}
+
+// Reply with a range run-length encoded. The range is read into rangeData and
+// encoded into the frame buffer, which is no longer needed once the address
+// is known. The encoding is at most one byte longer than the range.
+void handleReadRangeEncoded(int count)
+{
+  int address = frameAddress();
+  for (int i = 0; i < count; i++)
+  {
+    rangeData[i] = readEEPROM(address + i);
+  }
+  sendFrame(frame, encodeRange(count));
+}
+
+// PackBits encode the first count bytes of rangeData into frame, returning the
+// encoded length. Runs of three or more bytes are repeated, the rest literal.
+int encodeRange(int count)
+{
+  int length = 0;
+  int literalStart = 0;
+  int i = 0;
+  while (i < count)
+  {
+    int runEnd = i + 1;
+    while (runEnd < count && runEnd - i < 128 && rangeData[runEnd] == rangeData[i])
+    {
+      runEnd++;
+    }
+    if (runEnd - i < 3)
+    {
+      i = runEnd;
+      continue;
+    }
+    length = encodeLiterals(length, literalStart, i);
+    frame[length++] = (byte)(257 - (runEnd - i));
+    frame[length++] = rangeData[i];
+    literalStart = runEnd;
+    i = runEnd;
+  }
+  return encodeLiterals(length, literalStart, count);
+}
+
+// Ranges are at most 128 bytes, so literals never need more than one run.
+int encodeLiterals(int length, int start, int end)
+{
+  if (end > start)
+  {
+    frame[length++] = (byte)(end - start - 1);
+    for (int i = start; i < end; i++)
+    {
+      frame[length++] = rangeData[i];
+    }
+  }
+  return length;
+}
+
+// Decode the PackBits encoded payload of a frame after its address into
+// rangeData, setting decodedLength. Returns false if the payload is invalid,
+// empty or decodes to more than maxLength bytes.
+bool decodeFrame(int length, int maxLength)
+{
+  decodedLength = 0;
+  int i = 2;
+  while (i < length)
+  {
+    byte control = frame[i++];
+    if (control < 128)
+    {
+      int count = control + 1;
+      if (i + count > length || decodedLength + count > maxLength)
+      {
+        return false;
+      }
+      for (int j = 0; j < count; j++)
+      {
+        rangeData[decodedLength++] = frame[i++];
+      }
+    }
+    else if (control > 128)
+    {
+      int count = 257 - control;
+      if (i >= length || decodedLength + count > maxLength)
+      {
+        return false;
+      }
+      for (int j = 0; j < count; j++)
+      {
+        rangeData[decodedLength++] = frame[i];
+      }
+      i++;
+    }
+  }
+  return decodedLength > 0;
+}
+
+unsigned int frameBlockSize()
+{
+  return (frame[2] << 8) | frame[3];
+}
+
+// Reply with the CRC16 (XMODEM) of each of count consecutive blocks so the
+// host can find the blocks which differ without reading them.
+void handleBlockHashes(unsigned int blockSize, int count)
+{
+  unsigned int address = frameAddress();
+  setDataPinsInput();
+  beginFrame(FRAME_ACK, count * 2);
+  for (int block = 0; block < count; block++)
+  {
+    uint16_t crc = 0;
+    for (unsigned int i = 0; i < blockSize; i++)
+    {
+      crc = _crc_xmodem_update(crc, fastReadEEPROM(address++));
+    }
+    replyByte((byte)(crc >> 8));
+    replyByte((byte)crc);
+  }
+  endFrame();
+}
+
+// Reply with the CRC32 (as used by zlib) of a range so the host can verify it
+// without reading it.
+void handleRangeCRC(unsigned int length)
+{
+  unsigned int address = frameAddress();
+  uint32_t crc = 0xFFFFFFFF;
+  setDataPinsInput();
+  for (unsigned int i = 0; i < length; i++)
+  {
+    crc ^= fastReadEEPROM(address++);
+    for (int bit = 0; bit < 8; bit++)
+    {
+      crc = (crc >> 1) ^ (0xEDB88320 & -(crc & 1));
+    }
+  }
+  crc = ~crc;
+  byte payload[4] = {(byte)(crc >> 24), (byte)(crc >> 16), (byte)(crc >> 8), (byte)crc};
+  sendFrame(payload, 4);
+}
+
 long parseHexInString(String message, int from, int to)
 {
   char buf[5];
@@ -1,11 +1,12 @@
 import json
+import uuid
 from pathlib import Path
 from unittest.mock import Mock, call, patch
 
 import pytest
 from click.testing import CliRunner
 
-from eeprom import Programmer
+from eeprom import Programmer, simulator
 
 
 @pytest.fixture
@@ -45,7 +46,9 @@ def write_byte_serial_request(address, byte):
 
 @pytest.fixture
 def programmer(mock_serial_connection, mock_time):
-    def _programmer(port=None, baud=None, eeprom_type=None, init_delay=None):
+    def _programmer(
+        port=None, baud=None, eeprom_type=None, init_delay=None, **extra_kwargs
+    ):
         kwargs = {
             "port": port,
             "baud": baud,
@@ -53,7 +56,7 @@ def programmer(mock_serial_connection, mock_time):
             "init_delay": init_delay,
         }
         kwargs = {key: value for key, value in kwargs.items() if value is not None}
-        return Programmer(**kwargs)
+        return Programmer(**kwargs, **extra_kwargs)
 
     return _programmer
 
@@ -88,6 +91,32 @@ def serial_ack():
     return b"ACK\n"
 
 
+@pytest.fixture
+def frame_ack():
+    return b"\x06\x00"
+
+
+@pytest.fixture
+def protocol_version_response():
+    return b"1\n"
+
+
+@pytest.fixture
+def binary_connect_responses(protocol_version_response, serial_ack):
+    def _binary_connect_responses(max_range=b"L\n", max_page=b"G\n"):
+        return [protocol_version_response, serial_ack, max_range, max_page]
+
+    return _binary_connect_responses
+
+
+@pytest.fixture
+def binary_programmer(programmer, mock_serial_connection, binary_connect_responses):
+    mock_serial_connection.return_value.readline.side_effect = (
+        binary_connect_responses()
+    )
+    return programmer(binary=True)
+
+
 @pytest.fixture
 def set_serial_response():
     def _set_serial_responses(programmer, response):
@@ -118,6 +147,18 @@ def assert_messages_sent():
     return _assert_messages_sent
 
 
+@pytest.fixture
+def read_frame_responses():
+    def _read_frame_responses(data):
+        responses = []
+        for i in range(0, len(data), 16):
+            block = bytes(data[i : i + 16])
+            responses += [bytes([0x06, len(block)]), block]
+        return responses
+
+    return _read_frame_responses
+
+
 @pytest.fixture
 def binary_file_path():
     return Path(__file__).parent / "bin.bin"
@@ -129,6 +170,33 @@ def binary_file_contents(binary_file_path):
         return f.read()
 
 
+@pytest.fixture
+def rom_records():
+    return [(0x8000, bytes(range(0x20))), (0xFFFA, b"\x00\x80\x00\x80\x00\x80")]
+
+
+@pytest.fixture
+def hex_file_path(tmp_path, rom_records):
+    lines = []
+    for address, data in rom_records:
+        record = bytes([len(data)]) + address.to_bytes(2, "big") + b"\x00" + data
+        lines.append(":" + (record + bytes([-sum(record) & 0xFF])).hex().upper())
+    path = tmp_path / "rom.hex"
+    path.write_text("\n".join(lines + [":00000001FF", ""]))
+    return path
+
+
+@pytest.fixture
+def srec_file_path(tmp_path, rom_records):
+    lines = []
+    for address, data in rom_records:
+        record = bytes([len(data) + 3]) + address.to_bytes(2, "big") + data
+        lines.append("S1" + (record + bytes([~sum(record) & 0xFF])).hex().upper())
+    path = tmp_path / "rom.s19"
+    path.write_text("\n".join(lines + ["S9030000FC", ""]))
+    return path
+
+
 @pytest.fixture
 def valid_eeprom_data():
     with open(Path(__file__).parent / "AT28C25_data.json", "r") as f:
@@ -166,3 +234,23 @@ def altered_binary_file_contents(binary_file_contents):
     altered_binary_file_contents = list(binary_file_contents)
     altered_binary_file_contents[0x0050] = 0xFF
     return altered_binary_file_contents
+
+
+@pytest.fixture
+def sim_url():
+    name = uuid.uuid4().hex
+    yield f"sim://{name}"
+    simulator.simulators.pop(name, None)
+
+
+@pytest.fixture
+def sim(sim_url):
+    return simulator.get_simulator(sim_url)
+
+
+@pytest.fixture
+def sim_programmer(sim, sim_url):
+    def _sim_programmer(**kwargs):
+        return Programmer(port=sim_url, **kwargs)
+
+    return _sim_programmer
@@ -0,0 +1,320 @@
+import asyncio
+import os
+import threading
+from unittest.mock import Mock, patch
+
+import pytest
+
+from eeprom import Programmer
+from eeprom import programmer_commands as commands
+from eeprom import simulator
+from eeprom.aio import AsyncArduino, AsyncProgrammer, as_async_iterable
+
+MODES = [{}, {"binary": True}, {"window": 4}, {"binary": True, "window": 4}]
+
+
+def run(coroutine):
+    return asyncio.run(coroutine)
+
+
+@pytest.fixture
+def async_programmer(sim, sim_url):
+    def _async_programmer(**kwargs):
+        return AsyncProgrammer(port=sim_url, **kwargs)
+
+    return _async_programmer
+
+
+@pytest.fixture
+def pty_sim(sim):
+    master, slave, path = simulator.open_pty()
+    stop = threading.Event()
+    thread = threading.Thread(
+        target=simulator.serve_pty,
+        args=(sim, master),
+        kwargs={"stop": stop, "interval": 0.01},
+    )
+    thread.start()
+    yield path
+    stop.set()
+    thread.join()
+    os.close(slave)
+    os.close(master)
+
+
+@pytest.mark.parametrize("options", MODES)
+def test_read_and_write(sim, sim_url, async_programmer, options):
+    data = bytes(range(256)) * 2
+
+    async def main():
+        async with async_programmer(**options) as programmer:
+            written = await programmer.write(data, start_address=0x0100)
+            return written, await programmer.read(0x0100, 0x02FF)
+
+    written, read_data = run(main())
+    assert written == len(data)
+    assert written == Programmer(port=sim_url, **options).write(data, 0x0100)
+    assert read_data == list(data)
+    assert sim.memory[0x0100:0x0300] == data
+
+
+def test_negotiates_features(async_programmer):
+    async def main():
+        async with async_programmer(binary=True, window=4) as programmer:
+            return programmer
+
+    programmer = run(main())
+    assert programmer.protocol_version == simulator.Simulator.PROTOCOL_VERSION
+    assert programmer.binary is True
+    assert programmer.credits > 0
+    assert programmer.max_range == 128
+    assert programmer.page_writes is True
+    assert programmer.block_hashing is True
+    assert programmer.crc_checking is True
+
+
+def test_bytes(sim, async_programmer):
+    async def main():
+        async with async_programmer() as programmer:
+            await programmer.write_byte(0x2A55, 0xEA)
+            await programmer.write_block(0x2A60, list(range(16)))
+            return (
+                await programmer.read_byte(0x2A55),
+                await programmer.read_block(0x2A60),
+            )
+
+    assert run(main()) == (0xEA, list(range(16)))
+
+
+def test_read_bytes(sim, async_programmer):
+    sim.memory[:] = bytes(range(256)) * 128
+
+    async def main():
+        async with async_programmer(binary=True) as programmer:
+            return await programmer.read_bytes()
+
+    data = run(main())
+    assert isinstance(data, bytearray)
+    assert data == sim.memory
+
+
+def test_iter_read_yields_blocks(sim, async_programmer):
+    sim.memory[:0x0200] = bytes(range(256)) * 2
+
+    async def main():
+        async with async_programmer(binary=True) as programmer:
+            return [block async for block in programmer.iter_read(0x0000, 0x01BF)]
+
+    blocks = run(main())
+    assert [len(block) for block in blocks] == [128, 128, 128, 64]
+    assert b"".join(blocks) == sim.memory[:0x01C0]
+
+
+def test_iter_read_validates_range(async_programmer):
+    async def main():
+        async with async_programmer() as programmer:
+            programmer.iter_read(0x0000, 0x8000)
+
+    with pytest.raises(ValueError):
+        run(main())
+
+
+def test_closing_iter_read_discards_responses(sim, async_programmer):
+    sim.memory[:0x0100] = bytes(range(256))
+
+    async def main():
+        async with async_programmer(window=4) as programmer:
+            blocks = programmer.iter_read(0x0000, 0x00FF)
+            first = await blocks.__anext__()
+            await blocks.aclose()
+            return first, await programmer.read_byte(0x0020)
+
+    assert run(main()) == (bytes(range(16)), 0x20)
+
+
+@pytest.mark.parametrize("options", [{}, {"binary": True}])
+def test_write_stream(sim, async_programmer, options):
+    data = bytes(range(256)) * 4
+
+    async def chunks():
+        for i in range(0, len(data), 100):
+            yield data[i : i + 100]
+
+    async def main():
+        async with async_programmer(**options) as programmer:
+            return await programmer.write_stream(chunks(), start_address=0x0120)
+
+    assert run(main()) == len(data)
+    assert sim.memory[0x0120 : 0x0120 + len(data)] == data
+
+
+def test_write_stream_past_end_of_eeprom(sim, async_programmer):
+    async def main():
+        async with async_programmer(binary=True) as programmer:
+            with pytest.raises(ValueError):
+                await programmer.write_stream([b"\xea" * 0x80], start_address=0x7FC0)
+            return await programmer.read_byte(0x7FFF)
+
+    assert run(main()) == 0xEA
+
+
+def test_pipeline_sends_page_writes_ahead(sim, async_programmer):
+    data = bytes(range(256)) * 128
+    in_flight_lengths = []
+
+    async def main():
+        async with async_programmer(binary=True, window=4) as programmer:
+            pipeline_response = programmer._pipeline_response
+
+            async def _pipeline_response(in_flight):
+                in_flight_lengths.append(len(in_flight))
+                return await pipeline_response(in_flight)
+
+            with patch.object(programmer, "_pipeline_response", _pipeline_response):
+                await programmer.write(data)
+
+    run(main())
+    assert max(in_flight_lengths) == 4
+    assert sim.overflows == 0
+    assert bytes(sim.memory) == data
+
+
+def test_rejects_checksums(sim_url):
+    with pytest.raises(ValueError, match="does not check frames"):
+        AsyncProgrammer(port=sim_url, checksums=True)
+
+
+def test_pipeline_error_names_address(async_programmer):
+    async def main():
+        async with async_programmer(binary=True, window=4) as programmer:
+            with patch.object(
+                commands.ReadRange, "process_response", side_effect=ValueError("bad")
+            ):
+                with pytest.raises(ValueError, match="Address 0000: bad"):
+                    await programmer.read_bytes(0x0000, 0x01FF)
+            return await programmer.read_byte(0x0000)
+
+    assert run(main()) == 0xFF
+
+
+def test_write_cycle_stats(async_programmer):
+    async def main():
+        async with async_programmer(binary=True) as programmer:
+            await programmer.write(b"\xea" * 128)
+            return await programmer.write_cycle_stats(), programmer.write_cycle_time
+
+    stats, write_cycle_time = run(main())
+    assert stats.count == 2
+    assert write_cycle_time == stats.total / 2
+
+
+def test_write_cycle_stats_without_writes(async_programmer):
+    async def main():
+        async with async_programmer() as programmer:
+            return await programmer.write_cycle_stats(), programmer.write_cycle_time
+
+    stats, write_cycle_time = run(main())
+    assert stats.count == 0
+    assert write_cycle_time == AsyncProgrammer.DEFAULT_WRITE_CYCLE_TIME
+
+
+def test_polls_ports_without_file_descriptor(async_programmer):
+    async def main():
+        async with async_programmer() as programmer:
+            response = asyncio.ensure_future(programmer.arduino.serial_recieve())
+            await asyncio.sleep(0.01)
+            programmer.arduino.serial_send_bytes(b"R2A55\n")
+            return await response
+
+    assert run(main()) == "FF"
+
+
+def test_pty(pty_sim):
+    async def main():
+        async with AsyncProgrammer(
+            port=pty_sim, reset=False, exclusive=True
+        ) as programmer:
+            await programmer.write_byte(0x2A55, 0xEA)
+            return await programmer.read_byte(0x2A55)
+
+    assert run(main()) == 0xEA
+
+
+def test_no_response_without_reset():
+    master, slave, path = simulator.open_pty()
+    try:
+        with pytest.raises(ValueError, match="No response"):
+            run(AsyncProgrammer(port=path, reset=False, init_delay=0.35).open())
+    finally:
+        os.close(slave)
+        os.close(master)
+
+
+def test_ping_reads_answers_to_every_ping():
+    arduino = AsyncArduino(port="sim://")
+    arduino.serial_connection = Mock(in_waiting=10)
+    answers = bytearray()
+
+    def write(data):
+        if arduino.serial_connection.write.call_count == 2:
+            answers.extend(b"ACK\r\n" * 2)
+
+    def read(size):
+        data = bytes(answers)
+        answers.clear()
+        return data
+
+    arduino.serial_connection.write.side_effect = write
+    arduino.serial_connection.read.side_effect = read
+    with patch.object(AsyncArduino, "PING_TIMEOUT", 0.02):
+        run(arduino.ping(1))
+    assert arduino.serial_connection.write.call_count == 2
+    assert arduino.buffer == b""
+
+
+def test_reset_continues_without_ready_message():
+    master, slave, path = simulator.open_pty()
+    programmer = AsyncProgrammer(port=path, init_delay=0.1)
+    try:
+        run(programmer.open())
+        assert programmer.protocol_version == 0
+    finally:
+        programmer.disconnect()
+        os.close(slave)
+        os.close(master)
+
+
+def test_as_async_iterable():
+    async def items():
+        yield 1
+        yield 2
+
+    async def main():
+        return (
+            [item async for item in as_async_iterable(items())],
+            [item async for item in as_async_iterable([3, 4])],
+        )
+
+    assert run(main()) == ([1, 2], [3, 4])
+
+
+@pytest.mark.parametrize("window", [1, 4])
+def test_compression(sim, async_programmer, window):
+    data = bytes(0x0100) + bytes(range(256))
+
+    async def main():
+        async with async_programmer(
+            binary=True, window=window, compress=True
+        ) as programmer:
+            await programmer.write(data)
+            return (
+                programmer.compression,
+                await programmer.read_bytes(0x0000, 0x01FF),
+                programmer.compression_stats,
+            )
+
+    compression, read_data, stats = run(main())
+    assert compression is True
+    assert read_data == data
+    assert sim.memory[:0x0200] == data
+    assert stats == (0x0400, 4 * 2 + 4 * 65 + 2 * 2 + 2 * 129)
@@ -1,4 +1,4 @@
-from unittest.mock import Mock, patch
+from unittest.mock import Mock, call, patch
 
 import pytest
 
@@ -32,14 +32,61 @@ def test_arduino_serial_connection(arduino):
     assert arduino.serial_connection is None
 
 
-def test_arduino_open_delays():
+def test_arduino_open_waits_for_ready_message():
     arduino, mock_time, mock_serial, mock_serial_connection = open_arduino()
-    mock_time.sleep.assert_called_once_with(2)
+    mock_serial.Serial.assert_called_once_with(timeout=2)
+    mock_serial_connection.read_until.assert_called_once_with(b"READY\r\n")
+    mock_time.sleep.assert_not_called()
+
+
+def test_arduino_open_clears_timeout():
+    arduino, mock_time, mock_serial, mock_serial_connection = open_arduino()
+    assert mock_serial_connection.timeout is None
 
 
 def test_arduino_open_creates_connection():
     arduino, mock_time, mock_serial, mock_serial_connection = open_arduino()
-    mock_serial.Serial.assert_called_with(arduino.port, arduino.baud)
+    assert mock_serial_connection.port == arduino.port
+    assert mock_serial_connection.baudrate == arduino.baud
+    assert mock_serial_connection.dtr is True
+    mock_serial_connection.open.assert_called_once()
+
+
+@patch("eeprom.arduino.serial")
+@patch("eeprom.arduino.time")
+def open_arduino_without_reset(ping_responses, mock_time, mock_serial):
+    arduino = Arduino()
+    mock_serial_connection = Mock()
+    mock_serial_connection.read_until.side_effect = ping_responses
+    mock_serial.Serial.return_value = mock_serial_connection
+    mock_time.monotonic.side_effect = [0, 1, 3]
+    arduino.open(reset=False)
+    return arduino, mock_time, mock_serial, mock_serial_connection
+
+
+def test_arduino_open_without_reset_disables_dtr():
+    _, _, _, mock_serial_connection = open_arduino_without_reset([b"ACK\r\n"])
+    assert mock_serial_connection.dtr is False
+
+
+def test_arduino_open_without_reset_pings():
+    _, _, _, mock_serial_connection = open_arduino_without_reset([b"", b"ACK\r\n", b""])
+    assert mock_serial_connection.write.call_args_list == [call(b"P\n")] * 2
+    assert mock_serial_connection.read_until.call_count == 3
+    assert mock_serial_connection.timeout is None
+
+
+def test_arduino_ping_reads_answers_to_every_ping():
+    _, _, _, mock_serial_connection = open_arduino_without_reset(
+        [b"", b"ACK\r\n", b"ACK\r\n", b""]
+    )
+    assert mock_serial_connection.write.call_args_list == [call(b"P\n")] * 2
+    assert mock_serial_connection.read_until.call_count == 4
+
+
+def test_arduino_open_without_reset_raises_without_response():
+    with pytest.raises(ValueError):
+        open_arduino_without_reset([b"", b"", b""])
 
 
 def test_arduino_open_flushes():
@@ -75,3 +122,44 @@ def test_serial_send():
     arduino, mock_time, mock_serial, mock_serial_connection = open_arduino()
     arduino.serial_send("Hello, World")
     mock_serial_connection.write.assert_called_once_with(b"Hello, World\n")
+
+
+def test_serial_recieve_bytes():
+    arduino, mock_time, mock_serial, mock_serial_connection = open_arduino()
+    mock_serial_connection.read.return_value = b"\x06\x10"
+    response = arduino.serial_recieve_bytes(2)
+    mock_serial_connection.read.assert_called_once_with(2)
+    assert response == b"\x06\x10"
+
+
+def test_serial_recieve_bytes_raises_for_short_read():
+    arduino, mock_time, mock_serial, mock_serial_connection = open_arduino()
+    mock_serial_connection.read.return_value = b"\x06"
+    with pytest.raises(ValueError):
+        arduino.serial_recieve_bytes(2)
+
+
+def test_serial_send_bytes():
+    arduino, mock_time, mock_serial, mock_serial_connection = open_arduino()
+    arduino.serial_send_bytes(b"t\x02\x2a\x55")
+    mock_serial_connection.write.assert_called_once_with(b"t\x02\x2a\x55")
+
+
+def test_arduino_set_baud():
+    arduino, _, _, mock_serial_connection = open_arduino()
+    arduino.set_baud(1000000)
+    assert arduino.baud == 1000000
+    assert mock_serial_connection.baudrate == 1000000
+
+
+def test_arduino_set_timeout():
+    arduino, _, _, mock_serial_connection = open_arduino()
+    arduino.set_timeout(2)
+    assert mock_serial_connection.timeout == 2
+
+
+def test_arduino_ping_restores_timeout():
+    arduino, _, _, mock_serial_connection = open_arduino()
+    mock_serial_connection.read_until.return_value = b"ACK\r\n"
+    arduino.ping(1)
+    assert mock_serial_connection.timeout is None
@@ -0,0 +1,27 @@
+from eeprom.baudrates import BaudCache
+
+
+def test_get_unknown_port(tmp_path):
+    assert BaudCache(tmp_path / "baud.json").get("/dev/ttyUSB0") is None
+
+
+def test_set_and_get(tmp_path):
+    path = tmp_path / "cache" / "baud.json"
+    cache = BaudCache(path)
+    cache.set("/dev/ttyUSB0", 1000000)
+    cache.set("/dev/ttyUSB1", 500000)
+    assert BaudCache(path).get("/dev/ttyUSB0") == 1000000
+    assert BaudCache(path).get("/dev/ttyUSB1") == 500000
+    assert not path.with_suffix(".tmp").exists()
+
+
+def test_invalid_file_is_ignored(tmp_path):
+    path = tmp_path / "baud.json"
+    path.write_text("not json")
+    assert BaudCache(path).load() == {}
+    path.write_text("[1000000]")
+    assert BaudCache(path).load() == {}
+    path.write_text('{"/dev/ttyUSB0": "fast"}')
+    assert BaudCache(path).get("/dev/ttyUSB0") is None
+    BaudCache(path).set("/dev/ttyUSB0", 1000000)
+    assert BaudCache(path).get("/dev/ttyUSB0") == 1000000
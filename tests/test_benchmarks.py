@@ -0,0 +1,47 @@
+import pytest
+
+from benchmarks import suite
+
+
+@pytest.mark.parametrize(
+    "name", ["read/partial/binary", "write/partial/ascii-window", "update/0.01/binary"]
+)
+def test_operation_benchmarks(name):
+    result = suite.run([name])["results"][name]
+    assert result["simulated_seconds"] > 0
+    assert result["firmware_seconds"] > 0
+    assert result["transfer_seconds"] > 0
+    assert result.get("exit_code", 0) == 0
+
+
+def test_compression_ratio_is_reported():
+    names = [
+        "write/partial/binary-window-compress",
+        "read/sparse/binary-window-compress",
+    ]
+    results = suite.run(names)["results"]
+    assert results[names[0]]["compression_ratio"] < 1
+    assert results[names[1]]["compression_ratio"] > 1
+    assert (
+        "compression_ratio"
+        not in suite.run(["write/partial/binary"])["results"]["write/partial/binary"]
+    )
+
+
+def test_page_writes_compared_with_ranges():
+    names = ["write/partial/binary-window", "write/partial/binary-window-ranges"]
+    results = suite.run(names)["results"]
+    assert (
+        results[names[0]]["simulated_seconds"] < results[names[1]]["simulated_seconds"]
+    )
+
+
+def test_micro_benchmark():
+    result = suite.run(["micro/decode/read_byte"])["results"]["micro/decode/read_byte"]
+    assert result["calls_per_second"] > 0
+
+
+def test_benchmark_names():
+    assert "update/0.5/binary-window" in suite.BENCHMARKS
+    assert "verify/full/ascii" in suite.BENCHMARKS
+    assert "update/0.01/binary-window-checksums" in suite.BENCHMARKS
@@ -0,0 +1,71 @@
+import uuid
+
+import pytest
+
+from eeprom import cli, simulator
+
+
+@pytest.fixture
+def sims(binary_file_contents):
+    names = [uuid.uuid4().hex for _ in range(2)]
+    for name in names:
+        simulator.simulators[name] = simulator.Simulator()
+    yield {f"sim://{name}": simulator.simulators[name] for name in names}
+    for name in names:
+        simulator.simulators.pop(name, None)
+
+
+def test_gang_write(runner, sims, binary_file_path, binary_file_contents):
+    result = runner.invoke(
+        cli, f"--binary --compress gang-write {binary_file_path} {' '.join(sims)}"
+    )
+    assert result.exit_code == 0
+    for (port, sim), line in zip(sims.items(), result.output.splitlines()):
+        assert line.startswith(f"{port}: OK, 32768 bytes in ")
+        assert line.endswith(" bytes/s)")
+        assert sim.memory == binary_file_contents
+
+
+def test_gang_write_continues_after_failure(
+    runner, sims, tmp_path, binary_file_path, binary_file_contents
+):
+    missing = tmp_path / "missing"
+    result = runner.invoke(
+        cli, f"gang-write {binary_file_path} {missing} {' '.join(sims)}"
+    )
+    assert result.exit_code == 1
+    assert result.output.startswith(f"{missing}: FAILED, ")
+    for sim in sims.values():
+        assert sim.memory == binary_file_contents
+
+
+def test_gang_verify(runner, sims, binary_file_path, binary_file_contents):
+    port, sim = list(sims.items())[1]
+    for each in sims.values():
+        each.memory[:] = binary_file_contents
+    sim.memory[0x0100] ^= 0xFF
+    sim.memory[0x0200] ^= 0xFF
+    result = runner.invoke(
+        cli, f"--binary gang-verify {binary_file_path} {' '.join(sims)}"
+    )
+    assert result.exit_code == 1
+    assert result.output.splitlines()[1] == (
+        f"{port}: FAILED, 2 bytes differ, the first at 0100."
+    )
+    assert result.output.splitlines()[0].startswith(f"{list(sims)[0]}: OK, ")
+
+
+def test_gang_requires_ports(runner, binary_file_path):
+    result = runner.invoke(cli, f"gang-write {binary_file_path}")
+    assert result.exit_code == 2
+
+
+def test_gang_image_regions(runner, sims, hex_file_path):
+    ports = " ".join(sims)
+    result = runner.invoke(cli, f"gang-write --offset -8000 {hex_file_path} {ports}")
+    assert result.exit_code == 0
+    assert result.output.splitlines()[0].startswith(f"{list(sims)[0]}: OK, 38 bytes")
+    result = runner.invoke(cli, f"gang-verify --offset -8000 {hex_file_path} {ports}")
+    assert result.exit_code == 0
+    for sim in sims.values():
+        assert sim.memory[:0x20] == bytes(range(0x20))
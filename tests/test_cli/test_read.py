@@ -27,3 +27,81 @@ def test_serial_message_sent(
     valid_eeprom_data,
 ):
     assert_messages_sent(default_programmer, read_serial_requests(valid_eeprom_data))
+
+
+@pytest.fixture
+def binary_read_result(
+    default_programmer,
+    runner,
+    binary_connect_responses,
+    read_frame_responses,
+    valid_eeprom_data,
+):
+    connection = default_programmer.arduino.serial_connection
+    connection.readline.side_effect = binary_connect_responses()
+    connection.read.side_effect = read_frame_responses(valid_eeprom_data)
+    return runner.invoke(cli, "--binary read")
+
+
+def test_binary_exit_code(binary_read_result):
+    assert binary_read_result.exit_code == 0
+
+
+def test_binary_output(binary_read_result, valid_eeprom_data):
+    assert binary_read_result.stdout_bytes == bytes(valid_eeprom_data)
+
+
+def test_binary_serial_message_sent(default_programmer, binary_read_result):
+    default_programmer.arduino.serial_connection.write.assert_any_call(b"B\n")
+    default_programmer.arduino.serial_connection.write.assert_called_with(
+        b"t\x02\x7f\xf0"
+    )
+
+
+@pytest.fixture
+def pipelined_read_result(
+    default_programmer,
+    runner,
+    protocol_version_response,
+    read_serial_responses,
+    valid_eeprom_data,
+):
+    default_programmer.arduino.serial_connection.readline.side_effect = [
+        protocol_version_response,
+        b"64\n",
+    ] + read_serial_responses(valid_eeprom_data)
+    return runner.invoke(cli, "--window 4 read")
+
+
+def test_pipelined_output(pipelined_read_result, valid_eeprom_data):
+    assert pipelined_read_result.stdout_bytes == bytes(valid_eeprom_data)
+
+
+def test_output_file(runner, sim, sim_url, tmp_path, binary_file_contents):
+    sim.memory[:] = binary_file_contents
+    path = tmp_path / "image.bin"
+    result = runner.invoke(cli, f"--port {sim_url} --binary read --output {path}")
+    assert result.exit_code == 0
+    assert path.read_bytes() == binary_file_contents
+
+
+def test_compressed_read(runner, sim, sim_url, tmp_path):
+    path = tmp_path / "image.bin"
+    result = runner.invoke(
+        cli, f"--port {sim_url} --binary --compress read --output {path}"
+    )
+    assert result.exit_code == 0
+    assert result.output == "Compressed 32768 bytes to 512 bytes, ratio 64.00\n"
+    assert path.read_bytes() == sim.memory
+
+
+def test_checked_read(runner, sim_url, tmp_path):
+    path = tmp_path / "image.bin"
+    result = runner.invoke(
+        cli,
+        f"--port {sim_url}?corrupt=0.002&seed=1 --binary --checksums read "
+        f"--output {path}",
+    )
+    assert result.exit_code == 0
+    assert result.output == "Sent 75 damaged frames again\n"
+    assert path.read_bytes() == b"\xff" * 0x8000
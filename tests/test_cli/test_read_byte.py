@@ -1,6 +1,7 @@
 import pytest
 
 from eeprom import cli
+from eeprom.baudrates import BaudCache
 
 
 @pytest.fixture
@@ -42,3 +43,33 @@ def test_serial_message_sent(
     default_programmer, read_byte_result, assert_message_sent, read_byte_serial_request
 ):
     assert_message_sent(default_programmer, read_byte_serial_request)
+
+
+def test_negotiated_baud(runner, sim, sim_url, tmp_path):
+    sim.memory[0x10] = 0xEA
+    path = tmp_path / "baud.json"
+    result = runner.invoke(
+        cli,
+        f"--port {sim_url} --baud-rates 500000,1000000 --baud-cache {path} "
+        "read-byte -a 10",
+    )
+    assert result.exit_code == 0
+    assert result.output == "EA\n"
+    assert sim.firmware_baud == 115200
+    assert BaudCache(path).get(sim_url) == 1000000
+
+
+def test_no_reset_after_negotiated_baud(runner, sim, sim_url):
+    sim.memory[0x10] = 0xEA
+    command = f"--port {sim_url} --no-reset --baud-rates 1000000,500000 read-byte -a 10"
+    for _ in range(2):
+        result = runner.invoke(cli, command)
+        assert result.exit_code == 0, result.output
+        assert result.output == "EA\n"
+
+
+@pytest.mark.parametrize("rates", ["fast", "1000000,", "0"])
+def test_invalid_baud_rates(runner, rates):
+    result = runner.invoke(cli, f"--baud-rates {rates} read-byte -a 10")
+    assert result.exit_code == 2
+    assert f"{rates} is not a valid list of baud rates." in result.output
@@ -1,6 +1,11 @@
+from unittest.mock import patch
+
 import pytest
 
-from eeprom import cli
+from eeprom import Programmer, cli
+from eeprom.cli import changed_hash_ranges, file_contents
+from eeprom.journal import WriteJournal, write_key
+from eeprom.programmer_commands import BlockHashes
 
 
 @pytest.fixture
@@ -64,8 +69,258 @@ def test_non_matching_serial_message_sent(
     read_serial_requests,
     binary_file_contents,
 ):
-    block = "".join([f"{_:02X}" for _ in binary_file_contents[0x50 : 0x50 + 16]])
-    write_messages = [f"S0050{block}\n".encode()]
+    write_messages = [f"W0050{binary_file_contents[0x50]:02X}\n".encode()]
+    assert_messages_sent(
+        default_programmer, read_serial_requests(binary_file_contents) + write_messages
+    )
+
+
+@pytest.fixture
+def adjacent_blocks_altered_binary_file_contents(binary_file_contents):
+    altered_binary_file_contents = list(binary_file_contents)
+    altered_binary_file_contents[0x0050] = 0xFF
+    altered_binary_file_contents[0x0060] = 0xFF
+    return altered_binary_file_contents
+
+
+@pytest.fixture
+def adjacent_blocks_update_result(
+    default_programmer,
+    runner,
+    read_serial_responses,
+    binary_file_path,
+    adjacent_blocks_altered_binary_file_contents,
+    serial_ack,
+):
+    default_programmer.arduino.serial_connection.readline.side_effect = (
+        read_serial_responses(adjacent_blocks_altered_binary_file_contents)
+        + [serial_ack] * 2
+    )
+    return runner.invoke(cli, f"update {binary_file_path}")
+
+
+def test_adjacent_blocks_exit_code(adjacent_blocks_update_result):
+    assert adjacent_blocks_update_result.exit_code == 0
+
+
+def test_adjacent_blocks_serial_message_sent(
+    default_programmer,
+    adjacent_blocks_update_result,
+    assert_messages_sent,
+    read_serial_requests,
+    binary_file_contents,
+):
+    write_messages = [
+        f"W{address:04X}{binary_file_contents[address]:02X}\n".encode()
+        for address in (0x50, 0x60)
+    ]
     assert_messages_sent(
         default_programmer, read_serial_requests(binary_file_contents) + write_messages
     )
+
+
+@pytest.fixture
+def page_update_result(
+    default_programmer,
+    runner,
+    binary_connect_responses,
+    frame_ack,
+    binary_file_path,
+    adjacent_blocks_altered_binary_file_contents,
+):
+    connection = default_programmer.arduino.serial_connection
+    connection.readline.side_effect = binary_connect_responses(
+        max_range=b"128\n", max_page=b"64\n"
+    )
+    responses = []
+    for i in range(0, len(adjacent_blocks_altered_binary_file_contents), 128):
+        block = bytes(adjacent_blocks_altered_binary_file_contents[i : i + 128])
+        responses += [bytes([0x06, len(block)]), block]
+    connection.read.side_effect = responses + [frame_ack]
+    return runner.invoke(cli, f"--binary update {binary_file_path}")
+
+
+def test_page_update_exit_code(page_update_result):
+    assert page_update_result.exit_code == 0
+
+
+def test_page_update_writes_changed_bytes_in_one_page_write(
+    default_programmer, page_update_result, binary_file_contents
+):
+    default_programmer.arduino.serial_connection.write.assert_called_with(
+        b"p\x13\x00\x50" + binary_file_contents[0x50:0x61]
+    )
+
+
+def test_update_timings_output(
+    default_programmer,
+    runner,
+    read_serial_responses,
+    binary_file_path,
+    binary_file_contents,
+):
+    default_programmer.arduino.serial_connection.readline.side_effect = (
+        read_serial_responses(binary_file_contents) + [b"0 0 0 0\n"]
+    )
+    result = runner.invoke(cli, f"update --timings {binary_file_path}")
+    assert result.output.endswith("Write cycles: 0\n")
+
+
+def test_changed_hash_ranges():
+    new_data = [0] * 64 + [1] * 20
+    existing_hashes = [BlockHashes.hash([0] * 32), 1, BlockHashes.hash([1] * 20)]
+    assert changed_hash_ranges(new_data, existing_hashes, 32) == [(32, 64)]
+
+
+def test_update_with_block_hashes(
+    runner, sim, sim_url, binary_file_path, binary_file_contents
+):
+    sim.memory[: len(binary_file_contents)] = binary_file_contents
+    sim.memory[0x50] ^= 0xFF
+    sim.memory[0x7F] ^= 0xFF
+    sim.memory[0x100] ^= 0xFF
+    result = runner.invoke(cli, f"--port {sim_url} --binary update {binary_file_path}")
+    assert result.exit_code == 0
+    assert sim.memory[: len(binary_file_contents)] == binary_file_contents
+    assert sim.bytes_recieved < 1024
+
+
+def test_update_with_shadow_cache(
+    runner, sim, sim_url, tmp_path, binary_file_path, binary_file_contents
+):
+    options = f"--port {sim_url} --binary --shadow-cache {tmp_path}"
+    sim.memory[: len(binary_file_contents)] = binary_file_contents
+    sim.memory[0x50] ^= 0xFF
+    runner.invoke(cli, f"{options} read")
+    bytes_sent = sim.bytes_sent
+    result = runner.invoke(cli, f"{options} update {binary_file_path}")
+    assert result.exit_code == 0
+    assert sim.memory[: len(binary_file_contents)] == binary_file_contents
+    assert sim.bytes_sent - bytes_sent < 2048
+
+
+def test_update_failure_not_saved_to_shadow_cache(
+    runner, sim, sim_url, tmp_path, binary_file_path, binary_file_contents
+):
+    options = f"--port {sim_url} --binary --shadow-cache {tmp_path}"
+    sim.memory[: len(binary_file_contents)] = binary_file_contents
+    sim.memory[0x50] ^= 0xFF
+    with patch.object(Programmer, "write_plan", side_effect=ValueError("Failed")):
+        result = runner.invoke(cli, f"{options} update {binary_file_path}")
+    assert result.exit_code == 1
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_update_saves_to_shadow_cache(
+    runner, sim, sim_url, tmp_path, binary_file_path, binary_file_contents
+):
+    options = f"--port {sim_url} --binary --shadow-cache {tmp_path}"
+    sim.memory[: len(binary_file_contents)] = binary_file_contents
+    sim.memory[0x50] ^= 0xFF
+    assert runner.invoke(cli, f"{options} update {binary_file_path}").exit_code == 0
+    programmer = Programmer(port=sim_url, binary=True, shadow_cache=tmp_path)
+    assert programmer.known_contents() == binary_file_contents
+
+
+def test_update_image_regions_saves_shadow_cache_once(
+    runner, sim, sim_url, tmp_path, hex_file_path
+):
+    options = f"--port {sim_url} --binary --shadow-cache {tmp_path}"
+    read = runner.invoke(cli, f"{options} read --output {tmp_path / 'rom.bin'}")
+    assert read.exit_code == 0
+    with patch("eeprom.shadow.ShadowCache.save") as save:
+        result = runner.invoke(cli, f"{options} update --offset -8000 {hex_file_path}")
+    assert result.exit_code == 0, result.output
+    save.assert_called_once()
+
+
+def test_update_from_stdin(runner, sim, sim_url, binary_file_contents):
+    sim.memory[:] = binary_file_contents
+    sim.memory[0x50] ^= 0xFF
+    result = runner.invoke(
+        cli, f"--port {sim_url} --binary update -", input=binary_file_contents
+    )
+    assert result.exit_code == 0
+    assert sim.memory == binary_file_contents
+
+
+def test_file_contents_maps_regular_file(binary_file_path, binary_file_contents):
+    with open(binary_file_path, "rb") as binary_file:
+        contents = file_contents(binary_file)
+    assert isinstance(contents, memoryview)
+    assert contents == binary_file_contents
+
+
+def test_file_contents_reads_empty_file(tmp_path):
+    path = tmp_path / "empty.bin"
+    path.write_bytes(b"")
+    with open(path, "rb") as binary_file:
+        assert file_contents(binary_file) == b""
+
+
+def test_update_prints_planned_and_actual_cost(
+    runner, sim, sim_url, binary_file_path, binary_file_contents
+):
+    sim.memory[: len(binary_file_contents)] = binary_file_contents
+    sim.memory[0x50] ^= 0xFF
+    sim.memory[0x60] ^= 0xFF
+    result = runner.invoke(cli, f"--port {sim_url} update {binary_file_path}")
+    assert result.exit_code == 0
+    assert result.output.startswith("Planned 2 writes of 2 bytes, estimated 22.")
+    assert " ms, took " in result.output
+    assert sim.memory[: len(binary_file_contents)] == binary_file_contents
+
+
+@pytest.mark.parametrize(
+    "options,planned",
+    [("", "Planned 7 writes of 7 bytes"), ("--binary", "Planned 2 writes of 38 bytes")],
+)
+def test_update_image_regions(runner, sim, sim_url, hex_file_path, options, planned):
+    sim.memory[:0x20] = bytes(range(0x20))
+    sim.memory[0x10] = 0x00
+    result = runner.invoke(
+        cli, f"--port {sim_url} {options} update --offset -8000 {hex_file_path}"
+    )
+    assert result.exit_code == 0
+    assert result.output.startswith(planned)
+    assert sim.memory[:0x20] == bytes(range(0x20))
+    assert sim.memory[0x7FFA:] == b"\x00\x80\x00\x80\x00\x80"
+    assert sim.memory[0x20:0x7FFA] == b"\xff" * (0x7FFA - 0x20)
+
+
+def test_update_image_regions_with_known_contents(
+    runner, sim, sim_url, tmp_path, hex_file_path
+):
+    options = f"--port {sim_url} --shadow-cache {tmp_path}"
+    runner.invoke(cli, f"{options} read")
+    result = runner.invoke(cli, f"{options} update --offset -8000 {hex_file_path}")
+    assert result.exit_code == 0
+    assert sim.memory[:0x20] == bytes(range(0x20))
+    assert sim.memory[0x7FFA:] == b"\x00\x80\x00\x80\x00\x80"
+
+
+def test_compressed_update(runner, sim, sim_url, binary_file_path):
+    result = runner.invoke(
+        cli, f"--port {sim_url} --binary --compress update {binary_file_path}"
+    )
+    assert result.exit_code == 0
+    assert "\nCompressed " in result.output
+    assert sim.memory == binary_file_path.read_bytes()
+
+
+@pytest.mark.parametrize("written", [0x4000, 0x8000])
+def test_update_resume(
+    runner, sim, sim_url, tmp_path, binary_file_path, binary_file_contents, written
+):
+    journal = WriteJournal(tmp_path / "journal.json")
+    journal.record(write_key(sim_url, 0, binary_file_contents), 0, written)
+    sim.memory[:written] = binary_file_contents[:written]
+    sim.memory[0x10] ^= 0xFF
+    result = runner.invoke(
+        cli,
+        f"--port {sim_url} --journal {journal.path} update --resume {binary_file_path}",
+    )
+    assert result.exit_code == 0
+    assert sim.memory[0x10] != binary_file_contents[0x10]
+    assert sim.memory[0x11:] == binary_file_contents[0x11:]
+    assert journal.load() == {}
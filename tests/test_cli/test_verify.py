@@ -59,3 +59,69 @@ def test_serial_message_sent(
     binary_file_contents,
 ):
     assert_messages_sent(default_programmer, read_serial_requests(binary_file_contents))
+
+
+def test_verify_with_range_crcs(
+    runner, sim, sim_url, binary_file_path, binary_file_contents
+):
+    sim.memory[:] = binary_file_contents
+    result = runner.invoke(cli, f"--port {sim_url} --binary verify {binary_file_path}")
+    assert result.exit_code == 0
+    assert result.output == ""
+    assert sim.clock < 1
+
+
+def test_verify_with_range_crcs_prints_differences(
+    runner, sim, sim_url, binary_file_path, binary_file_contents
+):
+    sim.memory[:] = binary_file_contents
+    sim.memory[0x0050] ^= 0xFF
+    sim.memory[0x7FFF] ^= 0xFF
+    result = runner.invoke(cli, f"--port {sim_url} --binary verify {binary_file_path}")
+    assert result.exit_code == 1
+    assert result.output == (
+        f"0050 expected {binary_file_contents[0x50]:02X} found {sim.memory[0x50]:02X}\n"
+        f"7FFF expected {binary_file_contents[0x7FFF]:02X} "
+        f"found {sim.memory[0x7FFF]:02X}\n"
+    )
+    assert sim.bytes_sent < 1024
+
+
+def test_verify_empty_file(runner, default_programmer, tmp_path):
+    path = tmp_path / "empty.bin"
+    path.write_bytes(b"")
+    result = runner.invoke(cli, f"verify {path}")
+    assert result.exit_code == 0
+
+
+def test_verify_from_stdin(runner, sim, sim_url, binary_file_contents):
+    sim.memory[:] = binary_file_contents
+    sim.memory[0x5A] ^= 0xFF
+    result = runner.invoke(
+        cli, f"--port {sim_url} --binary verify -", input=binary_file_contents
+    )
+    assert result.exit_code == 1
+    expected, found = binary_file_contents[0x5A], binary_file_contents[0x5A] ^ 0xFF
+    assert result.output == f"005A expected {expected:02X} found {found:02X}\n"
+
+
+@pytest.mark.parametrize("options", ["", "--binary"])
+def test_verify_image_regions(runner, sim, sim_url, srec_file_path, options):
+    sim.memory[:0x20] = bytes(range(0x20))
+    sim.memory[0x7FFA:] = b"\x00\x80\x00\x80\x00\x81"
+    result = runner.invoke(
+        cli, f"--port {sim_url} {options} verify --offset -8000 {srec_file_path}"
+    )
+    assert result.exit_code == 1
+    assert result.output == "7FFF expected 80 found 81\n"
+
+
+def test_compressed_verify(runner, sim, sim_url, binary_file_path):
+    sim.memory[:] = binary_file_path.read_bytes()
+    sim.memory[0x7FFF] ^= 0xFF
+    result = runner.invoke(
+        cli, f"--port {sim_url} --binary --compress verify {binary_file_path}"
+    )
+    assert result.exit_code == 1
+    assert result.output.startswith("7FFF expected")
+    assert "\nCompressed " in result.output
@@ -1,6 +1,7 @@
 import pytest
 
 from eeprom import cli
+from eeprom.journal import WriteJournal, write_key
 
 
 @pytest.fixture
@@ -54,3 +55,169 @@ def test_serial_message_sent(
     write_serial_requests,
 ):
     assert_messages_sent(default_programmer, write_serial_requests)
+
+
+@pytest.fixture
+def timings_result_for(default_programmer, runner, serial_ack, binary_file_path):
+    def _timings_result_for(stats_response):
+        blocks = len(binary_file_path.read_bytes()) // 16
+        default_programmer.arduino.serial_connection.readline.side_effect = [
+            serial_ack
+        ] * blocks + [stats_response]
+        return runner.invoke(cli, f"write --timings {binary_file_path}")
+
+    return _timings_result_for
+
+
+def test_timings_output(timings_result_for):
+    result = timings_result_for(b"2048 8192000 4500 0\n")
+    assert result.exit_code == 0
+    assert (
+        result.output == "Write cycles: 2048, mean 4.00 ms, max 4.50 ms, timeouts 0\n"
+    )
+
+
+def test_timings_without_write_cycles_output(timings_result_for):
+    result = timings_result_for(b"0 0 0 0\n")
+    assert result.output == "Write cycles: 0\n"
+
+
+def test_timings_not_supported_output(timings_result_for):
+    result = timings_result_for(b"M\n")
+    assert result.output == "The programmer does not measure write cycle times.\n"
+
+
+def test_timings_request_sent(default_programmer, timings_result_for):
+    timings_result_for(b"0 0 0 0\n")
+    default_programmer.arduino.serial_connection.write.assert_called_with(b"M\n")
+
+
+@pytest.mark.parametrize("options", ["", "--binary"])
+def test_write_from_stdin(runner, sim, sim_url, binary_file_contents, options):
+    result = runner.invoke(
+        cli, f"--port {sim_url} {options} write -", input=binary_file_contents
+    )
+    assert result.exit_code == 0
+    assert sim.memory == binary_file_contents
+
+
+@pytest.fixture
+def sparse_file_path(tmp_path):
+    image = bytearray(b"\xff" * 0x8000)
+    image[0x0000:0x0100] = bytes(range(256))
+    image[0x7FFC:0x8000] = b"\x00\x80\x00\x80"
+    path = tmp_path / "sparse.bin"
+    path.write_bytes(image)
+    return path
+
+
+@pytest.mark.parametrize("options", ["", "--binary"])
+def test_write_skip_fill(runner, sim, sim_url, sparse_file_path, options):
+    result = runner.invoke(
+        cli, f"--port {sim_url} {options} write --skip-fill FF {sparse_file_path}"
+    )
+    assert result.exit_code == 0
+    assert result.output.startswith("Wrote ")
+    assert result.output.endswith(" of 32768 bytes\n")
+    assert sim.memory == sparse_file_path.read_bytes()
+    assert sim.write_cycle_count < 0x0200
+
+
+def test_write_skip_fill_from_stdin(runner, sim, sim_url, sparse_file_path):
+    result = runner.invoke(
+        cli,
+        f"--port {sim_url} --binary write --skip-fill FF -",
+        input=sparse_file_path.read_bytes(),
+    )
+    assert result.exit_code == 0
+    assert sim.memory == sparse_file_path.read_bytes()
+
+
+@pytest.mark.parametrize("path", ["hex_file_path", "srec_file_path"])
+def test_write_image_regions(request, runner, sim, sim_url, path):
+    path = request.getfixturevalue(path)
+    result = runner.invoke(cli, f"--port {sim_url} write --offset -8000 {path}")
+    assert result.exit_code == 0
+    assert sim.memory[:0x20] == bytes(range(0x20))
+    assert sim.memory[0x7FFA:] == b"\x00\x80\x00\x80\x00\x80"
+    assert sim.memory[0x20:0x7FFA] == b"\xff" * (0x7FFA - 0x20)
+    assert sim.write_cycle_count == 0x20 + 6
+
+
+def test_write_binary_with_offset(runner, sim, sim_url, tmp_path):
+    path = tmp_path / "rom.bin"
+    path.write_bytes(b"\xea" * 0x20)
+    result = runner.invoke(cli, f"--port {sim_url} write --offset 7FE0 {path}")
+    assert result.exit_code == 0
+    assert sim.memory[0x7FE0:] == b"\xea" * 0x20
+
+
+def test_write_with_format(runner, sim, sim_url, tmp_path, hex_file_path):
+    path = tmp_path / "rom.txt"
+    path.write_bytes(hex_file_path.read_bytes())
+    result = runner.invoke(
+        cli, f"--port {sim_url} write --format ihex --offset -8000 {path}"
+    )
+    assert result.exit_code == 0
+    assert sim.memory[:0x20] == bytes(range(0x20))
+
+
+def test_write_image_skip_fill(runner, sim, sim_url, hex_file_path):
+    result = runner.invoke(
+        cli, f"--port {sim_url} write --offset -8000 --skip-fill FF {hex_file_path}"
+    )
+    assert result.exit_code == 0
+    assert result.output == "Wrote 38 of 38 bytes\n"
+
+
+def test_write_invalid_image(runner, sim, sim_url, tmp_path):
+    path = tmp_path / "rom.hex"
+    path.write_text(":0100000000FE\n")
+    result = runner.invoke(cli, f"--port {sim_url} write {path}")
+    assert result.exit_code == 1
+    assert isinstance(result.exception, ValueError)
+
+
+def test_compressed_write(runner, sim, sim_url, sparse_file_path):
+    result = runner.invoke(
+        cli, f"--port {sim_url} --binary --compress write {sparse_file_path}"
+    )
+    assert result.exit_code == 0
+    assert result.output.startswith("Compressed 32768 bytes to ")
+    assert sim.memory == sparse_file_path.read_bytes()
+
+
+@pytest.fixture
+def interrupted_write(sim, sim_url, tmp_path, binary_file_contents):
+    journal = WriteJournal(tmp_path / "journal.json")
+    journal.record(write_key(sim_url, 0, binary_file_contents), 0, 0x4000)
+    sim.memory[:0x4000] = binary_file_contents[:0x4000]
+    return journal
+
+
+def test_write_resume(
+    runner, sim, sim_url, interrupted_write, binary_file_path, binary_file_contents
+):
+    result = runner.invoke(
+        cli,
+        f"--port {sim_url} --journal {interrupted_write.path} "
+        f"write --resume {binary_file_path}",
+    )
+    assert result.exit_code == 0
+    assert result.output == "Wrote 16384 of 32768 bytes\n"
+    assert sim.memory == binary_file_contents
+    assert sim.write_cycle_count == 0x4000
+    assert interrupted_write.load() == {}
+
+
+def test_write_resume_from_stdin(
+    runner, sim, sim_url, interrupted_write, binary_file_contents
+):
+    result = runner.invoke(
+        cli,
+        f"--port {sim_url} --journal {interrupted_write.path} write --resume -",
+        input=bytes(binary_file_contents),
+    )
+    assert result.exit_code == 0
+    assert result.output == "Wrote 16384 of 32768 bytes\n"
+    assert sim.memory == binary_file_contents
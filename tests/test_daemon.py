@@ -0,0 +1,459 @@
+import io
+import os
+import threading
+import time
+from unittest.mock import Mock, patch
+
+import pytest
+
+from eeprom import cli, daemon
+from eeprom.planner import Plan, PlannedWrite
+from eeprom.programmer_commands import WriteCycleStats
+from eeprom.rle import CompressionStats
+
+
+@pytest.fixture
+def socket_path(tmp_path):
+    return str(tmp_path / "eeprom.sock")
+
+
+@pytest.fixture
+def served_programmer():
+    served_programmer = Mock(write_size=16, write_cycle_time=4000.0)
+    for method in ("write_byte", "write_block", "write"):
+        getattr(served_programmer, method).return_value = None
+    return served_programmer
+
+
+@pytest.fixture
+def server(socket_path, served_programmer):
+    server = daemon.ProgrammerServer(socket_path, served_programmer)
+    thread = threading.Thread(target=server.serve_forever)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+    thread.join()
+
+
+@pytest.fixture
+def remote(server, socket_path):
+    remote = daemon.RemoteProgrammer(socket_path)
+    yield remote
+    remote.disconnect()
+
+
+def test_read_byte(remote, served_programmer):
+    served_programmer.read_byte.return_value = 0xEA
+    assert remote.read_byte(0x2A55) == 0xEA
+    served_programmer.read_byte.assert_called_once_with(0x2A55)
+
+
+def test_write_byte(remote, served_programmer):
+    assert remote.write_byte(0x2A55, 0xEA) is None
+    served_programmer.write_byte.assert_called_once_with(0x2A55, 0xEA)
+
+
+def test_read_block(remote, served_programmer):
+    served_programmer.read_block.return_value = [0xEA, 0x2F]
+    assert remote.read_block(0x2A55) == [0xEA, 0x2F]
+
+
+def test_write_block(remote, served_programmer):
+    remote.write_block(0x2A55, [0xEA, 0x2F])
+    served_programmer.write_block.assert_called_once_with(
+        0x2A55, bytearray([0xEA, 0x2F])
+    )
+
+
+def test_read(remote, served_programmer, valid_eeprom_data):
+    served_programmer.read.return_value = valid_eeprom_data
+    assert remote.read() == valid_eeprom_data
+    served_programmer.read.assert_called_once_with(None, None)
+
+
+def test_read_bytes(remote, served_programmer, valid_eeprom_data):
+    served_programmer.read_bytes.return_value = bytearray(valid_eeprom_data)
+    assert remote.read_bytes(0x10) == bytearray(valid_eeprom_data)
+    served_programmer.read_bytes.assert_called_once_with(0x10, None)
+
+
+def blocks_of(*blocks, error=None, closed=None):
+    try:
+        yield from blocks
+        if error is not None:
+            raise error
+    finally:
+        if closed is not None:
+            closed.set()
+
+
+def test_iter_read(remote, served_programmer):
+    served_programmer.iter_read.return_value = blocks_of(b"\xea" * 16, b"\x2f" * 16)
+    assert list(remote.iter_read(0x10)) == [b"\xea" * 16, b"\x2f" * 16]
+    served_programmer.iter_read.assert_called_once_with(0x10, None)
+
+
+def test_iter_read_error(remote, served_programmer):
+    served_programmer.iter_read.return_value = blocks_of(
+        b"\xea" * 16, error=ValueError("Address 0010: unexpected response")
+    )
+    blocks = remote.iter_read()
+    assert next(blocks) == b"\xea" * 16
+    with pytest.raises(ValueError, match="Address 0010"):
+        next(blocks)
+    served_programmer.iter_read.side_effect = ValueError("Address out of range")
+    with pytest.raises(ValueError, match="Address out of range"):
+        list(remote.iter_read(0x8000))
+    assert remote.write_size == 16
+
+
+def test_iter_read_closed_early(remote, served_programmer):
+    served_programmer.iter_read.return_value = blocks_of(*[b"\xea" * 16] * 4)
+    blocks = remote.iter_read()
+    assert next(blocks) == b"\xea" * 16
+    blocks.close()
+    assert remote.write_size == 16
+
+
+def test_iter_read_client_disconnects(remote, served_programmer):
+    closed = threading.Event()
+    served_programmer.iter_read.return_value = blocks_of(
+        *[bytes(0x10000)] * 1000, closed=closed
+    )
+    next(remote.iter_read())
+    remote.disconnect()
+    assert closed.wait(5)
+
+
+def test_read_empty(remote, served_programmer):
+    served_programmer.read.return_value = []
+    assert remote.read(0x10, 0x0F) == []
+
+
+def test_write(remote, served_programmer, valid_eeprom_data):
+    remote.write(valid_eeprom_data, start_address=0x20)
+    served_programmer.write.assert_called_once_with(
+        bytearray(valid_eeprom_data), start_address=0x20, skip_fill=None, resume=False
+    )
+
+
+def test_write_skip_fill(remote, served_programmer, valid_eeprom_data):
+    served_programmer.write.return_value = 16
+    assert remote.write(valid_eeprom_data, skip_fill=0xFF) == 16
+    served_programmer.write.assert_called_once_with(
+        bytearray(valid_eeprom_data), start_address=None, skip_fill=0xFF, resume=False
+    )
+
+
+def test_write_buffer(remote, served_programmer, binary_file_contents):
+    remote.write(memoryview(binary_file_contents))
+    served_programmer.write.assert_called_once_with(
+        bytearray(binary_file_contents),
+        start_address=None,
+        skip_fill=None,
+        resume=False,
+    )
+
+
+def test_write_cycle_stats(remote, served_programmer):
+    served_programmer.write_cycle_stats.return_value = WriteCycleStats(
+        4, 16000, 4500, 0
+    )
+    stats = remote.write_cycle_stats()
+    assert isinstance(stats, WriteCycleStats)
+    assert stats == (4, 16000, 4500, 0)
+
+
+def test_write_cycle_stats_not_supported(remote, served_programmer):
+    served_programmer.write_cycle_stats.return_value = None
+    assert remote.write_cycle_stats() is None
+
+
+def test_attributes(remote):
+    assert remote.write_size == 16
+    assert remote.write_cycle_time == 4000.0
+
+
+def test_error_raised_in_client(remote, served_programmer):
+    served_programmer.read_byte.side_effect = ValueError("Address out of range")
+    with pytest.raises(ValueError, match="Address out of range"):
+        remote.read_byte(0x8000)
+
+
+def test_unexpected_error_keeps_connection(remote, served_programmer):
+    served_programmer.read.side_effect = [TypeError("unsupported operand"), b"\xea"]
+    with pytest.raises(ValueError, match="TypeError: unsupported operand"):
+        remote.read("a", "b")
+    with pytest.raises(ValueError, match="KeyError"):
+        remote.request({"method": "read"})
+    assert remote.read(0x00, 0x00) == [0xEA]
+
+
+def test_unknown_method(remote, served_programmer):
+    with pytest.raises(ValueError):
+        remote.call("disconnect")
+    served_programmer.disconnect.assert_not_called()
+
+
+def test_unknown_attribute(remote):
+    with pytest.raises(ValueError):
+        remote.request({"attribute": "arduino"})
+
+
+def test_clients_share_programmer(remote, socket_path, served_programmer):
+    served_programmer.read_byte.return_value = 0xEA
+    other = daemon.RemoteProgrammer(socket_path)
+    assert other.read_byte(0x00) == 0xEA
+    assert remote.read_byte(0x01) == 0xEA
+    other.disconnect()
+    assert served_programmer.read_byte.call_count == 2
+
+
+def test_server_removes_stale_socket(socket_path, served_programmer):
+    with open(socket_path, "w"):
+        pass
+    server = daemon.ProgrammerServer(socket_path, served_programmer)
+    server.server_close()
+    assert not os.path.exists(socket_path)
+
+
+def test_server_close_without_socket(socket_path, served_programmer):
+    server = daemon.ProgrammerServer(socket_path, served_programmer)
+    os.unlink(socket_path)
+    server.server_close()
+
+
+def test_serve_stops_on_interrupt(socket_path, served_programmer):
+    with patch.object(
+        daemon.ProgrammerServer, "serve_forever", side_effect=KeyboardInterrupt
+    ):
+        daemon.serve(served_programmer, socket_path)
+    assert not os.path.exists(socket_path)
+
+
+def test_recieve_message():
+    header, data = daemon.recieve_message(io.BytesIO(b'{"length": 2}\nab'))
+    assert header == {"length": 2}
+    assert data == bytearray(b"ab")
+
+
+def test_recieve_message_raises_for_closed_connection():
+    with pytest.raises(ConnectionError):
+        daemon.recieve_message(io.BytesIO(b""))
+
+
+def test_recieve_message_raises_for_partial_data():
+    with pytest.raises(ConnectionError):
+        daemon.recieve_message(io.BytesIO(b'{"length": 4}\nab'))
+
+
+def test_fair_lock_serves_in_order():
+    lock = daemon.FairLock()
+    order = []
+
+    def take(number):
+        with lock:
+            order.append(number)
+
+    with lock:
+        threads = []
+        for number in range(5):
+            thread = threading.Thread(target=take, args=(number,))
+            thread.start()
+            threads.append(thread)
+            while lock._next_ticket != number + 2:
+                time.sleep(0.001)
+    for thread in threads:
+        thread.join()
+    assert order == [0, 1, 2, 3, 4]
+
+
+def test_cli_uses_daemon(runner, remote, socket_path, served_programmer):
+    served_programmer.read_byte.return_value = 0xEA
+    result = runner.invoke(cli, f"--daemon {socket_path} read-byte -a 2A55")
+    assert result.output == "EA\n"
+    served_programmer.read_byte.assert_called_once_with(0x2A55)
+
+
+def test_cli_serve(runner, mock_serial_connection, socket_path):
+    with patch("eeprom.cli.daemon.serve") as mock_serve:
+        result = runner.invoke(cli, f"serve --socket {socket_path}")
+    assert result.exit_code == 0
+    assert result.output == f"Listening on {socket_path}\n"
+    programmer, served_socket_path = mock_serve.call_args[0]
+    assert served_socket_path == socket_path
+    assert programmer.arduino.serial_connection.exclusive is True
+    programmer.arduino.serial_connection.close.assert_called_once()
+
+
+def test_block_hashes(remote, served_programmer):
+    served_programmer.block_hashes.return_value = [0x31C3, 0xFFFF]
+    assert remote.block_hashes(0x0000, 128, 64) == [0x31C3, 0xFFFF]
+    served_programmer.block_hashes.assert_called_once_with(0x0000, 128, 64)
+
+
+def test_block_hashing(remote, served_programmer):
+    served_programmer.block_hashing = True
+    assert remote.block_hashing is True
+
+
+def test_range_crc(remote, served_programmer):
+    served_programmer.range_crc.return_value = 0xCBF43926
+    assert remote.range_crc(0x0000, 9) == 0xCBF43926
+    served_programmer.range_crc.assert_called_once_with(0x0000, 9)
+
+
+def test_differing_ranges(remote, served_programmer, valid_eeprom_data):
+    served_programmer.differing_ranges.return_value = [(0x40, 0x80)]
+    assert remote.differing_ranges(valid_eeprom_data) == [(0x40, 0x80)]
+    served_programmer.differing_ranges.assert_called_once_with(
+        bytearray(valid_eeprom_data), start_address=None, block_size=64
+    )
+
+
+def test_crc_checking(remote, served_programmer):
+    served_programmer.crc_checking = False
+    assert remote.crc_checking is False
+
+
+def test_known_contents(remote, served_programmer, valid_eeprom_data):
+    served_programmer.known_contents.return_value = bytearray(valid_eeprom_data)
+    assert remote.known_contents() == bytearray(valid_eeprom_data)
+
+
+def test_known_contents_unknown(remote, served_programmer):
+    served_programmer.known_contents.return_value = None
+    assert remote.known_contents() is None
+
+
+def test_remember_contents(remote, served_programmer, valid_eeprom_data):
+    served_programmer.remember_contents.return_value = None
+    remote.remember_contents(valid_eeprom_data, start_address=0x20, save=False)
+    served_programmer.remember_contents.assert_called_once_with(
+        bytearray(valid_eeprom_data), start_address=0x20, save=False
+    )
+
+
+def test_save_contents(remote, served_programmer):
+    served_programmer.save_contents.return_value = None
+    remote.save_contents()
+    served_programmer.save_contents.assert_called_once_with()
+
+
+def test_resume_address(remote, served_programmer):
+    served_programmer.resume_address.return_value = 0x30
+    assert remote.resume_address(b"\xea\x2f", start_address=0x20) == 0x30
+    served_programmer.resume_address.assert_called_once_with(
+        bytearray(b"\xea\x2f"), start_address=0x20
+    )
+
+
+def test_write_resume(remote, served_programmer, valid_eeprom_data):
+    served_programmer.write.return_value = 6
+    assert remote.write(valid_eeprom_data, resume=True) == 6
+    served_programmer.write.assert_called_once_with(
+        bytearray(valid_eeprom_data), start_address=None, skip_fill=None, resume=True
+    )
+
+
+def test_write_stream(remote, served_programmer):
+    chunks = []
+
+    def write_stream(stream, start_address=None):
+        chunks.extend(stream)
+        return sum(len(chunk) for chunk in chunks)
+
+    served_programmer.write_stream.side_effect = write_stream
+    assert remote.write_stream([b"\xea\x2f", b"", b"\xa2"], start_address=0x20) == 3
+    assert chunks == [b"\xea\x2f", b"\xa2"]
+    assert served_programmer.write_stream.call_args[1] == {"start_address": 0x20}
+
+
+def test_write_stream_sends_chunks_as_they_are_read(remote, served_programmer):
+    recieved = threading.Event()
+
+    def write_stream(stream, start_address=None):
+        next(stream)
+        recieved.set()
+        return 2 + sum(len(chunk) for chunk in stream)
+
+    def chunks():
+        yield b"\xea\x2f"
+        assert recieved.wait(5)
+        yield b"\xa2"
+
+    served_programmer.write_stream.side_effect = write_stream
+    assert remote.write_stream(chunks()) == 3
+
+
+def test_write_stream_error(remote, served_programmer):
+    served_programmer.write_stream.side_effect = ValueError("Address out of range")
+    with pytest.raises(ValueError, match="Address out of range"):
+        remote.write_stream([b"\xea"] * 4, start_address=0x8000)
+    assert remote.write_size == 16
+
+
+def test_write_stream_error_reading_chunks(remote, served_programmer):
+    def chunks():
+        yield b"\xea"
+        raise OSError("Input closed")
+
+    served_programmer.write_stream.side_effect = lambda stream, **kwargs: len(
+        b"".join(stream)
+    )
+    with pytest.raises(OSError, match="Input closed"):
+        remote.write_stream(chunks())
+    assert remote.write_size == 16
+
+
+def test_plan_writes(remote, served_programmer):
+    served_programmer.plan_writes.return_value = Plan(
+        [PlannedWrite("write_byte", 0x50, 1)], 10086.8
+    )
+    plan = remote.plan_writes([(0x50, 0x51)], start_address=0, end_address=0x100)
+    assert plan == Plan([PlannedWrite("write_byte", 0x50, 1)], 10086.8)
+    served_programmer.plan_writes.assert_called_once_with(
+        [[0x50, 0x51]], start_address=0, end_address=0x100
+    )
+
+
+def test_write_plan(remote, served_programmer):
+    served_programmer.write_plan.return_value = None
+    remote.write_plan(b"\xea\x2f", [PlannedWrite("write_page", 0x20, 2)])
+    served_programmer.write_plan.assert_called_once_with(
+        bytearray(b"\xea\x2f"),
+        [["write_page", 0x20, 2]],
+        start_address=None,
+        save=True,
+    )
+
+
+def test_is_blank(remote, served_programmer):
+    served_programmer.is_blank.return_value = True
+    assert remote.is_blank(0x10, 0x1F, fill=0x00) is True
+    served_programmer.is_blank.assert_called_once_with(0x10, 0x1F, fill=0x00)
+
+
+def test_write_regions(remote, served_programmer):
+    served_programmer.write.side_effect = [1, 2]
+    regions = [(0x10, b"\xea"), (0x20, b"\x2f\x2f")]
+    assert remote.write_regions(regions, skip_fill=0xFF) == 3
+    served_programmer.write.assert_called_with(
+        bytearray(b"\x2f\x2f"), start_address=0x20, skip_fill=0xFF, resume=False
+    )
+
+
+def test_compression(remote, served_programmer):
+    served_programmer.compression = True
+    served_programmer.compression_stats = CompressionStats(0x8000, 0x0200)
+    assert remote.compression is True
+    assert remote.compression_stats == CompressionStats(0x8000, 0x0200)
+    assert remote.compression_stats.ratio == 64
+
+
+def test_frame_checking(remote, served_programmer):
+    served_programmer.frame_checking = True
+    served_programmer.frame_retries = 3
+    assert remote.frame_checking is True
+    assert remote.frame_retries == 3
@@ -33,6 +33,10 @@ def test_eeprom_max_byte(eeprom):
     assert eeprom.max_byte == 0xFF
 
 
+def test_eeprom_page_size(eeprom):
+    assert eeprom.page_size == 1
+
+
 def test_eeprom_is_valid_address(eeprom):
     for address in range(0, 0x10000):
         try:
@@ -65,6 +69,19 @@ def test_AT28C25_max_address(at28c25):
     assert at28c25.max_address == 0x7FFF
 
 
+def test_AT28C25_page_size(at28c25):
+    assert at28c25.page_size == 64
+
+
+def test_AT28C25_is_valid_page(at28c25):
+    at28c25.is_valid_page(0x0040, 64)
+    at28c25.is_valid_page(0x007F, 1)
+    with pytest.raises(ValueError):
+        at28c25.is_valid_page(0x0041, 64)
+    with pytest.raises(ValueError):
+        at28c25.is_valid_page(0x003F, 2)
+
+
 def test_AT28C25_is_valid_address(at28c25):
     for address in range(0, 0x8000):
         try:
@@ -0,0 +1,66 @@
+import uuid
+
+import pytest
+
+from eeprom import gang, simulator
+
+
+@pytest.fixture
+def sim_urls():
+    names = [uuid.uuid4().hex for _ in range(3)]
+    yield [f"sim://{name}" for name in names]
+    for name in names:
+        simulator.simulators.pop(name, None)
+
+
+def write_image(programmer):
+    programmer.write(bytes(range(256)))
+    return 256
+
+
+def test_run(sim_urls):
+    results = gang.run(sim_urls, write_image, binary=True)
+    assert [result.port for result in results] == sim_urls
+    for result in results:
+        assert result.error is None
+        assert result.data_bytes == 256
+        assert result.seconds > 0
+        sim = simulator.get_simulator(result.port)
+        assert sim.memory[:256] == bytes(range(256))
+
+
+def test_run_uses_a_worker_per_port(sim_urls):
+    ports = []
+
+    def operation(programmer):
+        ports.append(programmer.arduino.serial_connection.port)
+        return 0
+
+    gang.run(sim_urls, operation)
+    assert sorted(ports) == sorted(sim_urls)
+
+
+def test_run_records_failed_port(sim_urls):
+    def operation(programmer):
+        if programmer.arduino.serial_connection.port == sim_urls[1]:
+            raise ValueError("Address 0000: read_block got unexpected response")
+        return write_image(programmer)
+
+    results = gang.run(sim_urls, operation)
+    assert [result.error for result in results] == [
+        None,
+        "Address 0000: read_block got unexpected response",
+        None,
+    ]
+    assert results[1].data_bytes == 0
+    assert simulator.get_simulator(sim_urls[2]).memory[:256] == bytes(range(256))
+
+
+def test_run_records_connection_failure(tmp_path):
+    (result,) = gang.run([str(tmp_path / "missing")], write_image)
+    assert result.error
+    assert result.data_bytes == 0
+
+
+def test_run_without_ports():
+    assert gang.run([], write_image) == []
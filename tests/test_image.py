@@ -0,0 +1,169 @@
+import pytest
+
+from eeprom import image
+from eeprom.image import Region
+
+INTEL_HEX = b"""\
+:10010000214601360121470136007EFE09D2190140
+:100110002146017E17C20001FF5F16002148011928
+:00000001FF
+"""
+
+SRECORD = b"""\
+S00F000068656C6C6F202020202000003C
+S11F00007C0802A6900100049421FFF07C6C1B787C8C23783C6000003863000026
+S11F001C4BFFFFE5398000007D83637880010014382100107C0803A64E800020E9
+S111003848656C6C6F20776F726C642E0A0042
+S5030003F9
+S9030000FC
+"""
+
+
+def ihex_record(record_type, address, data):
+    record = bytes([len(data)]) + address.to_bytes(2, "big")
+    record += bytes([record_type]) + bytes(data)
+    return b":" + (record + bytes([-sum(record) & 0xFF])).hex().upper().encode()
+
+
+def srecord(record_type, address, data):
+    address_size = image.SRECORD_ADDRESS_SIZES[record_type]
+    record = address.to_bytes(address_size, "big") + bytes(data)
+    record = bytes([len(record) + 1]) + record
+    checksum = bytes([~sum(record) & 0xFF])
+    return f"S{record_type}".encode() + (record + checksum).hex().upper().encode()
+
+
+@pytest.mark.parametrize(
+    "path,file_format",
+    [
+        ("rom.hex", "ihex"),
+        ("ROM.IHX", "ihex"),
+        ("rom.s19", "srec"),
+        ("rom.srec", "srec"),
+        ("rom.bin", "binary"),
+        ("<stdin>", "binary"),
+    ],
+)
+def test_detect_format(path, file_format):
+    assert image.detect_format(path) == file_format
+
+
+def test_parse_intel_hex():
+    records = list(image.parse_intel_hex(INTEL_HEX.splitlines()))
+    assert records == [
+        (0x0100, bytes.fromhex("214601360121470136007EFE09D21901")),
+        (0x0110, bytes.fromhex("2146017E17C20001FF5F160021480119")),
+    ]
+
+
+def test_parse_intel_hex_stops_at_end_of_file():
+    lines = [ihex_record(0, 0x10, b"\xea"), b":00000001FF", b"garbage"]
+    assert list(image.parse_intel_hex(lines)) == [(0x10, b"\xea")]
+
+
+def test_parse_intel_hex_extended_addresses():
+    lines = [
+        ihex_record(2, 0, b"\x10\x00"),
+        ihex_record(0, 0x0010, b"\x01"),
+        ihex_record(4, 0, b"\x00\x01"),
+        ihex_record(0, 0x0020, b"\x02"),
+        ihex_record(5, 0, b"\x00\x00\x80\x00"),
+        ihex_record(3, 0, b"\x00\x00\x80\x00"),
+    ]
+    assert list(image.parse_intel_hex(lines)) == [
+        (0x10010, b"\x01"),
+        (0x10020, b"\x02"),
+    ]
+
+
+def test_parse_intel_hex_skips_blank_lines():
+    lines = [b"", b"  \r\n", ihex_record(0, 0, b"\xea") + b"\r\n"]
+    assert list(image.parse_intel_hex(lines)) == [(0, b"\xea")]
+
+
+@pytest.mark.parametrize(
+    "line,message",
+    [
+        (b"S1030000FC", "Line 1: expected a record starting :"),
+        (b":0G", "Line 1: invalid hexadecimal."),
+        (b":00000001", "Line 1: invalid Intel HEX record."),
+        (b":0100000001FF", "Line 1: invalid Intel HEX record."),
+        (b":0100000000FE", "Line 1: invalid Intel HEX record."),
+        (ihex_record(6, 0, b""), "Line 1: unknown record type 06."),
+    ],
+)
+def test_parse_intel_hex_invalid(line, message):
+    with pytest.raises(ValueError, match=message):
+        list(image.parse_intel_hex([line]))
+
+
+def test_parse_srecord():
+    records = list(image.parse_srecord(SRECORD.splitlines()))
+    assert [address for address, _ in records] == [0x0000, 0x001C, 0x0038]
+    assert records[2][1] == b"Hello world.\n\x00"
+
+
+@pytest.mark.parametrize("record_type,address", [("2", 0x012345), ("3", 0x01234567)])
+def test_parse_srecord_address_sizes(record_type, address):
+    lines = [srecord(record_type, address, b"\xea\x2f"), srecord("7", 0, b"")]
+    assert list(image.parse_srecord(lines)) == [(address, b"\xea\x2f")]
+
+
+def test_parse_srecord_stops_at_termination():
+    lines = [srecord("1", 0x10, b"\xea"), srecord("9", 0, b""), b"garbage"]
+    assert list(image.parse_srecord(lines)) == [(0x10, b"\xea")]
+
+
+@pytest.mark.parametrize(
+    "line,message",
+    [
+        (b":00000001FF", "Line 1: expected a record starting S"),
+        (b"S4030000FC", "Line 1: unknown record type S4."),
+        (b"S", "Line 1: unknown record type S."),
+        (b"S1030000FG", "Line 1: invalid hexadecimal."),
+        (b"S10200FD", "Line 1: invalid S-record."),
+        (b"S1040000FC", "Line 1: invalid S-record."),
+        (b"S1030000FD", "Line 1: invalid S-record."),
+    ],
+)
+def test_parse_srecord_invalid(line, message):
+    with pytest.raises(ValueError, match=message):
+        list(image.parse_srecord([line]))
+
+
+def test_regions_combines_consecutive_records():
+    records = [(0x10, b"\x01\x02"), (0x12, b"\x03"), (0x20, b"\x04")]
+    assert image.regions(records) == [
+        Region(0x10, bytearray(b"\x01\x02\x03")),
+        Region(0x20, bytearray(b"\x04")),
+    ]
+
+
+def test_regions_sorts_records():
+    records = [(0x20, b"\x04"), (0x12, b"\x03"), (0x10, b"\x01\x02")]
+    assert image.regions(records) == [
+        Region(0x10, bytearray(b"\x01\x02\x03")),
+        Region(0x20, bytearray(b"\x04")),
+    ]
+
+
+def test_regions_skips_empty_records():
+    assert image.regions([(0x10, b""), (0x20, b"\x01")]) == [
+        Region(0x20, bytearray(b"\x01"))
+    ]
+
+
+def test_regions_with_offset():
+    assert image.regions([(0x8010, b"\x01")], offset=-0x8000) == [
+        Region(0x10, bytearray(b"\x01"))
+    ]
+
+
+def test_regions_below_zero():
+    with pytest.raises(ValueError, match="Address 10 is below zero with offset."):
+        image.regions([(0x10, b"\x01")], offset=-0x8000)
+
+
+def test_regions_overlap():
+    with pytest.raises(ValueError, match="Data overlaps at address 0011."):
+        image.regions([(0x10, b"\x01\x02"), (0x20, b"\x03"), (0x11, b"\x04")])
@@ -0,0 +1,53 @@
+from eeprom.journal import WriteJournal, write_key
+
+
+def test_write_key():
+    key = write_key("/dev/ttyUSB0", 0x10, b"\xea\x2f")
+    assert key.startswith("/dev/ttyUSB0 0010 ")
+    assert key == write_key("/dev/ttyUSB0", 0x10, [0xEA, 0x2F])
+    assert key != write_key("/dev/ttyUSB1", 0x10, b"\xea\x2f")
+    assert key != write_key("/dev/ttyUSB0", 0x20, b"\xea\x2f")
+    assert key != write_key("/dev/ttyUSB0", 0x10, b"\xea\x2e")
+
+
+def test_completed_of_unknown_write(tmp_path):
+    assert WriteJournal(tmp_path / "journal.json").completed("key") == []
+
+
+def test_record_merges_ranges(tmp_path):
+    path = tmp_path / "journal" / "journal.json"
+    journal = WriteJournal(path)
+    journal.record("key", 0x00, 0x10)
+    journal.record("key", 0x10, 0x20)
+    journal.record("key", 0x40, 0x50)
+    journal.record("key", 0x08, 0x18)
+    journal.record("other", 0x00, 0x01)
+    assert WriteJournal(path).completed("key") == [(0x00, 0x20), (0x40, 0x50)]
+    assert WriteJournal(path).completed("other") == [(0x00, 0x01)]
+    assert not path.with_suffix(".tmp").exists()
+
+
+def test_remove(tmp_path):
+    path = tmp_path / "journal.json"
+    journal = WriteJournal(path)
+    journal.record("key", 0x00, 0x10)
+    journal.record("other", 0x00, 0x10)
+    journal.remove("key")
+    assert journal.completed("key") == []
+    assert journal.completed("other") == [(0x00, 0x10)]
+    modified = path.stat().st_mtime_ns
+    journal.remove("key")
+    assert path.stat().st_mtime_ns == modified
+
+
+def test_invalid_file_is_ignored(tmp_path):
+    path = tmp_path / "journal.json"
+    path.write_text("not json")
+    assert WriteJournal(path).load() == {}
+    path.write_text("[[0, 16]]")
+    assert WriteJournal(path).load() == {}
+    path.write_text('{"key": "done", "other": [[0, 16], [32], ["a", 48], [64, 80]]}')
+    assert WriteJournal(path).completed("key") == []
+    assert WriteJournal(path).completed("other") == [(0, 16), (64, 80)]
+    WriteJournal(path).record("key", 0, 16)
+    assert WriteJournal(path).completed("key") == [(0, 16)]
@@ -0,0 +1,146 @@
+import pytest
+
+from eeprom import planner
+from eeprom import programmer_commands as commands
+from eeprom.planner import CostModel, Plan, PlannedWrite
+
+ASCII = [(commands.WriteByte, 1, 1), (commands.WriteBlock, 16, 16)]
+RANGES = [
+    (commands.WriteByte, 1, 1),
+    (commands.WriteBlockBinary, 1, 16),
+    (commands.WriteRange, 1, 128),
+]
+PAGES = RANGES + [(commands.WritePage, 1, 64)]
+
+
+@pytest.fixture
+def cost_model():
+    def _cost_model(write_commands):
+        return CostModel(write_commands, write_cycle_time=10000, page_size=64)
+
+    return _cost_model
+
+
+def test_changed_runs():
+    new_data = bytes(64)
+    existing_data = bytearray(64)
+    existing_data[3] = existing_data[15] = existing_data[16] = 1
+    existing_data[40:44] = b"\x01" * 4
+    assert planner.changed_runs(new_data, existing_data) == [
+        (3, 4),
+        (15, 17),
+        (40, 44),
+    ]
+
+
+def test_changed_runs_of_matching_data():
+    assert planner.changed_runs(bytes(20), bytes(20)) == []
+
+
+def test_changed_runs_compares_partial_final_block():
+    assert planner.changed_runs(bytes(20), bytes(16) + b"\x00\x01\x01\x00") == [
+        (17, 19)
+    ]
+
+
+def test_cost_of_ascii_write_byte(cost_model):
+    model = cost_model(ASCII)
+    assert model.cost(commands.WriteByte, 1) == pytest.approx(
+        13 * 10 * 1000000 / 115200 + 10000
+    )
+
+
+def test_cost_of_page_write_is_one_write_cycle(cost_model):
+    model = cost_model(PAGES)
+    assert model.cost(commands.WritePage, 64) == pytest.approx(
+        70 * 10 * 1000000 / 115200 + 10000
+    )
+
+
+def test_cost_of_range_write_is_a_write_cycle_per_byte(cost_model):
+    model = cost_model(PAGES)
+    assert model.cost(commands.WriteRange, 64) == pytest.approx(
+        70 * 10 * 1000000 / 115200 + 640000
+    )
+
+
+def test_plan_without_runs(cost_model):
+    assert planner.plan([], cost_model(ASCII)) == Plan([], 0)
+
+
+def test_plan_writes_single_byte(cost_model):
+    model = cost_model(ASCII)
+    plan = planner.plan([(0x50, 0x51)], model, start=0, end=0x100)
+    assert plan.writes == [PlannedWrite("write_byte", 0x50, 1)]
+    assert plan.cost == model.cost(commands.WriteByte, 1)
+
+
+def test_plan_uses_block_for_run_of_whole_block(cost_model):
+    plan = planner.plan([(0x50, 0x60)], cost_model(ASCII), start=0, end=0x100)
+    assert plan.writes == [PlannedWrite("write_block", 0x50, 16)]
+
+
+def test_plan_writes_bytes_rather_than_rewrite_block(cost_model):
+    plan = planner.plan([(0x50, 0x52), (0x5E, 0x60)], cost_model(ASCII))
+    assert plan.writes == [
+        PlannedWrite("write_byte", 0x50, 1),
+        PlannedWrite("write_byte", 0x51, 1),
+        PlannedWrite("write_byte", 0x5E, 1),
+        PlannedWrite("write_byte", 0x5F, 1),
+    ]
+
+
+def test_plan_moves_fixed_block_back_from_end(cost_model):
+    plan = planner.plan([(0x71, 0x80)], cost_model(ASCII), start=0x60)
+    assert plan.writes == [PlannedWrite("write_block", 0x70, 16)]
+
+
+def test_plan_coalesces_runs_in_a_page(cost_model):
+    plan = planner.plan([(0x41, 0x42), (0x70, 0x72)], cost_model(PAGES))
+    assert plan.writes == [PlannedWrite("write_page", 0x41, 0x31)]
+
+
+def test_plan_does_not_cross_page_boundary(cost_model):
+    plan = planner.plan([(0x30, 0x50)], cost_model(PAGES))
+    assert plan.writes == [
+        PlannedWrite("write_page", 0x30, 0x10),
+        PlannedWrite("write_page", 0x40, 0x10),
+    ]
+
+
+def test_plan_splits_runs_longer_than_a_range(cost_model):
+    plan = planner.plan([(0x00, 0x0120)], cost_model(RANGES))
+    assert plan.writes == [
+        PlannedWrite("write_range", 0x00, 0x80),
+        PlannedWrite("write_range", 0x80, 0x80),
+        PlannedWrite("write_range", 0x0100, 0x20),
+    ]
+
+
+def test_plan_does_not_rewrite_gaps_with_ranges(cost_model):
+    plan = planner.plan([(0x00, 0x20), (0x30, 0x50)], cost_model(RANGES))
+    assert plan.writes == [
+        PlannedWrite("write_range", 0x00, 0x20),
+        PlannedWrite("write_range", 0x30, 0x20),
+    ]
+
+
+def test_plan_rewrites_gap_cheaper_than_a_command():
+    model = CostModel(RANGES, baud=9600, write_cycle_time=100)
+    plan = planner.plan([(0x00, 0x20), (0x21, 0x40)], model)
+    assert plan.writes == [PlannedWrite("write_range", 0x00, 0x40)]
+
+
+def test_plan_without_room_for_fixed_block(cost_model):
+    plan = planner.plan([(0x00, 0x0F)], cost_model(ASCII))
+    assert [write.command for write in plan.writes] == ["write_byte"] * 15
+
+
+def test_encoded_writes_are_costed_without_runs(cost_model):
+    model = cost_model(PAGES)
+    assert model.cost(commands.WritePageEncoded, 64) == pytest.approx(
+        71 * 10 * 1000000 / 115200 + 10000
+    )
+    assert model.cost(commands.WriteRangeEncoded, 64) == pytest.approx(
+        71 * 10 * 1000000 / 115200 + 640000
+    )
@@ -1,7 +1,17 @@
+from contextlib import contextmanager
+from unittest.mock import call, patch
+
 import pytest
 
+from eeprom import Programmer, planner
+from eeprom import programmer_commands as commands
+from eeprom import simulator
 from eeprom.arduino import Arduino
+from eeprom.baudrates import BaudCache
 from eeprom.eeprom_type import AT28C25
+from eeprom.image import Region
+from eeprom.journal import write_key
+from eeprom.programmer_commands import RangeCRC
 
 
 @pytest.fixture
@@ -72,6 +82,15 @@ def test_default_eeprom(default_programmer):
     assert isinstance(default_programmer.eeprom, AT28C25)
 
 
+def test_default_reset(default_programmer):
+    assert default_programmer.arduino.serial_connection.dtr is True
+
+
+def test_no_reset(programmer, mock_time):
+    mock_time.monotonic.return_value = 0
+    assert programmer(reset=False).arduino.serial_connection.dtr is False
+
+
 def test_disconnect(default_programmer):
     default_programmer.disconnect()
     default_programmer.arduino.serial_connection.close.assert_called_once()
@@ -231,21 +250,24 @@ def test_write_block_raises_for_invalid_response(programmer_with_invalid_respons
         )
 
 
-def test_read_sends_commands(
-    programmer_with_valid_read_block_response, assert_messages_sent
-):
-    programmer_with_valid_read_block_response.read()
+def test_read_sends_commands(programmer_with_valid_read_response, assert_messages_sent):
+    programmer_with_valid_read_response.read()
     assert_messages_sent(
-        programmer_with_valid_read_block_response,
+        programmer_with_valid_read_response,
         [
             bytes(f"T{i:04X}\n", "utf8")
             for i in range(
-                0, programmer_with_valid_read_block_response.eeprom.max_address, 16
+                0, programmer_with_valid_read_response.eeprom.max_address, 16
             )
         ],
     )
 
 
+def test_read_raises_for_short_block(programmer_with_valid_read_block_response):
+    with pytest.raises(ValueError, match="Expected 16 bytes from read at 0000"):
+        programmer_with_valid_read_block_response.read()
+
+
 def test_read_return_value(programmer_with_valid_read_response, valid_eeprom_data):
     assert programmer_with_valid_read_response.read() == valid_eeprom_data
 
@@ -270,7 +292,7 @@ def test_write_sends_command(
 
 def test_write_return_value(programmer_with_serial_ack_response, valid_eeprom_data):
     return_value = programmer_with_serial_ack_response.write(valid_eeprom_data)
-    assert return_value is None
+    assert return_value == len(valid_eeprom_data)
 
 
 def test_write_raises_for_data_below_zero(
@@ -294,3 +316,1307 @@ def test_write_raises_for_invalid_response(
 ):
     with pytest.raises(ValueError):
         programmer_with_invalid_response.write(valid_eeprom_data)
+
+
+@pytest.fixture
+def binary_read_block_data():
+    return [0xEA, 0x2F, 0xA2, 0x95, 0xB3, 0x55, 0x6B, 0x2A] * 2
+
+
+@pytest.fixture
+def binary_programmer_with_valid_read_block_response(
+    binary_programmer, binary_read_block_data
+):
+    binary_programmer.arduino.serial_connection.read.side_effect = [
+        b"\x06\x10",
+        bytes(binary_read_block_data),
+    ]
+    return binary_programmer
+
+
+@pytest.fixture
+def binary_programmer_with_frame_ack_response(binary_programmer, frame_ack):
+    binary_programmer.arduino.serial_connection.read.return_value = frame_ack
+    return binary_programmer
+
+
+def test_binary_defaults_to_false(default_programmer):
+    assert default_programmer.binary is False
+
+
+def test_binary_negotiation_sends_command(binary_programmer, assert_messages_sent):
+    assert_messages_sent(binary_programmer, [b"V\n", b"B\n", b"L\n", b"G\n"])
+
+
+def test_binary_enabled_when_acknowledged(binary_programmer):
+    assert binary_programmer.binary is True
+
+
+def test_binary_disabled_when_not_acknowledged(
+    programmer, mock_serial_connection, protocol_version_response
+):
+    mock_serial_connection.return_value.readline.side_effect = [
+        protocol_version_response,
+        b"B\n",
+    ]
+    assert programmer(binary=True).binary is False
+
+
+def test_protocol_version_zero_without_fast_paths(default_programmer):
+    assert default_programmer.protocol_version == 0
+
+
+def test_protocol_version_requested(binary_programmer):
+    assert binary_programmer.protocol_version == 1
+
+
+def test_fast_paths_disabled_for_old_protocol_version(
+    programmer, mock_serial_connection, assert_message_sent
+):
+    mock_serial_connection.return_value.readline.return_value = b"V\n"
+    old_programmer = programmer(binary=True, window=4)
+    assert old_programmer.protocol_version == 0
+    assert old_programmer.binary is False
+    assert old_programmer.credits == 0
+    assert_message_sent(old_programmer, b"V\n")
+
+
+def test_binary_read_block_sends_frame(
+    binary_programmer_with_valid_read_block_response,
+):
+    programmer = binary_programmer_with_valid_read_block_response
+    programmer.read_block(0x2A55)
+    programmer.arduino.serial_connection.write.assert_called_with(b"t\x02\x2a\x55")
+
+
+def test_binary_read_block_return_value(
+    binary_programmer_with_valid_read_block_response, binary_read_block_data
+):
+    programmer = binary_programmer_with_valid_read_block_response
+    assert programmer.read_block(0x00) == binary_read_block_data
+
+
+def test_binary_read_block_raises_for_short_block(binary_programmer):
+    binary_programmer.arduino.serial_connection.read.side_effect = [
+        b"\x06\x02",
+        b"\xea\x2f",
+    ]
+    with pytest.raises(ValueError):
+        binary_programmer.read_block(0x00)
+
+
+def test_binary_read_block_raises_for_error_status(binary_programmer):
+    binary_programmer.arduino.serial_connection.read.return_value = b"\x15\x00"
+    with pytest.raises(ValueError):
+        binary_programmer.read_block(0x00)
+
+
+def test_binary_write_block_sends_frame(binary_programmer_with_frame_ack_response):
+    programmer = binary_programmer_with_frame_ack_response
+    programmer.write_block(0x55EA, [0xEA, 0x2F, 0xA2, 0x95])
+    programmer.arduino.serial_connection.write.assert_called_with(
+        b"s\x06\x55\xea\xea\x2f\xa2\x95"
+    )
+
+
+def test_binary_write_block_return_value(binary_programmer_with_frame_ack_response):
+    programmer = binary_programmer_with_frame_ack_response
+    assert programmer.write_block(0x55EA, [0xEA, 0x2F, 0xA2, 0x95]) is None
+
+
+def test_binary_write_block_raises_for_unexpected_payload(binary_programmer):
+    binary_programmer.arduino.serial_connection.read.side_effect = [
+        b"\x06\x01",
+        b"\x00",
+    ]
+    with pytest.raises(ValueError):
+        binary_programmer.write_block(0x55EA, [0xEA, 0x2F, 0xA2, 0x95])
+
+
+def test_binary_read_return_value(
+    binary_programmer, read_frame_responses, valid_eeprom_data
+):
+    binary_programmer.arduino.serial_connection.read.side_effect = read_frame_responses(
+        valid_eeprom_data
+    )
+    assert binary_programmer.read() == valid_eeprom_data
+
+
+@pytest.fixture
+def pipelined_programmer(programmer, mock_serial_connection, protocol_version_response):
+    mock_serial_connection.return_value.readline.side_effect = [
+        protocol_version_response,
+        b"64\n",
+    ]
+    return programmer(window=4)
+
+
+def test_window_defaults_to_one(default_programmer):
+    assert default_programmer.window == 1
+    assert default_programmer.credits == 0
+
+
+def test_credits_requested_for_window(pipelined_programmer, assert_messages_sent):
+    assert_messages_sent(pipelined_programmer, [b"V\n", b"C\n"])
+    assert pipelined_programmer.credits == 64
+
+
+def test_credits_zero_when_not_supported(
+    programmer, mock_serial_connection, protocol_version_response
+):
+    mock_serial_connection.return_value.readline.side_effect = [
+        protocol_version_response,
+        b"C\n",
+    ]
+    assert programmer(window=4).credits == 0
+
+
+def test_pipeline_sends_ahead_within_window(
+    pipelined_programmer, read_serial_responses, valid_eeprom_data
+):
+    connection = pipelined_programmer.arduino.serial_connection
+    connection.readline.side_effect = read_serial_responses(valid_eeprom_data)
+    connection.reset_mock()
+    assert pipelined_programmer.read(0x00, 0x4F) == valid_eeprom_data[:0x50]
+    calls = [name for name, _, _ in connection.mock_calls]
+    assert calls == ["write"] * 4 + ["readline", "write"] + ["readline"] * 4
+
+
+def test_pipeline_limits_in_flight_bytes_to_credits(
+    programmer,
+    mock_serial_connection,
+    protocol_version_response,
+    serial_ack,
+    valid_eeprom_data,
+):
+    mock_serial_connection.return_value.readline.side_effect = [
+        protocol_version_response,
+        b"80\n",
+    ]
+    pipelined_programmer = programmer(window=4)
+    connection = pipelined_programmer.arduino.serial_connection
+    connection.readline.side_effect = [serial_ack] * 4
+    connection.reset_mock()
+    pipelined_programmer.write(valid_eeprom_data[:0x40])
+    calls = [name for name, _, _ in connection.mock_calls]
+    assert calls == ["write"] * 2 + ["readline", "write"] * 2 + ["readline"] * 2
+
+
+def test_pipeline_without_credits_waits_for_each_response(
+    default_programmer, serial_ack, valid_eeprom_data
+):
+    connection = default_programmer.arduino.serial_connection
+    connection.readline.return_value = serial_ack
+    connection.reset_mock()
+    default_programmer.write(valid_eeprom_data[:0x40])
+    calls = [name for name, _, _ in connection.mock_calls]
+    assert calls == ["write", "readline"] * 4
+
+
+def test_pipeline_discards_responses_when_closed(
+    pipelined_programmer, read_serial_responses, valid_eeprom_data
+):
+    connection = pipelined_programmer.arduino.serial_connection
+    connection.readline.side_effect = read_serial_responses(valid_eeprom_data)
+    connection.reset_mock()
+    blocks = pipelined_programmer.iter_read(0x00, 0x4F)
+    assert next(blocks) == bytes(valid_eeprom_data[:0x10])
+    blocks.close()
+    assert connection.write.call_count == 4
+    assert connection.readline.call_count == 4
+
+
+@pytest.mark.parametrize("checksums", [False, True])
+def test_pipeline_sends_page_writes_ahead(
+    sim, sim_programmer, binary_file_contents, checksums
+):
+    programmer = sim_programmer(binary=True, window=4, checksums=checksums)
+    in_flight_lengths = []
+    pipeline_response = programmer._pipeline_response
+
+    def _pipeline_response(in_flight):
+        in_flight_lengths.append(len(in_flight))
+        return pipeline_response(in_flight)
+
+    with patch.object(programmer, "_pipeline_response", _pipeline_response):
+        programmer.write(binary_file_contents)
+    assert max(in_flight_lengths) == 4
+    assert sim.overflows == 0
+    assert sim.memory == binary_file_contents
+
+
+def test_pipeline_error_names_address(
+    pipelined_programmer, read_serial_responses, valid_eeprom_data
+):
+    responses = read_serial_responses(valid_eeprom_data[:0x50])
+    responses[1] = b"ERROR\n"
+    connection = pipelined_programmer.arduino.serial_connection
+    connection.readline.side_effect = responses
+    with pytest.raises(ValueError, match="Address 0010"):
+        pipelined_programmer.read(0x00, 0x4F)
+
+
+def test_pipeline_error_drains_in_flight_responses(
+    pipelined_programmer, read_serial_responses, valid_eeprom_data
+):
+    responses = read_serial_responses(valid_eeprom_data[:0x50])
+    responses[0] = b"ERROR\n"
+    responses[2] = b"ERROR\n"
+    connection = pipelined_programmer.arduino.serial_connection
+    connection.reset_mock()
+    connection.readline.side_effect = responses
+    with pytest.raises(ValueError, match="Address 0000"):
+        pipelined_programmer.read(0x00, 0x4F)
+    assert connection.readline.call_count == 4
+
+
+@pytest.fixture
+def range_programmer(programmer, mock_serial_connection, binary_connect_responses):
+    mock_serial_connection.return_value.readline.side_effect = binary_connect_responses(
+        max_range=b"128\n"
+    )
+    return programmer(binary=True)
+
+
+@pytest.fixture
+def read_range_responses():
+    def _read_range_responses(data, size=128):
+        responses = []
+        for i in range(0, len(data), size):
+            block = bytes(data[i : i + size])
+            responses += [bytes([0x06, len(block)]), block]
+        return responses
+
+    return _read_range_responses
+
+
+def test_max_range_zero_without_binary(default_programmer):
+    assert default_programmer.max_range == 0
+
+
+def test_max_range_zero_when_not_supported(binary_programmer):
+    assert binary_programmer.max_range == 0
+
+
+def test_max_range_requested(range_programmer):
+    assert range_programmer.max_range == 128
+
+
+def test_read_range_sends_frame(range_programmer, binary_read_block_data):
+    connection = range_programmer.arduino.serial_connection
+    connection.read.side_effect = [b"\x06\x10", bytes(binary_read_block_data)]
+    assert range_programmer.read_range(0x2A55, 16) == binary_read_block_data
+    connection.write.assert_called_with(b"x\x03\x2a\x55\x10")
+
+
+def test_read_range_raises_for_short_response(range_programmer):
+    connection = range_programmer.arduino.serial_connection
+    connection.read.side_effect = [b"\x06\x02", b"\xea\x2f"]
+    with pytest.raises(ValueError):
+        range_programmer.read_range(0x2A55, 16)
+
+
+def test_read_range_rejects_length_over_max_range(range_programmer):
+    with pytest.raises(ValueError):
+        range_programmer.read_range(0x00, 129)
+
+
+def test_read_range_rejects_zero_length(range_programmer):
+    with pytest.raises(ValueError):
+        range_programmer.read_range(0x00, 0)
+
+
+def test_read_range_rejects_range_beyond_eeprom(range_programmer):
+    with pytest.raises(ValueError):
+        range_programmer.read_range(AT28C25.max_address, 2)
+
+
+def test_read_range_unavailable_without_binary(default_programmer):
+    with pytest.raises(ValueError):
+        default_programmer.read_range(0x00, 16)
+
+
+def test_write_range_sends_frame(range_programmer, frame_ack):
+    connection = range_programmer.arduino.serial_connection
+    connection.read.return_value = frame_ack
+    assert range_programmer.write_range(0x55EA, [0xEA, 0x2F, 0xA2]) is None
+    connection.write.assert_called_with(b"y\x05\x55\xea\xea\x2f\xa2")
+
+
+def test_write_range_raises_for_invalid_data(range_programmer):
+    with pytest.raises(ValueError):
+        range_programmer.write_range(0x55EA, [0xEA, 0x100])
+
+
+def test_read_uses_ranges(range_programmer, read_range_responses, valid_eeprom_data):
+    connection = range_programmer.arduino.serial_connection
+    connection.read.side_effect = read_range_responses(valid_eeprom_data)
+    connection.reset_mock()
+    assert range_programmer.read() == valid_eeprom_data
+    assert connection.write.call_count == len(valid_eeprom_data) // 128
+    connection.write.assert_called_with(b"x\x03\x7f\x80\x80")
+
+
+def test_read_with_ranges_reads_partial_final_range(
+    range_programmer, read_range_responses, valid_eeprom_data
+):
+    connection = range_programmer.arduino.serial_connection
+    connection.read.side_effect = read_range_responses(valid_eeprom_data[:0x90])
+    assert range_programmer.read(0x00, 0x8F) == valid_eeprom_data[:0x90]
+    connection.write.assert_called_with(b"x\x03\x00\x80\x10")
+
+
+def test_read_with_ranges_raises_for_short_response(range_programmer):
+    connection = range_programmer.arduino.serial_connection
+    connection.read.side_effect = [b"\x06\x02", b"\xea\x2f"]
+    with pytest.raises(ValueError):
+        range_programmer.read(0x00, 0x0F)
+
+
+def test_write_uses_ranges(range_programmer, frame_ack, valid_eeprom_data):
+    connection = range_programmer.arduino.serial_connection
+    connection.read.return_value = frame_ack
+    connection.reset_mock()
+    range_programmer.write(valid_eeprom_data[:0x100])
+    assert connection.write.call_args_list == [
+        call(b"y\x82\x00\x00" + bytes(valid_eeprom_data[:0x80])),
+        call(b"y\x82\x00\x80" + bytes(valid_eeprom_data[0x80:0x100])),
+    ]
+
+
+@pytest.fixture
+def page_programmer(programmer, mock_serial_connection, binary_connect_responses):
+    mock_serial_connection.return_value.readline.side_effect = binary_connect_responses(
+        max_range=b"128\n", max_page=b"64\n"
+    )
+    return programmer(binary=True)
+
+
+def test_max_page_zero_without_binary(default_programmer):
+    assert default_programmer.max_page == 0
+    assert default_programmer.page_writes is False
+    assert default_programmer.write_size == 16
+
+
+def test_max_page_requested(page_programmer):
+    assert page_programmer.max_page == 64
+    assert page_programmer.page_writes is True
+    assert page_programmer.write_size == 64
+
+
+def test_page_writes_unavailable_for_smaller_max_page(
+    programmer, mock_serial_connection, binary_connect_responses
+):
+    mock_serial_connection.return_value.readline.side_effect = binary_connect_responses(
+        max_range=b"128\n", max_page=b"32\n"
+    )
+    assert programmer(binary=True).page_writes is False
+
+
+def test_write_page_sends_frame(page_programmer, frame_ack):
+    connection = page_programmer.arduino.serial_connection
+    connection.read.return_value = frame_ack
+    assert page_programmer.write_page(0x0040, [0xEA, 0x2F]) is None
+    connection.write.assert_called_with(b"p\x04\x00\x40\xea\x2f")
+
+
+def test_write_page_rejects_crossing_page_boundary(page_programmer):
+    with pytest.raises(ValueError):
+        page_programmer.write_page(0x003F, [0xEA, 0x2F])
+
+
+def test_write_page_rejects_invalid_data(page_programmer):
+    with pytest.raises(ValueError):
+        page_programmer.write_page(0x0040, [0xEA, 0x100])
+
+
+def test_write_page_unavailable_without_page_writes(default_programmer):
+    with pytest.raises(ValueError):
+        default_programmer.write_page(0x0040, [0xEA, 0x2F])
+
+
+def test_write_aligns_pages(page_programmer, frame_ack, valid_eeprom_data):
+    connection = page_programmer.arduino.serial_connection
+    connection.read.return_value = frame_ack
+    connection.reset_mock()
+    page_programmer.write(valid_eeprom_data[:0x90], start_address=0x30)
+    assert connection.write.call_args_list == [
+        call(b"p\x12\x00\x30" + bytes(valid_eeprom_data[:0x10])),
+        call(b"p\x42\x00\x40" + bytes(valid_eeprom_data[0x10:0x50])),
+        call(b"p\x42\x00\x80" + bytes(valid_eeprom_data[0x50:0x90])),
+    ]
+
+
+def test_write_cycle_time_defaults_to_worst_case(default_programmer):
+    assert default_programmer.write_cycle_time == 10000
+
+
+def test_write_cycle_stats(default_programmer, set_serial_response):
+    set_serial_response(default_programmer, b"4 16000 4500 1\n")
+    stats = default_programmer.write_cycle_stats()
+    default_programmer.arduino.serial_connection.write.assert_called_with(b"M\n")
+    assert stats == (4, 16000, 4500, 1)
+    assert stats.max == 4500
+    assert default_programmer.write_cycle_time == 4000
+
+
+def test_write_cycle_stats_without_writes(default_programmer, set_serial_response):
+    set_serial_response(default_programmer, b"0 0 0 0\n")
+    assert default_programmer.write_cycle_stats().count == 0
+    assert default_programmer.write_cycle_time == 10000
+
+
+def test_write_cycle_stats_not_supported(default_programmer, set_serial_response):
+    set_serial_response(default_programmer, b"M\n")
+    assert default_programmer.write_cycle_stats() is None
+    assert default_programmer.write_cycle_time == 10000
+
+
+def test_block_hashing_needs_protocol_version_2(binary_programmer):
+    assert binary_programmer.block_hashing is False
+
+
+def test_block_hashes_not_supported(binary_programmer):
+    with pytest.raises(ValueError):
+        binary_programmer.block_hashes(0, 64, 64)
+
+
+@pytest.fixture
+def hashing_programmer(programmer, mock_serial_connection, serial_ack):
+    connection = mock_serial_connection.return_value
+    connection.readline.side_effect = [b"2\n", serial_ack, b"128\n", b"64\n"]
+    programmer = programmer(binary=True)
+    connection.reset_mock()
+    return programmer
+
+
+def test_block_hashing(hashing_programmer):
+    assert hashing_programmer.block_hashing is True
+
+
+def test_block_hashes(hashing_programmer):
+    connection = hashing_programmer.arduino.serial_connection
+    connection.read.side_effect = [b"\x06\x04", b"\x31\xc3\x00\x01"]
+    assert hashing_programmer.block_hashes(0x0100, 128, 64) == [0x31C3, 0x0001]
+    connection.write.assert_called_once_with(b"h\x05\x01\x00\x00\x40\x02")
+
+
+def test_block_hashes_splits_requests(hashing_programmer):
+    connection = hashing_programmer.arduino.serial_connection
+    connection.read.side_effect = [b"\x06\xfe", bytes(254)] + [
+        b"\x06\x02",
+        bytes(2),
+    ] * 2
+    hashes = hashing_programmer.block_hashes(0, 128 * 16 + 4, 16)
+    assert hashes == [0] * 129
+    assert connection.write.call_args_list == [
+        call(b"h\x05\x00\x00\x00\x10\x7f"),
+        call(b"h\x05\x07\xf0\x00\x10\x01"),
+        call(b"h\x05\x08\x00\x00\x04\x01"),
+    ]
+
+
+def test_block_hashes_validates_range(hashing_programmer):
+    with pytest.raises(ValueError):
+        hashing_programmer.block_hashes(0x7FC0, 128, 64)
+    assert hashing_programmer.block_hashes(0, 0, 64) == []
+
+
+@pytest.fixture
+def crc_programmer(programmer, mock_serial_connection, serial_ack):
+    connection = mock_serial_connection.return_value
+    connection.readline.side_effect = [b"3\n", serial_ack, b"128\n", b"64\n"]
+    programmer = programmer(binary=True)
+    connection.reset_mock()
+    return programmer
+
+
+def test_crc_checking(crc_programmer, hashing_programmer):
+    assert crc_programmer.crc_checking is True
+    assert hashing_programmer.crc_checking is False
+
+
+def test_range_crc(crc_programmer):
+    connection = crc_programmer.arduino.serial_connection
+    connection.read.side_effect = [b"\x06\x04", b"\xcb\xf4\x39\x26"]
+    assert crc_programmer.range_crc(0x0100, 0x0200) == 0xCBF43926
+    connection.write.assert_called_once_with(b"k\x04\x01\x00\x02\x00")
+
+
+def test_range_crc_of_empty_range(crc_programmer):
+    connection = crc_programmer.arduino.serial_connection
+    connection.reset_mock()
+    assert crc_programmer.range_crc(0x0100, 0) == 0
+    connection.write.assert_not_called()
+
+
+def test_range_crc_not_supported(hashing_programmer):
+    with pytest.raises(ValueError):
+        hashing_programmer.range_crc(0, 64)
+
+
+def test_range_crc_validates_range(crc_programmer):
+    with pytest.raises(ValueError):
+        crc_programmer.range_crc(0x7FC0, 128)
+    with pytest.raises(ValueError):
+        crc_programmer.range_crc(0, 0x10000)
+
+
+def test_differing_ranges_matching(crc_programmer):
+    data = list(range(256)) * 2
+    connection = crc_programmer.arduino.serial_connection
+    crc = RangeCRC.hash(data).to_bytes(4, "big")
+    connection.read.side_effect = [b"\x06\x04", crc]
+    assert crc_programmer.differing_ranges(data, start_address=0x1000) == []
+    connection.write.assert_called_once_with(b"k\x04\x10\x00\x02\x00")
+
+
+def test_differing_ranges_bisects(crc_programmer):
+    data = list(range(256))
+    connection = crc_programmer.arduino.serial_connection
+
+    def frame(chunk):
+        return [b"\x06\x04", RangeCRC.hash(chunk).to_bytes(4, "big")]
+
+    connection.read.side_effect = (
+        frame([]) + frame(data[:128]) + frame([]) + frame(data[128:192]) + frame([])
+    )
+    assert crc_programmer.differing_ranges(data, block_size=64) == [(192, 256)]
+    assert connection.write.call_args_list == [
+        call(b"k\x04\x00\x00\x01\x00"),
+        call(b"k\x04\x00\x00\x00\x80"),
+        call(b"k\x04\x00\x80\x00\x80"),
+        call(b"k\x04\x00\x80\x00\x40"),
+        call(b"k\x04\x00\xc0\x00\x40"),
+    ]
+
+
+def test_differing_ranges_empty_data(crc_programmer):
+    assert crc_programmer.differing_ranges([]) == []
+
+
+def test_known_contents_without_shadow_cache(sim_programmer):
+    programmer = sim_programmer(binary=True)
+    assert programmer.known_contents() is None
+
+
+def test_known_contents_after_write(sim_programmer, tmp_path):
+    data = list(range(256)) * 128
+    programmer = sim_programmer(binary=True, shadow_cache=tmp_path)
+    programmer.write(data)
+    programmer.write_byte(0x0010, 0xEA)
+    data[0x0010] = 0xEA
+    assert programmer.known_contents() == bytearray(data)
+
+
+def test_known_contents_from_shadow_cache(sim, sim_programmer, tmp_path):
+    data = list(range(256)) * 128
+    sim_programmer(binary=True, shadow_cache=tmp_path).write(data)
+    programmer = sim_programmer(binary=True, shadow_cache=tmp_path)
+    bytes_sent = sim.bytes_sent
+    assert programmer.known_contents() == bytearray(data)
+    assert sim.bytes_sent - bytes_sent < 1024
+
+
+def test_known_contents_of_changed_eeprom(sim, sim_programmer, tmp_path):
+    sim_programmer(binary=True, shadow_cache=tmp_path).read()
+    sim.memory[0x2A55] ^= 0xFF
+    programmer = sim_programmer(binary=True, shadow_cache=tmp_path)
+    assert programmer.known_contents() is None
+
+
+def test_known_contents_without_crc_checking(sim_programmer, tmp_path):
+    sim_programmer(shadow_cache=tmp_path).read()
+    assert sim_programmer(shadow_cache=tmp_path).known_contents() is None
+
+
+def test_remember_contents_of_part_of_eeprom(sim_programmer):
+    programmer = sim_programmer(binary=True)
+    programmer.write([0xEA] * 64, start_address=0x0040)
+    assert programmer.known_contents() is None
+
+
+def test_write_regions_saves_contents_once(sim_programmer, tmp_path):
+    programmer = sim_programmer(binary=True, shadow_cache=tmp_path)
+    programmer.read()
+    regions = [Region(address, b"\xea") for address in range(0x10, 0x400, 0x20)]
+    with patch.object(
+        programmer.shadow_cache, "save", wraps=programmer.shadow_cache.save
+    ) as save:
+        programmer.write_regions(regions)
+    save.assert_called_once()
+
+
+def test_read_saves_changed_contents_once(sim, sim_programmer, tmp_path):
+    programmer = sim_programmer(binary=True, shadow_cache=tmp_path)
+    programmer.read()
+    sim.memory[0x0000:0x8000:0x0400] = b"\xea" * 0x20
+    with patch.object(
+        programmer.shadow_cache, "save", wraps=programmer.shadow_cache.save
+    ) as save:
+        programmer.read()
+        programmer.read()
+    save.assert_called_once()
+    assert programmer.known_contents() == sim.memory
+
+
+def test_forgotten_contents_not_saved(sim_programmer, tmp_path):
+    programmer = sim_programmer(binary=True, shadow_cache=tmp_path)
+    programmer.remember_contents(bytes(0x8000), save=False)
+    with patch.object(programmer, "pipeline", side_effect=ValueError):
+        with pytest.raises(ValueError):
+            programmer.write([0xEA] * 0x0200)
+    with patch.object(programmer.shadow_cache, "save") as save:
+        programmer.save_contents()
+    save.assert_not_called()
+
+
+def test_failed_write_forgets_contents(sim_programmer):
+    programmer = sim_programmer(binary=True)
+    programmer.read()
+    with patch.object(programmer, "pipeline", side_effect=ValueError):
+        with pytest.raises(ValueError):
+            programmer.write([0xEA] * 0x0200)
+    assert programmer.known_contents() is None
+
+
+@pytest.mark.parametrize("options", [{}, {"binary": True}])
+def test_read_bytes(sim, sim_programmer, options):
+    sim.memory[0x0100:0x0400] = bytes(range(256)) * 3
+    data = sim_programmer(**options).read_bytes(0x0100, 0x03FF)
+    assert isinstance(data, bytearray)
+    assert data == bytes(range(256)) * 3
+
+
+@pytest.mark.parametrize("options", [{}, {"binary": True}])
+def test_read_into_fills_buffer_in_place(sim, sim_programmer, options):
+    sim.memory[0x0100:0x0200] = bytes(range(256))
+    buffer = bytearray(0x0110)
+    view = memoryview(buffer)[0x10:]
+    assert sim_programmer(**options).read_into(view, start_address=0x0105) == 0x0100
+    assert buffer == bytes(0x10) + bytes(range(5, 256)) + b"\xff" * 5
+
+
+def test_read_into_empty_buffer(sim, sim_programmer):
+    assert sim_programmer().read_into(bytearray()) == 0
+    assert sim.bytes_recieved == 0
+
+
+def test_iter_read_yields_blocks_as_they_arrive(
+    range_programmer, read_range_responses, valid_eeprom_data
+):
+    connection = range_programmer.arduino.serial_connection
+    connection.reset_mock()
+    connection.read.side_effect = read_range_responses(valid_eeprom_data[:0x0180])
+    blocks = range_programmer.iter_read(0x0000, 0x017F)
+    assert next(blocks) == bytes(valid_eeprom_data[:0x80])
+    assert connection.write.call_count == 1
+    assert list(blocks) == [
+        bytes(valid_eeprom_data[0x80:0x0100]),
+        bytes(valid_eeprom_data[0x0100:0x0180]),
+    ]
+
+
+def test_iter_read_validates_range_before_reading(default_programmer):
+    with pytest.raises(ValueError):
+        default_programmer.iter_read(0x0000, 0x8000)
+    default_programmer.arduino.serial_connection.write.assert_not_called()
+
+
+@pytest.mark.parametrize("options", [{}, {"binary": True}])
+def test_write_stream(sim, sim_programmer, options):
+    data = bytes(range(256)) * 4
+    chunks = [data[i : i + 100] for i in range(0, len(data), 100)]
+    programmer = sim_programmer(**options)
+    assert programmer.write_stream(iter(chunks), start_address=0x0120) == len(data)
+    assert sim.memory[0x0120 : 0x0120 + len(data)] == data
+
+
+def test_write_stream_writes_as_data_arrives(sim, sim_programmer):
+    programmer = sim_programmer(binary=True)
+
+    def chunks():
+        yield bytes(range(64)) * 2
+        assert sim.memory[:0x80] == bytes(range(64)) * 2
+        yield b"\xea" * 10
+
+    programmer.write_stream(chunks())
+    assert sim.memory[0x80:0x8A] == b"\xea" * 10
+
+
+def test_write_stream_records_contents(sim_programmer):
+    programmer = sim_programmer(binary=True)
+    data = bytes(range(256)) * 128
+    programmer.write_stream([data[:1000], data[1000:]])
+    assert programmer.known_contents() == data
+
+
+def test_write_stream_past_end_of_eeprom(sim, sim_programmer):
+    programmer = sim_programmer(binary=True)
+    programmer.read()
+    with pytest.raises(ValueError):
+        programmer.write_stream([b"\xea" * 0x80], start_address=0x7FC0)
+    assert sim.memory[0x7FC0:] == b"\xea" * 0x40
+    assert programmer.known_contents() is None
+    assert programmer.read_byte(0x7FFF) == 0xEA
+
+
+def test_write_commands_ascii(sim_programmer):
+    assert list(sim_programmer().write_commands) == ["write_byte", "write_block"]
+
+
+def test_write_commands_binary(sim_programmer):
+    write_commands = sim_programmer(binary=True).write_commands
+    assert write_commands["write_block"] == (commands.WriteBlockBinary, 1, 16)
+    assert write_commands["write_range"] == (commands.WriteRange, 1, 128)
+    assert write_commands["write_page"] == (commands.WritePage, 1, 64)
+
+
+def test_cost_model_uses_write_cycle_time(sim_programmer):
+    programmer = sim_programmer()
+    programmer.write_cycle_time = 3000
+    assert programmer.cost_model.cost(commands.WriteByte, 1) == pytest.approx(
+        13 * 10 * 1000000 / 115200 + 3000
+    )
+
+
+@pytest.mark.parametrize("options", [{}, {"binary": True}])
+def test_plan_writes_and_write_plan(sim, sim_programmer, options):
+    data = bytes(range(256)) * 4
+    sim.memory[: len(data)] = data
+    new_data = bytearray(data)
+    new_data[0x50] ^= 0xFF
+    new_data[0x0100:0x0180] = bytes(0x80)
+    programmer = sim_programmer(**options)
+    runs = planner.changed_runs(new_data, data)
+    plan = programmer.plan_writes(runs, start_address=0, end_address=len(new_data))
+    programmer.write_plan(new_data, plan.writes, start_address=0)
+    assert sim.memory[: len(new_data)] == new_data
+    assert sim.bytes_recieved < 400
+    assert plan.cost > 0
+
+
+def test_write_plan_updates_known_contents(sim_programmer):
+    programmer = sim_programmer(binary=True)
+    programmer.read()
+    new_data = bytearray(b"\xff" * 0x40)
+    new_data[0x10:0x12] = b"\xea\xea"
+    plan = programmer.plan_writes([(0x10, 0x12)], start_address=0, end_address=0x40)
+    programmer.write_plan(new_data, plan.writes)
+    assert programmer.known_contents()[:0x40] == new_data
+
+
+def test_write_plan_forgets_contents_on_failure(sim_programmer):
+    programmer = sim_programmer(binary=True)
+    programmer.read()
+    with patch.object(programmer, "pipeline", side_effect=ValueError):
+        with pytest.raises(ValueError):
+            programmer.write_plan(b"\xea", [("write_byte", 0, 1)])
+    assert programmer.known_contents() is None
+
+
+@pytest.mark.parametrize(
+    "write,message",
+    [
+        (("write_page", 0x00, 1), "not available"),
+        (("write_block", 0x00, 8), "only 16 - 16"),
+        (("write_byte", 0x40, 1), "outside the data"),
+    ],
+)
+def test_write_plan_validates_writes(sim, sim_programmer, write, message):
+    with pytest.raises(ValueError, match=message):
+        sim_programmer().write_plan(bytes(0x40), [write])
+    assert sim.bytes_recieved == 0
+
+
+def test_write_plan_validates_pages(sim_programmer):
+    with pytest.raises(ValueError, match="crosses a page boundary"):
+        sim_programmer(binary=True).write_plan(
+            bytes(0x80), [("write_page", 0x30, 0x20)]
+        )
+
+
+def test_write_plan_validates_data(sim_programmer):
+    with pytest.raises(ValueError):
+        sim_programmer().write_plan([0x100], [("write_byte", 0, 1)])
+
+
+@pytest.fixture
+def sparse_image():
+    image = bytearray(b"\xff" * 0x8000)
+    image[0x0000:0x0100] = bytes(range(256))
+    image[0x7FFA:0x8000] = b"\x00\x80\x00\x80\x00\x80"
+    return image
+
+
+@pytest.mark.parametrize("options", [{}, {"binary": True}])
+def test_write_skip_fill(sim, sim_programmer, sparse_image, options):
+    programmer = sim_programmer(**options)
+    assert programmer.write(sparse_image, skip_fill=0xFF) < 0x0200
+    assert sim.memory == sparse_image
+    assert sim.write_cycle_count < 0x0200
+
+
+def test_write_skip_fill_records_contents(sim_programmer, sparse_image):
+    programmer = sim_programmer(binary=True)
+    programmer.write(sparse_image, skip_fill=0xFF)
+    assert programmer.known_contents() == sparse_image
+
+
+def test_write_skip_fill_writes_everything_unless_blank(
+    sim, sim_programmer, sparse_image
+):
+    sim.memory[0x4000] = 0x00
+    programmer = sim_programmer(binary=True)
+    assert programmer.write(sparse_image, skip_fill=0xFF) == 0x8000
+    assert sim.memory == sparse_image
+
+
+def test_write_skip_fill_of_only_fill(sim, sim_programmer):
+    assert sim_programmer(binary=True).write(b"\xff" * 0x40, skip_fill=0xFF) == 0
+    assert sim.write_cycle_count == 0
+
+
+def test_write_skip_fill_validates_fill(sim_programmer):
+    with pytest.raises(ValueError):
+        sim_programmer().write(b"\xff", skip_fill=0x100)
+
+
+def test_write_returns_bytes_written(sim_programmer):
+    assert sim_programmer().write(b"\xea" * 20, start_address=0x20) == 20
+
+
+@pytest.mark.parametrize("options", [{}, {"binary": True}])
+def test_is_blank(sim, sim_programmer, options):
+    sim.memory[0x20] = 0x00
+    programmer = sim_programmer(**options)
+    assert programmer.is_blank() is False
+    assert programmer.is_blank(0x21, 0x40) is True
+    assert programmer.is_blank(0x10, 0x20, fill=0x00) is False
+
+
+def test_is_blank_uses_crc(sim, sim_programmer):
+    programmer = sim_programmer(binary=True)
+    bytes_sent = sim.bytes_sent
+    assert programmer.is_blank() is True
+    assert sim.bytes_sent - bytes_sent < 16
+
+
+def test_is_blank_uses_known_contents(sim, sim_programmer):
+    programmer = sim_programmer()
+    programmer.write(b"\x00" * 0x8000)
+    bytes_recieved = sim.bytes_recieved
+    assert programmer.is_blank(0x10, 0x1F, fill=0x00) is True
+    assert programmer.is_blank(fill=0xFF) is False
+    assert sim.bytes_recieved == bytes_recieved
+
+
+@pytest.mark.parametrize(
+    "options,write_cycles", [({}, 22), ({"binary": True, "window": 4}, 2)]
+)
+def test_write_regions(sim, sim_programmer, options, write_cycles):
+    regions = [Region(0x10, b"\xea" * 20), Region(0x7FFE, b"\x2f\x2f")]
+    assert sim_programmer(**options).write_regions(regions) == 22
+    assert sim.memory[0x0F:0x25] == b"\xff" + b"\xea" * 20 + b"\xff"
+    assert sim.memory[0x7FFE:] == b"\x2f\x2f"
+    assert sim.write_cycle_count == write_cycles
+
+
+def test_write_regions_records_contents(sim_programmer):
+    programmer = sim_programmer(binary=True)
+    programmer.read()
+    programmer.write_regions([Region(0x10, b"\xea"), Region(0x20, b"\x2f")])
+    assert programmer.known_contents()[0x10:0x21] == b"\xea" + b"\xff" * 15 + b"\x2f"
+
+
+def test_write_regions_skip_fill(sim, sim_programmer):
+    regions = [Region(0x10, b"\xff\xea\xff"), Region(0x7FFE, b"\x2f\xff")]
+    programmer = sim_programmer(binary=True)
+    assert programmer.write_regions(regions, skip_fill=0xFF) == 2
+    assert sim.memory[0x10:0x13] == b"\xff\xea\xff"
+    assert sim.memory[0x7FFE:] == b"\x2f\xff"
+
+
+def test_write_regions_validates_before_writing(sim, sim_programmer):
+    regions = [Region(0x10, b"\xea"), Region(0x7FFF, b"\x2f\x2f")]
+    with pytest.raises(ValueError):
+        sim_programmer().write_regions(regions)
+    assert sim.bytes_recieved == 0
+
+
+def test_write_regions_forgets_contents_on_failure(sim_programmer):
+    programmer = sim_programmer(binary=True)
+    programmer.read()
+    with patch.object(programmer, "pipeline", side_effect=ValueError):
+        with pytest.raises(ValueError):
+            programmer.write_regions([Region(0x10, b"\xea")])
+    assert programmer.known_contents() is None
+
+
+def test_write_stream_validates_start_address(sim_programmer):
+    with pytest.raises(ValueError):
+        sim_programmer().write_stream([b"\xea"], start_address=-0x10)
+
+
+def test_compression(sim_programmer):
+    assert sim_programmer(binary=True, compress=True).compression is True
+    assert sim_programmer(binary=True).compression is False
+    assert sim_programmer(compress=True).compression is False
+    with patch.object(simulator.Simulator, "PROTOCOL_VERSION", 3):
+        assert sim_programmer(binary=True, compress=True).compression is False
+
+
+@pytest.mark.parametrize("window", [1, 4])
+def test_compressed_read(sim, sim_programmer, window):
+    sim.memory[:0x0100] = bytes(range(256))
+    programmer = sim_programmer(binary=True, window=window, compress=True)
+    assert programmer.read_bytes() == sim.memory
+    assert programmer.compression_stats.data_bytes == 0x8000
+    assert programmer.compression_stats.encoded_bytes == 2 * 129 + 254 * 2
+    assert sim.bytes_sent < 0x0600
+
+
+@pytest.mark.parametrize("page_size", [64, 0])
+def test_compressed_write(sim, sim_programmer, binary_file_contents, page_size):
+    data = bytes(0x0100) + binary_file_contents[:0x0F00]
+    sim.max_page = page_size
+    programmer = sim_programmer(binary=True, window=4, compress=True)
+    programmer.write(data)
+    assert sim.memory[: len(data)] == data
+    assert programmer.compression_stats.data_bytes == len(data)
+    assert programmer.compression_stats.ratio > 1
+
+
+def test_compressed_range_and_page_commands(sim, sim_programmer):
+    programmer = sim_programmer(binary=True, compress=True)
+    programmer.write_range(0x10, [0xEA] * 32)
+    programmer.write_page(0x40, [0x2F] * 64)
+    assert programmer.read_range(0x10, 32) == [0xEA] * 32
+    assert sim.memory[0x40:0x80] == b"\x2f" * 64
+    assert programmer.compression_stats == (128, 6)
+
+
+def test_compressed_write_plan(sim, sim_programmer):
+    programmer = sim_programmer(binary=True, compress=True)
+    plan = programmer.plan_writes([(0x40, 0x80)])
+    assert plan.writes == [planner.PlannedWrite("write_page", 0x40, 64)]
+    programmer.write_plan(bytes(64), plan.writes, start_address=0x40)
+    assert sim.memory[0x40:0x80] == bytes(64)
+    assert programmer.compression_stats == (64, 2)
+
+
+@pytest.fixture
+def fast_baud_fallback():
+    with patch.object(Programmer, "BAUD_CONFIRM_TIMEOUT", 0):
+        yield
+
+
+def test_negotiate_baud(sim, sim_programmer):
+    sim.max_baud = 1000000
+    programmer = sim_programmer(baud_rates=[500000, 1000000])
+    assert programmer.arduino.baud == 1000000
+    assert sim.firmware_baud == 1000000
+    assert programmer.read_byte(0x10) == 0xFF
+
+
+def test_negotiate_baud_falls_back(sim, sim_programmer, fast_baud_fallback):
+    sim.max_baud = 1000000
+    programmer = sim_programmer(binary=True, baud_rates=[2000000, 1000000, 57600])
+    assert programmer.arduino.baud == 1000000
+    assert programmer.binary is True
+
+
+def test_negotiate_baud_keeps_rate_if_none_work(
+    sim, sim_programmer, fast_baud_fallback
+):
+    sim.max_baud = 115200
+    programmer = sim_programmer(baud_rates=[2000000, 1000000])
+    assert programmer.arduino.baud == 115200
+    assert programmer.read_byte(0x10) == 0xFF
+
+
+def test_negotiate_baud_not_supported(sim_programmer):
+    with patch.object(simulator.Simulator, "PROTOCOL_VERSION", 4):
+        programmer = sim_programmer(baud_rates=[1000000])
+        assert programmer.arduino.baud == 115200
+        with pytest.raises(ValueError, match="not supported"):
+            programmer.negotiate_baud([1000000])
+
+
+def test_negotiate_baud_remembers_rate(sim, sim_url, sim_programmer, tmp_path):
+    path = tmp_path / "baud.json"
+    sim.max_baud = 1000000
+    with patch.object(Programmer, "BAUD_CONFIRM_TIMEOUT", 0):
+        sim_programmer(baud_rates=[2000000, 1000000], baud_cache=path)
+    assert BaudCache(path).get(sim_url) == 1000000
+    with patch.object(Programmer, "_switch_baud", return_value=True) as switch_baud:
+        sim_programmer(baud_rates=[2000000, 1000000], baud_cache=path)
+    switch_baud.assert_called_once_with(1000000)
+
+
+def test_reconnect_without_reset_after_baud_negotiation(sim, sim_programmer):
+    programmer = sim_programmer(baud_rates=[1000000, 500000])
+    assert programmer.arduino.baud == 1000000
+    programmer.disconnect()
+    assert sim.firmware_baud == 115200
+    programmer = sim_programmer(reset=False)
+    assert programmer.read_byte(0x10) == 0xFF
+
+
+def test_reconnect_without_reset_at_remembered_baud(sim, sim_programmer, tmp_path):
+    path = tmp_path / "baud.json"
+    sim_programmer(baud_rates=[1000000], baud_cache=path)
+    programmer = sim_programmer(reset=False, baud_cache=path)
+    assert programmer.arduino.baud == 1000000
+    assert programmer.read_byte(0x10) == 0xFF
+    programmer.disconnect()
+    programmer = sim_programmer(reset=False, baud_cache=path)
+    assert programmer.arduino.baud == 115200
+    assert programmer.read_byte(0x10) == 0xFF
+
+
+def test_disconnect_closes_port_if_baud_not_restored(sim, sim_programmer):
+    programmer = sim_programmer(baud_rates=[1000000])
+    with patch.object(Programmer, "_switch_baud", side_effect=ValueError("gone")):
+        with pytest.raises(ValueError, match="gone"):
+            programmer.disconnect()
+    assert not programmer.arduino.serial_connection.is_open
+
+
+def test_set_baud_rejected(default_programmer, set_serial_response):
+    default_programmer.protocol_version = Programmer.BAUD_VERSION
+    set_serial_response(default_programmer, b"U\n")
+    with pytest.raises(ValueError, match="set_baud got unexpected response: U"):
+        default_programmer.negotiate_baud([1000000])
+
+
+def test_checksums(sim, sim_programmer):
+    programmer = sim_programmer(binary=True, checksums=True)
+    assert programmer.frame_checking
+    assert sim.frame_checking
+    assert programmer.arduino.serial_connection.timeout == Programmer.FRAME_TIMEOUT
+    assert programmer.read_range(0x10, 4) == [0xFF] * 4
+
+
+def test_checksums_not_supported(sim, sim_programmer):
+    with patch.object(simulator.Simulator, "PROTOCOL_VERSION", 5):
+        programmer = sim_programmer(binary=True, checksums=True)
+    assert not programmer.frame_checking
+    assert not sim.frame_checking
+
+
+@pytest.mark.parametrize("fault", ["corrupt", "drop", "corrupt_requests"])
+@pytest.mark.parametrize("window", [1, 4])
+def test_checked_read_recovers_damaged_frames(
+    sim, sim_programmer, binary_file_contents, fault, window
+):
+    sim.memory[:] = binary_file_contents
+    programmer = sim_programmer(
+        binary=True, window=window, checksums=True, max_retries=10
+    )
+    setattr(sim, fault, 0.002)
+    sim.random.seed(1)
+    assert programmer.read_bytes() == binary_file_contents
+    assert programmer.frame_retries > 0
+
+
+@pytest.mark.parametrize("fault", ["corrupt", "drop", "corrupt_requests"])
+def test_checked_write_recovers_damaged_frames(
+    sim, sim_programmer, binary_file_contents, fault
+):
+    programmer = sim_programmer(binary=True, window=4, checksums=True, max_retries=10)
+    setattr(sim, fault, 0.002)
+    sim.random.seed(1)
+    programmer.write(binary_file_contents)
+    assert sim.memory == binary_file_contents
+    assert programmer.frame_retries > 0
+
+
+def test_resend_while_programmer_busy_longer_than_ping_timeout(
+    sim, sim_programmer, binary_file_contents
+):
+    sim.write_cycle_time = Arduino.PING_TIMEOUT
+    programmer = sim_programmer(binary=True, window=4, checksums=True)
+    recieve_checked_frame = commands.BinaryCommand.recieve_checked_frame.__func__
+    damaged = []
+
+    def damage_first_frame(cls, programmer):
+        if not damaged:
+            damaged.append(cls)
+            raise commands.FrameError("damaged")
+        return recieve_checked_frame(cls, programmer)
+
+    with patch.object(
+        commands.BinaryCommand,
+        "recieve_checked_frame",
+        classmethod(damage_first_frame),
+    ):
+        programmer.write(binary_file_contents[:0x200], start_address=0)
+    assert programmer.frame_retries == 1
+    assert sim.memory[:0x200] == binary_file_contents[:0x200]
+
+
+def test_damaged_frame_code_not_taken_for_text_command(sim, sim_programmer):
+    programmer = sim_programmer(binary=True, checksums=True)
+    send_bytes = programmer.arduino.serial_send_bytes
+    damaged = []
+
+    def damage_code(data):
+        if not damaged and data[:1] == b"s":
+            damaged.append(data)
+            data = bytes([data[0] ^ 0x20]) + data[1:]
+        send_bytes(data)
+
+    with patch.object(programmer.arduino, "serial_send_bytes", damage_code):
+        programmer.write_block(0x10, [0xEA] * 16)
+    assert damaged
+    assert programmer.frame_retries == 1
+    assert sim.memory[:0x10] == bytes([0xFF] * 0x10)
+    assert sim.memory[0x10:0x20] == bytes([0xEA] * 0x10)
+
+
+def test_checked_byte_commands_use_frames(sim, sim_programmer):
+    programmer = sim_programmer(binary=True, checksums=True)
+    programmer.write_byte(0x10, 0xEA)
+    assert sim.memory[0x10] == 0xEA
+    assert programmer.read_byte(0x10) == 0xEA
+    assert "write_byte" not in programmer.write_commands
+
+
+def test_checked_frame_retries_are_limited(sim_programmer):
+    programmer = sim_programmer(binary=True, checksums=True, max_retries=2)
+    with patch.object(
+        commands.BinaryCommand,
+        "recieve_checked_frame",
+        side_effect=commands.FrameError("damaged"),
+    ):
+        with pytest.raises(ValueError, match="Address 0010: damaged"):
+            programmer.read_range(0x10, 4)
+    assert programmer.frame_retries == 2
+    assert programmer.read_range(0x20, 2) == [0xFF] * 2
+
+
+def test_checked_frame_rejected_without_retry(sim_programmer):
+    programmer = sim_programmer(binary=True, checksums=True)
+    with pytest.raises(ValueError, match="unexpected response status: 15"):
+        list(programmer.pipeline([(commands.ReadRange, 0, (0, 0))]))
+    assert programmer.frame_retries == 0
+
+
+def test_checked_compressed_write_counts_encoded_bytes(sim, sim_programmer):
+    programmer = sim_programmer(binary=True, compress=True, checksums=True)
+    programmer.write_page(0x40, [0x00] * 64)
+    assert programmer.compression_stats == (64, 2)
+    assert sim.memory[0x40:0x80] == bytes(64)
+
+
+@contextmanager
+def interrupted_after(programmer, writes):
+    record = programmer.journal.record
+    recorded = []
+
+    def _record(*args):
+        record(*args)
+        recorded.append(args)
+        if len(recorded) == writes:
+            raise ValueError("Interrupted")
+
+    with patch.object(programmer.journal, "record", _record):
+        yield
+
+
+@pytest.fixture
+def journal_path(tmp_path):
+    return tmp_path / "journal.json"
+
+
+@pytest.mark.parametrize("options", [{}, {"binary": True, "window": 4}])
+def test_write_records_progress_in_journal(
+    sim_url, sim_programmer, binary_file_contents, journal_path, options
+):
+    programmer = sim_programmer(journal=journal_path, **options)
+    with interrupted_after(programmer, 10):
+        with pytest.raises(ValueError, match="Interrupted"):
+            programmer.write(binary_file_contents)
+    key = write_key(sim_url, 0, binary_file_contents)
+    assert programmer.journal.completed(key) == [(0, 10 * programmer.write_size)]
+    assert programmer.resume_address(binary_file_contents) == 10 * programmer.write_size
+
+
+def test_write_resumes_from_journal(
+    sim, sim_programmer, binary_file_contents, journal_path
+):
+    programmer = sim_programmer(binary=True, journal=journal_path)
+    with interrupted_after(programmer, 10):
+        with pytest.raises(ValueError):
+            programmer.write(binary_file_contents)
+    written = 10 * programmer.write_size
+    write_cycle_count = sim.write_cycle_count
+    assert programmer.write(binary_file_contents, resume=True) == 0x8000 - written
+    assert sim.memory == binary_file_contents
+    assert sim.write_cycle_count - write_cycle_count == (0x8000 - written) // 64
+    assert programmer.journal.load() == {}
+
+
+def test_write_removes_journal_entry(sim_programmer, journal_path):
+    programmer = sim_programmer(journal=journal_path)
+    assert programmer.write(b"\xea" * 20, start_address=0x20, resume=True) == 20
+    assert programmer.journal.load() == {}
+
+
+def test_resume_checks_boundary(
+    sim, sim_programmer, binary_file_contents, journal_path
+):
+    programmer = sim_programmer(binary=True, journal=journal_path)
+    with interrupted_after(programmer, 10):
+        with pytest.raises(ValueError):
+            programmer.write(binary_file_contents)
+    sim.memory[10 * programmer.write_size - 1] ^= 0xFF
+    assert programmer.resume_address(binary_file_contents) == 0
+    assert programmer.write(binary_file_contents, resume=True) == 0x8000
+    assert sim.memory == binary_file_contents
+
+
+def test_resume_of_other_data(
+    sim_url, sim_programmer, binary_file_contents, journal_path
+):
+    programmer = sim_programmer(journal=journal_path)
+    with interrupted_after(programmer, 2):
+        with pytest.raises(ValueError):
+            programmer.write(binary_file_contents)
+    assert programmer.resume_address(binary_file_contents, start_address=0x10) == 0x10
+    assert programmer.resume_address(binary_file_contents[:0x10]) == 0
+    key = write_key(sim_url, 0x20, binary_file_contents)
+    programmer.journal.record(key, 0x40, 0x80)
+    assert programmer.resume_address(binary_file_contents, start_address=0x20) == 0x20
+
+
+def test_resume_without_journal(sim_programmer, binary_file_contents):
+    programmer = sim_programmer()
+    assert programmer.resume_address(binary_file_contents) == 0
+    assert programmer.write(b"\xea" * 20, start_address=0x20, resume=True) == 20
+
+
+def test_write_skip_fill_resumes(sim, sim_programmer, sparse_image, journal_path):
+    programmer = sim_programmer(binary=True, journal=journal_path)
+    with interrupted_after(programmer, 1):
+        with pytest.raises(ValueError):
+            programmer.write(sparse_image, skip_fill=0xFF)
+    written = programmer.write(sparse_image, skip_fill=0xFF, resume=True)
+    assert written == 0xFF - 0x40 + 6
+    assert sim.memory == sparse_image
+    assert programmer.journal.load() == {}
+
+
+def test_write_regions_resumes(sim, sim_programmer, journal_path):
+    regions = [Region(0x10, b"\xea" * 0x40), Region(0x7FF0, b"\x2f" * 0x10)]
+    programmer = sim_programmer(binary=True, journal=journal_path)
+    with interrupted_after(programmer, 1):
+        with pytest.raises(ValueError):
+            programmer.write_regions(regions)
+    assert programmer.known_contents() is None
+    assert programmer.write_regions(regions, resume=True) == 0x20
+    assert sim.memory[0x10:0x50] == b"\xea" * 0x40
+    assert sim.memory[0x7FF0:] == b"\x2f" * 0x10
+    assert programmer.journal.load() == {}
+    assert programmer.write_regions(regions, resume=True) == 0x50
@@ -1,9 +1,46 @@
 import pytest
 
-from eeprom.programmer_commands import ProgrammerCommand
+from eeprom.programmer_commands import (
+    BlockHashes,
+    ProgrammerCommand,
+    RangeCRC,
+    ReadRangeEncoded,
+    WritePageEncoded,
+)
 
 
 def test_base_programmer_command_raises_not_implemented():
     programmer_command = ProgrammerCommand()
     with pytest.raises(NotImplementedError):
         programmer_command.format_arguments(None)
+
+
+def test_block_hashes_hash_matches_crc16_xmodem():
+    assert BlockHashes.hash(b"123456789") == 0x31C3
+    assert BlockHashes.hash([]) == 0
+
+
+def test_block_hashes_raises_for_odd_response():
+    with pytest.raises(ValueError):
+        BlockHashes.process_response(b"\x00\x01\x02")
+
+
+def test_range_crc_hash_matches_crc32():
+    assert RangeCRC.hash(b"123456789") == 0xCBF43926
+
+
+def test_range_crc_raises_for_short_response():
+    with pytest.raises(ValueError):
+        RangeCRC.process_response(b"\x00\x01\x02")
+
+
+def test_read_range_encoded_raises_for_invalid_encoding():
+    with pytest.raises(ValueError, match="read_range got unexpected response: fe"):
+        ReadRangeEncoded.process_response(b"\xfe")
+
+
+def test_write_page_encoded_request():
+    assert (
+        WritePageEncoded.format_request(0x0040, b"\xff" * 64)
+        == b"q\x04\x00\x40\xc1\xff"
+    )
@@ -0,0 +1,54 @@
+import pytest
+
+from eeprom import rle
+from eeprom.rle import CompressionStats
+
+
+@pytest.mark.parametrize(
+    "data,encoded",
+    [
+        (b"", b""),
+        (b"\xff" * 128, b"\x81\xff"),
+        (b"\xff" * 130, b"\x81\xff\x01\xff\xff"),
+        (b"\x01\x02\x03", b"\x02\x01\x02\x03"),
+        (b"\x01\x01\x02", b"\x02\x01\x01\x02"),
+        (b"\x01\x02\x00\x00\x00\x03", b"\x01\x01\x02\xfe\x00\x00\x03"),
+        (bytes(range(130)), b"\x7f" + bytes(range(128)) + b"\x01\x80\x81"),
+    ],
+)
+def test_encode(data, encoded):
+    assert rle.encode(data) == encoded
+    assert rle.decode(encoded) == data
+
+
+def test_encode_round_trip(binary_file_contents):
+    assert rle.decode(rle.encode(binary_file_contents)) == binary_file_contents
+
+
+def test_encoding_grows_by_at_most_one_byte_in_128():
+    assert len(rle.encode(bytes(range(256)) * 2)) == 512 + 4
+
+
+def test_decode_skips_no_op():
+    assert rle.decode(b"\x80\x00\xea") == b"\xea"
+
+
+@pytest.mark.parametrize("encoded", [b"\x02\x01\x02", b"\xfe"])
+def test_decode_truncated(encoded):
+    with pytest.raises(ValueError):
+        rle.decode(encoded)
+
+
+def test_decode_max_length():
+    assert rle.decode(b"\x81\xff", max_length=128) == b"\xff" * 128
+    with pytest.raises(ValueError, match="longer than 64"):
+        rle.decode(b"\x81\xff", max_length=64)
+
+
+def test_compression_stats():
+    stats = CompressionStats(0, 0)
+    assert stats.ratio is None
+    stats = stats.add(128, 2).add(64, 2)
+    assert stats == (192, 4)
+    assert stats.ratio == 48
+    assert stats.since(CompressionStats(128, 2)) == (64, 2)
@@ -0,0 +1,62 @@
+import os
+import zlib
+
+import pytest
+
+from eeprom import shadow
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return shadow.ShadowCache(tmp_path / "shadow")
+
+
+def test_sample_ranges():
+    assert shadow.sample_ranges(0x8000) == [
+        (address, 16) for address in range(0, 0x8000, 0x1000)
+    ]
+
+
+def test_sample_ranges_small_image():
+    assert shadow.sample_ranges(40) == [(0, 16), (16, 16), (32, 8)]
+
+
+def test_fingerprint():
+    key = shadow.fingerprint([[1, 2], [3]], 0xCBF43926)
+    assert key.startswith("cbf43926-")
+    assert key != shadow.fingerprint([[1, 2], [4]], 0xCBF43926)
+
+
+def test_image_fingerprint():
+    data = bytes(range(256)) * 4
+    samples = [data[a : a + n] for a, n in shadow.sample_ranges(len(data))]
+    assert shadow.image_fingerprint(data) == shadow.fingerprint(
+        samples, zlib.crc32(data)
+    )
+
+
+def test_load_missing(cache):
+    assert cache.load("00000000-0000000000000000", 16) is None
+
+
+def test_save_and_load(cache):
+    data = bytearray(range(64))
+    cache.save(data)
+    assert cache.load(shadow.image_fingerprint(data), 64) == data
+
+
+def test_load_wrong_size(cache):
+    data = bytearray(range(64))
+    cache.save(data)
+    assert cache.load(shadow.image_fingerprint(data), 128) is None
+
+
+def test_save_removes_least_recently_used(cache):
+    images = [bytearray([i]) * 32 for i in range(cache.MAX_IMAGES + 1)]
+    for age, data in enumerate(images[:-1]):
+        cache.save(data)
+        os.utime(cache.path(shadow.image_fingerprint(data)), (age, age))
+    cache.save(images[-1])
+    assert cache.load(shadow.image_fingerprint(images[0]), 32) is None
+    assert cache.load(shadow.image_fingerprint(images[1]), 32) == images[1]
+    assert len(list(cache.directory.glob("*.bin"))) == cache.MAX_IMAGES
@@ -0,0 +1,568 @@
+import os
+import subprocess
+import sys
+import threading
+from unittest.mock import patch
+
+import pytest
+import serial
+
+from eeprom import Programmer, cli
+from eeprom import programmer_commands as commands
+from eeprom import simulator
+
+
+@pytest.fixture
+def connection(sim):
+    connection = simulator.SimulatedSerial(simulator=sim)
+    connection.port = "sim://"
+    connection.open()
+    connection.read(connection.in_waiting)
+    return connection
+
+
+def exchange(connection, request):
+    connection.write(request)
+    return connection.read(connection.in_waiting)
+
+
+def test_programmer_connects_to_simulator(sim_programmer):
+    programmer = sim_programmer()
+    assert programmer.arduino.serial_connection.is_open
+    programmer.disconnect()
+    assert not programmer.arduino.serial_connection.is_open
+
+
+def test_read_byte(sim, sim_programmer):
+    sim.memory[0x2A55] = 0x0A
+    assert sim_programmer().read_byte(0x2A55) == 0x0A
+
+
+def test_write_byte(sim, sim_programmer):
+    sim_programmer().write_byte(0x2A55, 0xEA)
+    assert sim.memory[0x2A55] == 0xEA
+
+
+def test_read_and_write(sim, sim_programmer, binary_file_contents):
+    programmer = sim_programmer()
+    programmer.write(binary_file_contents)
+    assert sim.memory == binary_file_contents
+    assert programmer.read() == list(binary_file_contents)
+
+
+@pytest.mark.parametrize("binary,window", [(True, 1), (False, 4), (True, 4)])
+def test_read_and_write_fast_paths(
+    sim, sim_programmer, binary_file_contents, binary, window
+):
+    programmer = sim_programmer(binary=binary, window=window)
+    programmer.write(binary_file_contents)
+    assert sim.memory == binary_file_contents
+    assert programmer.read() == list(binary_file_contents)
+
+
+def test_window_is_faster(sim, sim_programmer):
+    sim_programmer().read()
+    serial_time = sim.clock
+    sim.clock = 0
+    sim_programmer(window=4).read()
+    assert sim.clock < serial_time
+
+
+def test_page_writes_use_one_write_cycle_per_page(sim, sim_programmer):
+    programmer = sim_programmer(binary=True)
+    programmer.write(bytes(128))
+    assert programmer.write_cycle_stats().count == 2
+
+
+def test_write_cycle_stats(sim, sim_programmer):
+    sim.bad.add(0x0001)
+    programmer = sim_programmer()
+    programmer.write_block(0x0000, [0] * 16)
+    assert programmer.write_cycle_stats() == (16, 15 * 3000 + 12000, 12000, 1)
+    assert programmer.write_cycle_stats() == (0, 0, 0, 0)
+    assert sim.memory[0x0001] == 0xFF
+
+
+def test_write_range(sim, sim_programmer):
+    programmer = sim_programmer(binary=True)
+    commands.WriteRange.send(programmer, 0x0010, [1, 2, 3])
+    assert sim.memory[0x10:0x13] == bytes([1, 2, 3])
+
+
+def test_write_page_timeout_on_bad_address(sim, sim_programmer):
+    sim.bad.add(0x0003)
+    programmer = sim_programmer(binary=True)
+    commands.WritePage.send(programmer, 0x0000, [1, 2, 3, 4])
+    assert sim.memory[:4] == bytes([1, 2, 3, 0xFF])
+    assert programmer.write_cycle_stats() == (1, 12000, 12000, 1)
+
+
+def test_timing(sim, connection):
+    start = sim.clock
+    exchange(connection, b"W000001\n")
+    assert sim.clock - start == pytest.approx(13 * sim.byte_time + sim.write_cycle_time)
+
+
+def test_write_cycle_delays_reply(sim, connection):
+    sim.write_cycle_time = 1
+    exchange(connection, b"W000001\n")
+    assert sim.clock > 1
+
+
+def test_baud_limits_throughput(sim, connection):
+    connection.baudrate = 9600
+    assert sim.baud == 9600
+    exchange(connection, b"T0000\n")
+    assert sim.clock > (6 + 50) * 10 / 9600
+
+
+def test_short_write_block_message_writes_zeros(sim, connection):
+    assert exchange(connection, b"S0000AABB\n") == b"ACK\r\n"
+    assert sim.memory[:4] == bytes([0xAA, 0xBB, 0, 0])
+
+
+def test_read_block_message(sim, connection):
+    sim.memory[:16] = bytes(range(16))
+    response = exchange(connection, b"T0000\n")
+    assert response == b"00 01 02 03 04 05 06 07 08 09 0A 0B 0C 0D 0E 0F \r\n"
+
+
+@pytest.mark.parametrize(
+    "request_message,response",
+    [
+        (b"V\n", b"%d\r\n" % simulator.Simulator.PROTOCOL_VERSION),
+        (b"B\n", b"ACK\r\n"),
+        (b"P\n", b"ACK\r\n"),
+        (b"C\n", b"320\r\n"),
+        (b"L\n", b"128\r\n"),
+        (b"G\n", b"64\r\n"),
+        (b"Z\n", b"Z\r\n"),
+        (b"\n", b"\x00\r\n"),
+        (b"RZZ\n", b"FF\r\n"),
+    ],
+)
+def test_messages(connection, request_message, response):
+    assert exchange(connection, request_message) == response
+
+
+def test_long_messages_are_truncated(sim, connection):
+    assert exchange(connection, b"S0000" + b"AA" * 40 + b"\n") == b"ACK\r\n"
+    assert sim.memory[:17] == b"\xaa" * 16 + b"\xff"
+
+
+@pytest.mark.parametrize(
+    "frame",
+    [b"t\x01\x00", b"s\x02\x00\x00", b"x\x03\x00\x00\x00", b"p\x00", b"y\x00"],
+)
+def test_invalid_frames(connection, frame):
+    assert exchange(connection, frame) == b"\x15\x00"
+
+
+def test_read_block_frame(sim, connection):
+    sim.memory[:16] = bytes(range(16))
+    assert exchange(connection, b"t\x02\x00\x00") == b"\x06\x10" + bytes(range(16))
+
+
+def test_read_range_frame(sim, connection):
+    assert exchange(connection, b"x\x03\x00\x00\x02") == b"\x06\x02\xff\xff"
+
+
+def test_write_block_frame(sim, connection):
+    assert exchange(connection, b"s\x04\x00\x00\x01\x02") == b"\x06\x00"
+    assert sim.memory[:3] == b"\x01\x02\xff"
+
+
+def test_overflow_loses_bytes(sim, connection):
+    sim.write_cycle_time = 1
+    exchange(connection, b"W000001\n" + b"R0000\n" * 60)
+    assert sim.overflows == 60 * 6 - simulator.Simulator.RECIEVE_QUEUE_SIZE
+    assert sim.bytes_recieved == 8 + 60 * 6
+
+
+def test_drop(sim, connection):
+    sim.drop = 1
+    bytes_sent = sim.bytes_sent
+    assert exchange(connection, b"P\n") == b""
+    assert sim.bytes_sent == bytes_sent + 5
+
+
+def test_corrupt(sim, connection):
+    sim.corrupt = 1
+    response = exchange(connection, b"P\n")
+    assert len(response) == 5
+    assert all(bin(a ^ b).count("1") == 1 for a, b in zip(response, b"ACK\r\n"))
+
+
+def test_corrupt_requests(sim, connection):
+    sim.corrupt_requests = 1
+    assert exchange(connection, b"P\n") != b"ACK\r\n"
+
+
+def test_realtime_waits(sim, connection):
+    sim.realtime = True
+    sim.write_cycle_time = 1
+    with patch("eeprom.simulator.time") as mock_time:
+        mock_time.monotonic.return_value = sim._epoch
+        exchange(connection, b"W000001\n")
+        delay = mock_time.sleep.call_args[0][0]
+    assert delay == pytest.approx(sim.clock)
+
+
+def test_realtime_keeps_up_with_system_clock(sim, connection):
+    sim.realtime = True
+    with patch("eeprom.simulator.time") as mock_time:
+        mock_time.monotonic.return_value = sim._epoch + 5
+        connection.write(b"P\n")
+        mock_time.monotonic.return_value = sim._epoch + 10
+        connection.read(connection.in_waiting)
+        mock_time.sleep.assert_not_called()
+    assert sim.clock > 5
+
+
+def test_read_partial_response(connection):
+    connection.write(b"P\n")
+    assert connection.read(2) == b"AC"
+    assert connection.read(10) == b"K\r\n"
+
+
+def test_reset_input_buffer(sim, connection):
+    connection.write(b"P\n")
+    sim.clock += 1
+    connection.reset_input_buffer()
+    assert connection.in_waiting == 0
+
+
+def test_reset_input_buffer_keeps_bytes_not_yet_arrived(sim, connection):
+    connection.write(b"P\n")
+    connection.reset_input_buffer()
+    assert connection.read(5) == b"ACK\r\n"
+    connection.write(b"P\n")
+    sim.clock += sim.byte_time * 3.5
+    connection.reset_input_buffer()
+    remaining = connection.read(5)
+    assert 0 < len(remaining) < 5
+    assert b"ACK\r\n".endswith(remaining)
+
+
+def test_read_timeout(sim, connection):
+    connection.timeout = sim.byte_time * 4.5
+    sim.write_cycle_time = 1
+    connection.write(b"P\n")
+    start = sim.clock
+    first = connection.read(5)
+    assert 0 < len(first) < 5
+    assert sim.clock == start + connection.timeout
+    assert first + connection.read(5) == b"ACK\r\n"
+    connection.write(b"W0000:00\n")
+    start = sim.clock
+    assert connection.read(1) == b""
+    assert sim.clock == start + connection.timeout
+    connection.timeout = None
+    assert connection.read(5) == b"ACK\r\n"
+
+
+def test_reset_output_buffer_and_flush(connection):
+    connection.reset_output_buffer()
+    connection.flush()
+
+
+def test_raising_dtr_resets_simulator(connection):
+    connection.dtr = False
+    assert connection.in_waiting == 0
+    connection.dtr = True
+    assert connection.read(7) == b"READY\r\n"
+
+
+def test_open_without_dtr(sim_url):
+    connection = serial.serial_for_url(sim_url, do_not_open=True)
+    connection.dtr = False
+    connection.open()
+    assert connection.in_waiting == 0
+
+
+def test_open_twice(connection):
+    with pytest.raises(serial.SerialException):
+        connection.open()
+
+
+def test_open_without_port():
+    with pytest.raises(serial.SerialException):
+        simulator.SimulatedSerial().open()
+
+
+def test_closed_port(connection):
+    connection.close()
+    with pytest.raises(serial.SerialException):
+        connection.read()
+    with pytest.raises(serial.SerialException):
+        connection.write(b"P\n")
+
+
+def test_get_simulator_reuses_named_simulators(sim, sim_url):
+    assert simulator.get_simulator(sim_url + "?size=16") is sim
+
+
+def test_get_simulator_without_name():
+    assert simulator.get_simulator("sim://") is not simulator.get_simulator("sim://")
+
+
+def test_get_simulator_options(tmp_path):
+    image = tmp_path / "image.bin"
+    image.write_bytes(b"\x01\x02")
+    sim = simulator.get_simulator(
+        f"sim://?size=0x10&fill=0&image={image}&write_cycle_time=0.01"
+        "&read_time=0&corrupt=0.5&drop=0.5&corrupt_requests=0.5&bad=10,1F&seed=1"
+        "&realtime=1&max_page=0"
+    )
+    assert sim.memory == b"\x01\x02" + bytes(14)
+    assert sim.write_cycle_time == 0.01
+    assert sim.read_time == 0
+    assert sim.corrupt == sim.drop == sim.corrupt_requests == 0.5
+    assert sim.bad == {0x10, 0x1F}
+    assert sim.realtime is True
+    assert sim.max_page == 0
+
+
+@pytest.mark.parametrize(
+    "url",
+    ["loop://", "sim://?colour=red", "sim://?size=big", "sim://?image=/missing"],
+)
+def test_get_simulator_invalid_url(url):
+    with pytest.raises(serial.SerialException):
+        simulator.get_simulator(url)
+
+
+def test_parse_hex():
+    assert simulator.parse_hex("W2A55EA", 1, 5) == 0x2A55
+    assert simulator.parse_hex("W2A", 5, 7) == 0
+    assert simulator.parse_hex("W2AZ5", 1, 5) == 0x2A
+
+
+def test_pty(sim):
+    master, slave, path = simulator.open_pty()
+    stop = threading.Event()
+    thread = threading.Thread(
+        target=simulator.serve_pty, args=(sim, master), kwargs={"stop": stop}
+    )
+    thread.start()
+    try:
+        programmer = Programmer(port=path, reset=False)
+        programmer.write_byte(0x2A55, 0xEA)
+        assert programmer.read_byte(0x2A55) == 0xEA
+        programmer.disconnect()
+    finally:
+        stop.set()
+        thread.join()
+        os.close(slave)
+        os.close(master)
+
+
+def test_serve_pty_stops_on_interrupt(sim):
+    with patch("eeprom.simulator.select.select", side_effect=KeyboardInterrupt):
+        simulator.serve_pty(sim, None)
+
+
+@pytest.mark.parametrize("image", [False, True])
+def test_cli_simulate(runner, tmp_path, image):
+    args = "simulate --write-cycle-time 1"
+    if image:
+        (tmp_path / "image.bin").write_bytes(b"\x01\x02")
+        args += f" --image {tmp_path / 'image.bin'}"
+    with patch("eeprom.cli.simulator.open_pty", return_value=(3, 4, "/dev/pts/9")):
+        with patch("eeprom.cli.simulator.serve_pty") as mock_serve:
+            with patch("eeprom.cli.os.close") as mock_close:
+                result = runner.invoke(cli, args)
+    assert result.exit_code == 0
+    assert result.output == "/dev/pts/9\n"
+    sim, master = mock_serve.call_args[0]
+    assert master == 3
+    assert mock_close.call_count == 2
+    assert sim.write_cycle_time == 0.001
+    assert sim.memory[:2] == (b"\x01\x02" if image else b"\xff\xff")
+
+
+def test_cli_port(runner, sim, sim_url, binary_file_contents, tmp_path):
+    path = tmp_path / "data.bin"
+    path.write_bytes(binary_file_contents)
+    result = runner.invoke(cli, f"--port {sim_url} --binary write {path}")
+    assert result.exit_code == 0
+    assert sim.memory == binary_file_contents
+
+
+def test_serve_pty_waits_for_data(sim):
+    stop = threading.Event()
+
+    def select(*args):
+        stop.set()
+        return [], [], []
+
+    with patch("eeprom.simulator.select.select", side_effect=select):
+        simulator.serve_pty(sim, None, stop=stop)
+
+
+def test_block_hashes_frame(sim, connection):
+    sim.memory[:9] = b"123456789"
+    response = exchange(connection, b"h\x05\x00\x00\x00\x09\x02")
+    assert response == b"\x06\x04\x31\xc3" + simulator.commands.BlockHashes.hash(
+        sim.memory[9:18]
+    ).to_bytes(2, "big")
+
+
+@pytest.mark.parametrize(
+    "frame",
+    [
+        b"h\x04\x00\x00\x00\x10",
+        b"h\x05\x00\x00\x00\x00\x01",
+        b"h\x05\x00\x00\x00\x10\x00",
+        b"h\x05\x00\x00\x00\x10\x80",
+    ],
+)
+def test_invalid_block_hashes_frames(connection, frame):
+    assert exchange(connection, frame) == b"\x15\x00"
+
+
+def test_block_hashes(sim, sim_programmer, binary_file_contents):
+    sim.memory[: len(binary_file_contents)] = binary_file_contents
+    programmer = sim_programmer(binary=True, window=4)
+    hashes = programmer.block_hashes(0, len(binary_file_contents), 64)
+    assert hashes == [
+        simulator.commands.BlockHashes.hash(binary_file_contents[i : i + 64])
+        for i in range(0, len(binary_file_contents), 64)
+    ]
+
+
+def test_range_crc_frame(sim, connection):
+    sim.memory[:9] = b"123456789"
+    assert exchange(connection, b"k\x04\x00\x00\x00\x09") == b"\x06\x04\xcb\xf4\x39\x26"
+
+
+@pytest.mark.parametrize("frame", [b"k\x03\x00\x00\x00", b"k\x04\x00\x00\x00\x00"])
+def test_invalid_range_crc_frames(connection, frame):
+    assert exchange(connection, frame) == b"\x15\x00"
+
+
+def test_read_range_encoded_frame(sim, connection):
+    sim.memory[4:6] = b"\x01\x02"
+    response = exchange(connection, b"u\x03\x00\x00\x80")
+    assert response == b"\x06\x07\xfd\xff\x01\x01\x02\x87\xff"
+
+
+def test_write_range_encoded_frame(sim, connection):
+    assert exchange(connection, b"v\x04\x00\x10\xfd\x00") == b"\x06\x00"
+    assert sim.memory[0x10:0x15] == b"\x00\x00\x00\x00\xff"
+    assert sim.write_cycle_count == 4
+
+
+def test_write_page_encoded_frame(sim, connection):
+    assert exchange(connection, b"q\x04\x00\x40\xc1\x00") == b"\x06\x00"
+    assert sim.memory[0x40:0x80] == bytes(64)
+    assert sim.write_cycle_count == 1
+
+
+@pytest.mark.parametrize(
+    "frame",
+    [
+        b"u\x03\x00\x00\x00",
+        b"v\x02\x00\x00",
+        b"v\x03\x00\x00\xfe",
+        b"v\x05\x00\x00\x81\x00\x00",
+        b"q\x04\x00\x00\x81\x00",
+    ],
+)
+def test_invalid_encoded_frames(connection, frame):
+    assert exchange(connection, frame) == b"\x15\x00"
+
+
+@pytest.mark.parametrize("message", [b"U\n", b"U0\n", b"Ufast\n"])
+def test_invalid_set_baud_messages(connection, message):
+    assert exchange(connection, message) == b"U\r\n"
+
+
+def test_set_baud_confirmed_by_ping(sim, connection):
+    assert exchange(connection, b"U1000000\n") == b"ACK\r\n"
+    connection.baudrate = 1000000
+    assert exchange(connection, b"P\n") == b"ACK\r\n"
+    assert sim.firmware_baud == 1000000
+    assert (
+        exchange(connection, b"V\n") == b"%d\r\n" % simulator.Simulator.PROTOCOL_VERSION
+    )
+
+
+def test_set_baud_restored_by_other_message(sim, connection):
+    connection.baudrate = 115200
+    exchange(connection, b"U1000000\n")
+    connection.baudrate = 1000000
+    assert exchange(connection, b"x\n") == b""
+    assert sim.firmware_baud == 115200
+    assert exchange(connection, b"P\n") == b""
+    connection.baudrate = 115200
+    assert exchange(connection, b"P\n") == b"ACK\r\n"
+
+
+def test_set_baud_resets_recieve_state(sim, connection):
+    connection.baudrate = 115200
+    exchange(connection, b"U1000000\n")
+    sim._state = simulator.IN_FRAME
+    assert exchange(connection, b"P\n") == b""
+    assert exchange(connection, b"P\n") == b"ACK\r\n"
+
+
+def test_max_baud_breaks_link(sim, connection):
+    sim.max_baud = 1000000
+    connection.baudrate = 115200
+    exchange(connection, b"U2000000\n")
+    connection.baudrate = 2000000
+    assert sim.link_broken
+    assert exchange(connection, b"P\n") == b""
+    connection.baudrate = 115200
+    assert not sim.link_broken
+    assert exchange(connection, b"P\n") == b"ACK\r\n"
+
+
+def checked(frame):
+    return frame + commands.BinaryCommand.checksum(frame)
+
+
+def test_checked_frames(sim, connection):
+    assert exchange(connection, b"F\n") == b"ACK\r\n"
+    assert exchange(connection, checked(b"x\x03\x00\x00\x02")) == checked(
+        b"\x06\x02\xff\xff"
+    )
+    assert exchange(connection, checked(b"p\x00")) == checked(b"\x15\x00")
+
+
+def test_checked_frame_with_invalid_checksum(sim, connection):
+    exchange(connection, b"F\n")
+    frame = checked(b"s\x03\x00\x00\x01")
+    frame = frame[:-1] + bytes([frame[-1] ^ 1])
+    assert exchange(connection, frame) == checked(b"\x18\x00")
+    assert sim.memory[0] == 0xFF
+
+
+def test_incomplete_checked_frame_times_out(sim, connection):
+    exchange(connection, b"F\n")
+    connection.write(b"x\x03\x00")
+    sim.clock += simulator.Simulator.FRAME_TIMEOUT * 2
+    assert exchange(connection, checked(b"x\x03\x00\x00\x02")) == checked(
+        b"\x18\x00"
+    ) + checked(b"\x06\x02\xff\xff")
+
+
+def test_incomplete_frame_times_out_without_checksums(sim, connection):
+    connection.write(b"x\x03\x00")
+    sim.clock += simulator.Simulator.FRAME_TIMEOUT * 2
+    assert exchange(connection, b"P\n") == b"ACK\r\n"
+
+
+@pytest.mark.parametrize(
+    "message", [b"R0000\n", b"W0000:00\n", b"T0000\n", b"S0000:" + b"00" * 16 + b"\n"]
+)
+def test_text_data_commands_refused_while_frames_checked(sim, connection, message):
+    exchange(connection, b"F\n")
+    assert exchange(connection, message) == checked(b"\x15\x00")
+    assert sim.memory[0] == 0xFF
+
+
+def test_package_imports_without_pseudo_terminals():
+    code = "import sys; sys.modules.update(pty=None, tty=None); import eeprom.cli"
+    subprocess.run([sys.executable, "-c", code], check=True)